@@ -0,0 +1,1302 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import warnings
+import time
+import tempfile
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from etf import (
+    Etf,
+    PAYOUT_FREQUENCIES,
+    detect_payout_frequency,
+    get_dividend_frame,
+    _get_dividends_loop,
+)
+from etf_compare import EtfCompare
+from fetch_pipeline import FetchPipeline
+from price_cache import PriceCache
+from holdings_store import CsvHoldingsStore, NumpyHoldingsStore
+from holdings_overlap import HoldingsMatrix
+from compact_holdings import CompactHoldings
+from holdings_history import HoldingsHistory
+from holdings_index import HoldingsIndex
+from instrumentation import instruments
+from lookthrough import LookThrough
+from value_parser import parse_numbers
+from fixture_site import (
+    FixtureDriver,
+    load_local_holdings,
+    serve_directory,
+    write_fixture_site,
+)
+
+"""----------------------------------- Synthetic Data -----------------------------------"""
+
+
+def make_price_data(
+    n_tickers: int, n_days: int, seed: int = 0, frequencies: list = (4,)
+):
+    """
+    Create "Close" and "Dividends" frames shaped like the blocks returned by `yf.download`.
+
+    Parameters
+    ----------
+    n_tickers : int
+        Number of ticker columns.
+    n_days : int
+        Number of business days.
+    seed : int
+        Seed of the random generator.
+    frequencies : list
+        Payouts per year, assigned to the tickers in turn.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        Close prices and dividends, one column per ticker.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=dt.datetime(2024, 6, 28), periods=n_days)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+
+    returns = rng.normal(0.0003, 0.01, size=(n_days, n_tickers))
+    close = 100 * np.exp(np.cumsum(returns, axis=0))
+
+    dividends = np.zeros((n_days, n_tickers))
+    spacing = 252 // np.resize(np.asarray(frequencies), n_tickers)
+    offsets = rng.integers(0, spacing)
+    for col, offset in enumerate(offsets):
+        rows = np.arange(offset, n_days, spacing[col])
+        dividends[rows, col] = np.round(
+            rng.uniform(0.1, 1.5) * rng.uniform(0.95, 1.05, len(rows)), 3
+        )
+
+    close = pd.DataFrame(close, index=index, columns=tickers)
+    dividends = pd.DataFrame(dividends, index=index, columns=tickers)
+    return close, dividends
+
+
+def make_compare(close: pd.DataFrame, dividends: pd.DataFrame) -> EtfCompare:
+    """
+    Create an `EtfCompare` from synthetic frames, without downloading prices or loading holdings.
+    """
+    compare = EtfCompare.__new__(EtfCompare)
+    compare.ticker_list = close.columns.to_list()
+    compare.start = close.index[0]
+    compare.end = close.index[-1]
+    compare.ticker_data = pd.concat({"Close": close, "Dividends": dividends}, axis=1)
+    compare.ticker_objects = {}
+    compare.holdings_universe = CompactHoldings()
+    compare.engine = None
+    compare.result_cache = None
+    compare._holdings_index = None
+    return compare
+
+
+"""----------------------------------- Benchmarks -----------------------------------"""
+
+
+def _time(func, *args, repeat: int = 3, **kwargs) -> float:
+    """
+    :param func: Function to time.
+    :param repeat: Number of runs. The fastest run is reported.
+    :return: (float) Seconds of the fastest run.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_dividends(n_tickers: int = 50, n_days: int = 5040) -> dict:
+    """
+    Compare the per-row dividend loop against the vectorized engine.
+    """
+    close, dividends = make_price_data(n_tickers, n_days)
+
+    def loop():
+        for t in close.columns:
+            _get_dividends_loop(close[t], dividends[t], 4)
+
+    loop_time = _time(loop, repeat=1)
+    vectorized_time = _time(get_dividend_frame, close, dividends, periods_per_year=4)
+    return {
+        "name": "get_dividends",
+        "size": f"{n_tickers}x{n_days}",
+        "loop": loop_time,
+        "vectorized": vectorized_time,
+        "speedup": loop_time / vectorized_time,
+    }
+
+
+def _trailing_change_loop(values: pd.Series) -> pd.Series:
+    """
+    Previous implementation of `EtfCompare._create_trailing_change`, kept as the reference.
+    """
+    index = 0
+    dates = values.index.to_list()
+    data = pd.Series()
+    for i in values:
+        cur_date = dates[index]
+        if index == 0:
+            anchor_value = i
+            data.loc[cur_date] = np.nan
+        else:
+            data.loc[cur_date] = ((i - anchor_value) / anchor_value) * 100
+        index += 1
+    return data
+
+
+def bench_trailing_change(n_tickers: int = 10, n_days: int = 1260) -> dict:
+    """
+    Compare the per-row trailing change against the columnar version.
+    """
+    close, dividends = make_price_data(n_tickers, n_days)
+    compare = make_compare(close, dividends)
+    dividend = get_dividend_frame(close, dividends).xs("dividend", axis=1, level=1)
+
+    def loop():
+        for t in dividend.columns:
+            _trailing_change_loop(dividend[t])
+
+    loop_time = _time(loop, repeat=1)
+    columnar_time = _time(compare._create_trailing_change, dividend)
+    return {
+        "name": "_create_trailing_change",
+        "size": f"{n_tickers}x{n_days}",
+        "loop": loop_time,
+        "vectorized": columnar_time,
+        "speedup": loop_time / columnar_time,
+    }
+
+
+def _payout_frequency_loop(dividends: pd.DataFrame) -> pd.Series:
+    """
+    Per-column payout frequency, kept as the reference for `detect_payout_frequency`.
+    """
+    frequencies = {}
+    for c in dividends.columns:
+        dates = dividends.index[dividends[c].fillna(0) > 0]
+        if len(dates) < 2:
+            frequencies[c] = np.nan
+            continue
+        per_year = 365.25 / np.median(
+            np.diff(dates).astype("timedelta64[D]").astype(int)
+        )
+        frequencies[c] = min(
+            PAYOUT_FREQUENCIES, key=lambda f: abs(np.log(per_year / f))
+        )
+    return pd.Series(frequencies, dtype=float)
+
+
+def bench_payout_frequency(n_tickers: int = 1000, n_days: int = 5040) -> dict:
+    """
+    Detect the payout frequency of a mixed universe per column and vectorized.
+    """
+    close, dividends = make_price_data(n_tickers, n_days, frequencies=[1, 2, 4, 12, 52])
+
+    loop_time = _time(_payout_frequency_loop, dividends, repeat=1)
+    vectorized_time = _time(detect_payout_frequency, dividends)
+    ttm_time = _time(get_dividend_frame, close, dividends, ttm=True)
+    return {
+        "name": "detect_payout_frequency",
+        "size": f"{n_tickers}x{n_days}",
+        "loop": loop_time,
+        "vectorized": vectorized_time,
+        "speedup": loop_time / vectorized_time,
+        "ttm_dividend_frame": ttm_time,
+    }
+
+
+def _dividend_growth_loop(dividends: pd.DataFrame) -> pd.DataFrame:
+    """
+    Previous per-column implementation of `EtfCompare.compare_dividend_growth`, kept as the reference.
+    The end payout is the last one (the previous version read the second payout).
+    """
+    df = pd.DataFrame()
+    # The cell by cell writes fragment the frame, which is what is being measured.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+        for c in dividends.columns.to_list():
+            data = dividends[c]
+            data = data.loc[data != 0]
+            start_div = data.iloc[0]
+            end_div = data.iloc[-1]
+            growth = ((end_div - start_div) / abs(start_div)) * 100
+            df.loc["start_date", c] = dt.datetime.strftime(data.index[0], "%Y-%m-%d")
+            df.loc["end_date", c] = dt.datetime.strftime(data.index[-1], "%Y-%m-%d")
+            df.loc["start", c] = start_div
+            df.loc["end", c] = end_div
+            df.loc["growth", c] = growth
+    return df
+
+
+def bench_dividend_growth(n_tickers: int = 1000, n_days: int = 2520) -> dict:
+    """
+    Compare the per-column dividend growth against `compare_dividend_growth`.
+    """
+    close, dividends = make_price_data(n_tickers, n_days)
+    compare = make_compare(close, dividends)
+
+    loop_time = _time(_dividend_growth_loop, dividends, repeat=1)
+    vectorized_time = _time(compare.compare_dividend_growth)
+    return {
+        "name": "compare_dividend_growth",
+        "size": f"{n_tickers}x{n_days}",
+        "loop": loop_time,
+        "vectorized": vectorized_time,
+        "speedup": loop_time / vectorized_time,
+    }
+
+
+def _memory_kb(field: str) -> int:
+    """
+    :param field: "VmRSS" (current) or "VmHWM" (peak) resident memory of this process.
+    """
+    with open("/proc/self/status", "r") as file:
+        for line in file:
+            if line.startswith(field):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def _dividends_memory_run(data_path: str, mode: str, batch_size: int) -> None:
+    """
+    Run one `compare_dividends` mode in this process, and print its peak memory above the loaded prices as json.
+    Runs in a fresh interpreter started by `bench_dividends_memory`. Needs Linux, to reset the peak with "/proc/self/clear_refs".
+    """
+    close = pd.read_pickle(os.path.join(data_path, "close.pkl"))
+    dividends = pd.read_pickle(os.path.join(data_path, "dividends.pkl"))
+    compare = make_compare(close, dividends)
+    del close, dividends
+
+    with open("/proc/self/clear_refs", "w") as file:
+        file.write("5")
+    base = _memory_kb("VmRSS")
+    start = time.perf_counter()
+    if mode == "full":
+        compare.compare_dividends()
+    elif mode == "float32":
+        compare.compare_dividends(dtype=np.float32)
+    elif mode == "stream":
+        compare.export_dividends(
+            os.path.join(data_path, "dividends"), batch_size=batch_size
+        )
+    seconds = time.perf_counter() - start
+    peak = (_memory_kb("VmHWM") - base) / 1024
+    print(json.dumps({"peak_mb": peak, "seconds": seconds}))
+
+
+def bench_dividends_memory(
+    n_tickers: int = 2000, n_days: int = 5040, batch_size: int = 250
+) -> dict:
+    """
+    Peak resident memory of `compare_dividends` in one frame, in one float32 frame, and streamed to a `DividendStore`.
+    Each mode runs in a fresh interpreter, and the memory of the loaded prices is not counted.
+    """
+    close, dividends = make_price_data(n_tickers, n_days, frequencies=[4, 12])
+    results = {
+        "name": "compare_dividends memory",
+        "size": f"{n_tickers}x{n_days}",
+        "batch_size": batch_size,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        close.to_pickle(os.path.join(directory, "close.pkl"))
+        dividends.to_pickle(os.path.join(directory, "dividends.pkl"))
+        del close, dividends
+        for mode in ["full", "float32", "stream"]:
+            code = (
+                "import benchmark; "
+                f"benchmark._dividends_memory_run({directory!r}, {mode!r}, {batch_size})"
+            )
+            output = subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, check=True
+            )
+            run = json.loads(output.stdout.strip().splitlines()[-1])
+            results[f"{mode}_peak_mb"] = run["peak_mb"]
+            results[f"{mode}_seconds"] = run["seconds"]
+    return results
+
+
+def bench_table_extraction(ticker: str = "SPY") -> dict:
+    """
+    Read one holdings page of the fixture site with `Etf._scrape_table`, through a `FixtureDriver` that counts
+    the browser calls of the bulk path and of the cell path. The cell path waits out its 5 second timeout after the last row.
+    """
+    local = load_local_holdings()
+    driver = FixtureDriver(local)
+    driver.get(f"http://fixture/{ticker}/page1.html")
+    etf = Etf(ticker)
+    etf.browser = driver
+
+    def calls():
+        return driver.script_calls + driver.element_calls
+
+    start = calls()
+    rows = etf._scrape_table(bulk=True)
+    bulk_calls = calls() - start
+    seconds = _time(etf._scrape_table, repeat=20)
+
+    start = calls()
+    etf._scrape_table(bulk=False)
+    cell_calls = calls() - start
+    return {
+        "name": "_scrape_table",
+        "size": f"{len(rows)} rows",
+        "browser_calls_cells": cell_calls,
+        "browser_calls_bulk": bulk_calls,
+        "bulk_seconds": seconds,
+        "rows_per_second": len(rows) / seconds,
+    }
+
+
+def make_number_texts(n_values: int, bad_fraction: float = 0.01, seed: int = 0):
+    """
+    :param n_values: Number of texts.
+    :param bad_fraction: Share of the texts that can not be read, like "N\\A".
+    :return: (tuple[np.ndarray, np.ndarray]) Scraped style texts like "$1,234.56B", and the value of each (NaN if bad).
+    """
+    rng = np.random.default_rng(seed)
+    cents = rng.integers(0, 10**9, n_values)
+    suffixes = np.array(["", "K", "M", "B"])
+    suffix = rng.integers(0, len(suffixes), n_values)
+    texts = np.array(
+        [f"${c / 100:,.2f}{suffixes[s]}" for c, s in zip(cents.tolist(), suffix)],
+        dtype=object,
+    )
+    values = cents / 100 * np.array([1, 1e3, 1e6, 1e9])[suffix]
+    bad = rng.random(n_values) < bad_fraction
+    texts[bad] = rng.choice(["N\\A", "--", "1.2.3"], bad.sum())
+    values[bad] = np.nan
+    return texts, values
+
+
+def _format_value_loop(value: str) -> float:
+    """
+    Previous per-value conversion of `Etf._format_value`, with the thousands separators removed so it can run.
+    """
+    multipliers = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}
+    value = value.lstrip("$").replace(",", "")
+    if value[-1] in multipliers:
+        return float(value[:-1]) * multipliers[value[-1]]
+    return float(value)
+
+
+def bench_value_parser(n_values: int = 1_000_000) -> dict:
+    """
+    Compare `parse_numbers` with `Etf._format_value` called on every text. `parse_numbers` also checks the format
+    of every text, so it is slower than the loop per value. Holdings tables are a few hundred rows.
+    """
+    texts, values = make_number_texts(n_values)
+    _, errors = parse_numbers(texts)
+
+    # The old per-value loop crashed on unreadable texts, so it is only timed on the readable ones.
+    sample = texts[~np.isnan(values)][:100_000].tolist()
+    loop_seconds = _time(lambda: [_format_value_loop(v) for v in sample], repeat=1)
+    vectorized_seconds = _time(lambda: parse_numbers(texts), repeat=3)
+    return {
+        "name": "parse_numbers",
+        "size": f"{n_values} values",
+        "errors": errors,
+        "loop_values_per_second": len(sample) / loop_seconds,
+        "vectorized_values_per_second": n_values / vectorized_seconds,
+        "speedup": (n_values / vectorized_seconds) / (len(sample) / loop_seconds),
+    }
+
+
+def make_holdings_universe(n_etfs: int) -> dict:
+    """
+    :param n_etfs: Number of ETFs. The bundled holdings are repeated under new tickers until there are enough.
+    :return: (dict) Ticker mapped to its holdings DataFrame.
+    """
+    local = CsvHoldingsStore("EtfData")
+    bundled = [local.load(t) for t in local.tickers()]
+    return {f"E{i:05d}": bundled[i % len(bundled)] for i in range(n_etfs)}
+
+
+def make_weight_matrix(n_etfs: int, n_securities: int, seed: int = 0) -> HoldingsMatrix:
+    """
+    :param n_etfs: Number of ETFs.
+    :param n_securities: Number of securities. Popular securities are held by most ETFs, like mega caps.
+    :return: (HoldingsMatrix) ETFs holding 30 to 500 securities each, with weights summing to 100.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1 / np.arange(1, n_securities + 1) ** 0.8
+    popularity /= popularity.sum()
+    etf_ids, security_ids, weights = [], [], []
+    for i in range(n_etfs):
+        k = int(rng.integers(30, 500))
+        held = rng.choice(n_securities, k, replace=False, p=popularity)
+        w = rng.pareto(1.5, k) + 0.01
+        etf_ids.append(np.full(k, i))
+        security_ids.append(held)
+        weights.append(w / w.sum() * 100)
+    return HoldingsMatrix(
+        [f"E{i:05d}" for i in range(n_etfs)],
+        [f"S{i:05d}" for i in range(n_securities)],
+        np.concatenate(etf_ids),
+        np.concatenate(security_ids),
+        np.concatenate(weights),
+    )
+
+
+def bench_holdings_overlap(n_etfs: int = 2000, n_securities: int = 10000) -> dict:
+    """
+    Pairwise overlap, Jaccard and cosine of a synthetic universe.
+    """
+    matrix = make_weight_matrix(n_etfs, n_securities)
+    seconds = _time(matrix.compare, repeat=1)
+    return {
+        "name": "compare_holdings",
+        "size": f"{n_etfs}x{n_securities}",
+        "entries": len(matrix.weights),
+        "seconds": seconds,
+    }
+
+
+def bench_lookthrough(n_etfs: int = 3000, n_changes: int = 20) -> dict:
+    """
+    Look-through exposure of a portfolio holding every ETF of a replicated universe, then a what-if change of a few positions.
+    """
+    universe = make_holdings_universe(n_etfs)
+    holdings = pd.concat(universe, names=["etf", "symbol"]).reset_index(level="etf")
+    rng = np.random.default_rng(0)
+    positions = dict(zip(universe, rng.uniform(1e3, 1e5, n_etfs)))
+    changes = {t: positions[t] * 1.1 for t in list(universe)[:n_changes]}
+
+    index_time = _time(LookThrough, holdings, repeat=1)
+    lookthrough = LookThrough(holdings)
+    full_time = _time(lookthrough.set_positions, positions)
+    lookthrough.set_positions(positions)
+    update_time = _time(lookthrough.update_positions, changes, repeat=1)
+    return {
+        "name": "look_through",
+        "size": f"{n_etfs} positions, {len(holdings)} holdings",
+        "index": index_time,
+        "full": full_time,
+        "update": update_time,
+    }
+
+
+def make_holdings_frame(n_etfs: int, n_securities: int, seed: int = 0) -> pd.DataFrame:
+    """
+    :return: (pd.DataFrame) Long holdings of `make_weight_matrix`, like `HoldingsStore.load_many`, with shares and market values.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = make_weight_matrix(n_etfs, n_securities, seed)
+    etf_values = rng.uniform(1e8, 1e11, n_etfs)
+    market_value = etf_values[matrix.etf_ids] * matrix.weights / 100
+    symbols = np.array(matrix.symbols, dtype=object)
+    return pd.DataFrame(
+        {
+            "etf": np.array(matrix.etfs, dtype=object)[matrix.etf_ids],
+            "name": symbols[matrix.security_ids],
+            "weight": matrix.weights,
+            "shares_held": np.round(
+                market_value / rng.uniform(10, 500, len(market_value))
+            ),
+            "market_value": market_value,
+        },
+        index=pd.Index(symbols[matrix.security_ids], name="symbol"),
+    )
+
+
+def bench_holdings_index(
+    n_etfs: int = 3000, n_securities: int = 20000, n_symbols: int = 500
+) -> dict:
+    """
+    Build the reverse index, look up one symbol and a batch of symbols, and refresh one ETF.
+    A scan of the long holdings frame, like reading every holdings file, is the reference.
+    Looking up through one open instance is compared to opening an index per lookup.
+    """
+    holdings = make_holdings_frame(n_etfs, n_securities)
+    rng = np.random.default_rng(1)
+    symbols = list(rng.choice(holdings.index.unique(), n_symbols, replace=False))
+    with tempfile.TemporaryDirectory() as directory:
+        rebuild_time = _time(HoldingsIndex(directory).rebuild, holdings, repeat=1)
+
+        start = time.perf_counter()
+        index = HoldingsIndex(directory)
+        index.holders("S00000")
+        open_time = time.perf_counter() - start
+        lookup_time = _time(index.holders_many, ["S00100"], repeat=200)
+        reopen_time = _time(
+            lambda: HoldingsIndex(directory).holders_many(["S00100"]), repeat=20
+        )
+        batch_time = _time(index.holders_many, symbols)
+        scan_time = _time(lambda: holdings[holdings.index == "S00100"], repeat=20)
+
+        refreshed = holdings[holdings["etf"] == "E00000"].copy()
+        refreshed["weight"] *= 2
+        update_time = _time(index.update, "E00000", refreshed, repeat=1)
+        updated_lookup_time = _time(index.holders_many, ["S00100"], repeat=200)
+        compact_time = _time(index.compact, repeat=1)
+    return {
+        "name": "HoldingsIndex",
+        "size": f"{n_etfs} ETFs, {len(holdings)} holdings",
+        "rebuild": rebuild_time,
+        "open": open_time,
+        "lookup": lookup_time,
+        "lookup_new_index": reopen_time,
+        "scan": scan_time,
+        f"batch_{n_symbols}": batch_time,
+        "update_one_etf": update_time,
+        "lookup_after_update": updated_lookup_time,
+        "compact": compact_time,
+    }
+
+
+def bench_holdings_load(n_etfs: int = 3000) -> dict:
+    """
+    Load every ETF of a replicated universe from the csv files and from the columnar store.
+    """
+    universe = make_holdings_universe(n_etfs)
+    with tempfile.TemporaryDirectory() as directory:
+        csv_store = CsvHoldingsStore(os.path.join(directory, "csv"))
+        numpy_store = NumpyHoldingsStore(os.path.join(directory, "numpy"))
+        csv_store.save_many(universe)
+        numpy_store.save_many(universe)
+
+        csv_time = _time(csv_store.load_many, repeat=1)
+        numpy_time = _time(numpy_store.load_many)
+        single_time = _time(numpy_store.load, "E00002", repeat=20)
+
+        # Saving one ETF writes a segment of its own, past `MAX_SEGMENTS` the store is rewritten once.
+        saved = list(universe)[: NumpyHoldingsStore.MAX_SEGMENTS + 10]
+        start = time.perf_counter()
+        for t in saved:
+            numpy_store.save(t, universe[t])
+        save_time = (time.perf_counter() - start) / len(saved)
+    return {
+        "name": "get_holdings",
+        "size": f"{n_etfs} ETFs",
+        "csv": csv_time,
+        "numpy": numpy_time,
+        "speedup": csv_time / numpy_time,
+        "numpy_single": single_time,
+        "numpy_save_one": save_time,
+    }
+
+
+def _holdings_memory_run(store_path: str, mode: str) -> None:
+    """
+    Load every ETF of a store in this process, and print the memory held by the holdings as json.
+    Runs in a fresh interpreter started by `bench_holdings_memory`.
+    """
+    store = NumpyHoldingsStore(store_path)
+    tickers = store.tickers()
+    base = _memory_kb("VmRSS")
+    start = time.perf_counter()
+    if mode == "frames":
+        # One DataFrame per `Etf`, like the `holdings` property without a universe.
+        holdings = {t: store.load(t) for t in tickers}
+        size = sum(df.memory_usage(deep=True).sum() for df in holdings.values())
+    else:
+        holdings = CompactHoldings.from_store(store)
+        size = holdings.nbytes
+    seconds = time.perf_counter() - start
+    rss = (_memory_kb("VmRSS") - base) / 1024
+    print(json.dumps({"rss_mb": rss, "mb": size / 2**20, "seconds": seconds}))
+
+
+def bench_holdings_memory(n_etfs: int = 3000) -> dict:
+    """
+    Memory of the holdings of a replicated universe, held as one DataFrame per ETF and as `CompactHoldings`.
+    Each mode runs in a fresh interpreter.
+    """
+    universe = make_holdings_universe(n_etfs)
+    results = {"name": "CompactHoldings memory", "size": f"{n_etfs} ETFs"}
+    with tempfile.TemporaryDirectory() as directory:
+        store = NumpyHoldingsStore(directory)
+        store.save_many(universe)
+        results["rows"] = sum(len(df) for df in universe.values())
+        del universe
+
+        for mode in ["frames", "compact"]:
+            code = f"import benchmark; benchmark._holdings_memory_run({directory!r}, {mode!r})"
+            output = subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, check=True
+            )
+            run = json.loads(output.stdout.strip().splitlines()[-1])
+            results[f"{mode}_rss_mb"] = run["rss_mb"]
+            results[f"{mode}_mb"] = run["mb"]
+            results[f"{mode}_seconds"] = run["seconds"]
+    results["reduction"] = results["frames_mb"] / results["compact_mb"]
+    return results
+
+
+def make_holdings_days(n_etfs: int, n_days: int, seed: int = 0):
+    """
+    Daily holdings of a replicated universe, where each day some weights drift and a few holdings are added or removed.
+
+    :return: (generator) (date, long holdings frame with an "etf" column) of each business day.
+    """
+    rng = np.random.default_rng(seed)
+    universe = make_holdings_universe(n_etfs)
+    df = pd.concat(universe, names=["etf", "symbol"]).reset_index(level="etf")
+    for date in pd.bdate_range(end=dt.datetime(2024, 6, 28), periods=n_days):
+        drift = rng.random(len(df)) < 0.1
+        weights = df["weight"].to_numpy().copy()
+        weights[drift] *= rng.uniform(0.9, 1.1, drift.sum())
+        df = df.assign(weight=weights)
+        # Remove about 0.1% of the holdings, and add as many new ones.
+        removed = rng.random(len(df)) < 0.001
+        added = df[removed].copy()
+        added.index = [f"N{date:%Y%m%d}{i}" for i in range(len(added))]
+        df = pd.concat([df[~removed], added])
+        df.index.name = "symbol"
+        yield date, df
+
+
+def _diff_loop(before: pd.DataFrame, after: pd.DataFrame) -> pd.Series:
+    """
+    Per-ETF outer join of two long holdings frames, kept as the reference for `HoldingsHistory.diff_many`.
+    :return: (pd.Series) Number of holdings of each change.
+    """
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    for t, new in after.groupby("etf"):
+        old = before[before["etf"] == t]
+        joined = old[["weight"]].join(
+            new[["weight"]], how="outer", lsuffix="_before", rsuffix="_after"
+        )
+        counts["added"] += int(joined["weight_before"].isna().sum())
+        counts["removed"] += int(joined["weight_after"].isna().sum())
+        both = joined.dropna()
+        counts["changed"] += int((both["weight_after"] != both["weight_before"]).sum())
+    return pd.Series(counts)
+
+
+def bench_holdings_history(n_etfs: int = 500, n_days: int = 60) -> dict:
+    """
+    Append daily snapshots of a universe, then diff every pair of consecutive days and look up one date.
+    The per-ETF join is timed on one pair of days.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        history = HoldingsHistory(directory)
+        append_time = 0.0
+        for date, df in make_holdings_days(n_etfs, n_days):
+            start = time.perf_counter()
+            history.append(date, df)
+            append_time += time.perf_counter() - start
+
+        # Read from disk, like a new session.
+        history = HoldingsHistory(directory)
+        dates = history.dates()
+        start = time.perf_counter()
+        for a, b in zip(dates[:-1], dates[1:]):
+            history.diff_many(a, b)
+        diff_time = time.perf_counter() - start
+        as_of_time = _time(history.as_of_many, dates[n_days // 2])
+
+        before = history.as_of_many(dates[-2])
+        after = history.as_of_many(dates[-1])
+        loop_time = _time(_diff_loop, before, after, repeat=1)
+        disk = sum(
+            os.path.getsize(os.path.join(root, f))
+            for root, _, files in os.walk(directory)
+            for f in files
+        )
+    return {
+        "name": "HoldingsHistory",
+        "size": f"{n_etfs} ETFs x {n_days} days, {len(after)} holdings",
+        "append_per_day": append_time / n_days,
+        "diff_all_days": diff_time,
+        "diff_per_day": diff_time / (n_days - 1),
+        "loop_diff_per_day": loop_time,
+        "as_of_many": as_of_time,
+        "disk_mb": disk / 1e6,
+    }
+
+
+class _SlowSources:
+    """
+    Offline stand-ins for `yf.download` and the holdings scrape, which sleep like network and browser waits.
+    """
+
+    def __init__(
+        self,
+        close: pd.DataFrame,
+        dividends: pd.DataFrame,
+        holdings: dict,
+        price_latency: float,
+        holdings_latency: float,
+    ) -> None:
+        """
+        :param price_latency: Seconds of a price download, plus 1% of it per ticker.
+        :param holdings_latency: Seconds of one holdings fetch.
+        """
+        self.prices = pd.concat({"Close": close, "Dividends": dividends}, axis=1)
+        self.holdings = holdings
+        self.price_latency = price_latency
+        self.holdings_latency = holdings_latency
+
+    def download(self, tickers: list, start, end) -> pd.DataFrame:
+        time.sleep(self.price_latency * (1 + 0.01 * len(tickers)))
+        columns = pd.MultiIndex.from_product([["Close", "Dividends"], tickers])
+        return self.prices[columns]
+
+    def load_holdings(self, ticker: str) -> pd.DataFrame:
+        time.sleep(self.holdings_latency)
+        return self.holdings[ticker]
+
+
+class _StubDownloader:
+    """
+    Offline stand-in for `yf.download`, which records the tickers and dates of every request.
+    While `failing` is True it returns an empty frame, like `yf.download` when a download fails.
+    """
+
+    def __init__(self, close: pd.DataFrame, dividends: pd.DataFrame) -> None:
+        self.prices = pd.concat({"Close": close, "Dividends": dividends}, axis=1)
+        self.calls = []
+        self.failing = False
+
+    def __call__(self, tickers: list, start, end, actions: bool = True):
+        self.calls.append((list(tickers), pd.Timestamp(start), pd.Timestamp(end)))
+        if self.failing:
+            return pd.DataFrame()
+        rows = (self.prices.index >= start) & (self.prices.index < end)
+        columns = pd.MultiIndex.from_product([["Close", "Dividends"], tickers])
+        return self.prices.loc[rows, columns]
+
+
+def bench_price_cache(n_tickers: int = 50, n_days: int = 1260) -> dict:
+    """
+    Read prices through a `PriceCache` backed by a stub downloader: a cold fetch, a warm hit without requests,
+    and a range extension that fetches only the new days.
+    """
+    close, dividends = make_price_data(n_tickers, n_days)
+    stub = _StubDownloader(close, dividends)
+    tickers = list(close.columns)
+    dates = close.index
+    first_end, end = dates[n_days - 60], dates[-1] + pd.Timedelta(days=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = PriceCache(directory, downloader=stub)
+        cold_time = _time(cache.download, tickers, dates[0], first_end, repeat=1)
+        warm_time = _time(cache.download, tickers, dates[0], first_end)
+        extend_time = _time(cache.download, tickers, dates[0], end, repeat=1)
+    return {
+        "name": "PriceCache",
+        "size": f"{n_tickers}x{n_days}",
+        "cold": cold_time,
+        "warm": warm_time,
+        "extend_60_days": extend_time,
+        "requests": cache.requests,
+    }
+
+
+def bench_fetch_pipeline(
+    n_tickers: int = 40, price_latency: float = 0.5, holdings_latency: float = 0.1
+) -> dict:
+    """
+    Fetch prices and holdings from slow local sources serially, like `EtfCompare.create_objects` does,
+    and with the `FetchPipeline`.
+    """
+    close, dividends = make_price_data(n_tickers, 1260)
+    universe = make_holdings_universe(n_tickers)
+    close.columns = dividends.columns = list(universe)
+    sources = _SlowSources(close, dividends, universe, price_latency, holdings_latency)
+    tickers = list(universe)
+
+    start = time.perf_counter()
+    sources.download(tickers, close.index[0], close.index[-1])
+    for t in tickers:
+        sources.load_holdings(t)
+    serial_time = time.perf_counter() - start
+
+    pipeline = FetchPipeline(
+        price_fetcher=sources.download,
+        holdings_fetcher=sources.load_holdings,
+        price_batch_size=10,
+    )
+    start = time.perf_counter()
+    compare = EtfCompare(tickers, close.index[0], close.index[-1], pipeline=pipeline)
+    pipeline_time = time.perf_counter() - start
+    stages = compare.fetch_report["stages"]
+    return {
+        "name": "FetchPipeline",
+        "size": f"{n_tickers} tickers",
+        "serial": serial_time,
+        "pipeline": pipeline_time,
+        "speedup": serial_time / pipeline_time,
+        "prices_seconds": stages["prices"]["seconds"],
+        "holdings_seconds": stages["holdings"]["seconds"],
+    }
+
+
+def bench_instrumentation(n_tickers: int = 200, n_days: int = 2520) -> dict:
+    """
+    Time `compare_dividends` with the instrumentation disabled, enabled, and enabled with cProfile and tracemalloc.
+    """
+    close, dividends = make_price_data(n_tickers, n_days)
+    compare = make_compare(close, dividends)
+    run = lambda: compare.compare_dividends(batch_size=25)
+
+    disabled = _time(run)
+    with instruments.capture():
+        enabled = _time(run)
+    with instruments.capture(profile=True, memory=True):
+        captured = _time(run, repeat=1)
+    report = instruments.report()
+
+    timer_seconds = _time(
+        lambda: [instruments.timer("x").__enter__() for _ in range(100_000)]
+    )
+    return {
+        "name": "instrumentation",
+        "size": f"{n_tickers} tickers x {n_days} days",
+        "disabled": disabled,
+        "enabled": enabled,
+        "profile_and_memory": captured,
+        "disabled_timer_ns": timer_seconds / 100_000 * 1e9,
+        "peak_traced_bytes": report["memory"]["peak_bytes"],
+    }
+
+
+def _import_seconds(statement: str) -> float:
+    """
+    :param statement: Import statement run in a fresh interpreter.
+    :return: (float) Seconds taken by the statement.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; print(time.perf_counter() - start)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def bench_etf_construction(n_etfs: int = 1000) -> dict:
+    """
+    Import time of `etf` in a fresh interpreter, the time of the imports it now defers, and construction time of `Etf`.
+    """
+    return {
+        "name": "Etf.__init__",
+        "size": f"{n_etfs} ETFs",
+        "import_etf": _import_seconds("import etf"),
+        "deferred_imports": _import_seconds("import selenium.webdriver, yfinance"),
+        "construct": _time(lambda: [Etf(f"E{i}") for i in range(n_etfs)]),
+    }
+
+
+def _plot_loop(data: pd.DataFrame, path: str) -> None:
+    """
+    The previous `_create_plot`: one full resolution `plt.plot` per ticker and a legend.
+    Its fixed list of 10 colors is replaced by the default color cycle, since it fails past 10 tickers.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+    for k, v in data.items():
+        plt.plot(v.index, v, label=k)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        plt.legend()
+        plt.savefig(path)
+    plt.close()
+
+
+def bench_plot(n_tickers: int = 500, n_days: int = 5000) -> dict:
+    """
+    Render the prices of many tickers to a PNG file with `_create_plot`, against the full resolution loop.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from line_plot import minmax_decimate, lttb_decimate
+
+    close, dividends = make_price_data(n_tickers, n_days)
+    compare = make_compare(close, dividends)
+    values = close.to_numpy()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "plot.png")
+        result = {
+            "name": "_create_plot",
+            "size": f"{n_tickers} tickers x {n_days} days",
+            "loop": _time(_plot_loop, close, path, repeat=1),
+        }
+        for method in ["minmax", "lttb"]:
+            result[method] = _time(
+                compare._create_plot, close, path=path, method=method, repeat=1
+            )
+        result["image_bytes"] = os.path.getsize(path)
+    result["minmax_decimate"] = _time(minmax_decimate, values, 1000)
+    result["lttb_decimate"] = _time(
+        lttb_decimate, np.arange(n_days, dtype=np.float64), values, 1000
+    )
+    result["speedup"] = result["loop"] / result["minmax"]
+    return result
+
+
+def bench_compare_engine(
+    n_tickers: int = 1000, n_days: int = 5040, workers: list = (1, 2, 4, 8)
+) -> dict:
+    """
+    `compare_dividends` with a `CompareEngine` of each backend and number of workers, against the serial batches.
+    The speedup is bounded by the cores of the machine (`os.cpu_count`).
+    """
+    from compare_engine import CompareEngine
+
+    close, dividends = make_price_data(n_tickers, n_days, frequencies=[4, 12])
+    compare = make_compare(close, dividends)
+    serial = _time(compare.compare_dividends, repeat=1)
+    result = {
+        "name": "compare_dividends engine",
+        "size": f"{n_tickers}x{n_days}",
+        "cpu_count": os.cpu_count(),
+        "serial": serial,
+    }
+    for backend in ["thread", "process"]:
+        for n in workers:
+            with CompareEngine(backend, workers=n) as engine:
+                compare.engine = engine
+                # The first call starts the pool, so it is not timed.
+                compare.compare_dividends()
+                seconds = _time(compare.compare_dividends, repeat=1)
+            result[f"{backend}_{n}"] = seconds
+            result[f"{backend}_{n}_speedup"] = serial / seconds
+    compare.engine = None
+    return result
+
+
+def bench_result_cache(n_tickers: int = 500, n_days: int = 5040) -> dict:
+    """
+    `compare_dividends` and `compare_dividend_growth` with a `ResultCache`: computed, read back, and extended by one
+    appended day, against computing them without a cache.
+    """
+    from result_cache import ResultCache
+
+    close, dividends = make_price_data(n_tickers, n_days, frequencies=[4, 12])
+    full = make_compare(close, dividends)
+    earlier = make_compare(close.iloc[:-1], dividends.iloc[:-1])
+
+    def run(compare):
+        return compare.compare_dividends(), compare.compare_dividend_growth(
+            windows=True
+        )
+
+    result = {
+        "name": "result_cache",
+        "size": f"{n_tickers}x{n_days}",
+        "uncached": _time(run, full, repeat=1),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for label, path in [("memory", None), ("disk", directory)]:
+            earlier.result_cache = full.result_cache = ResultCache(path=path)
+            result[f"{label}_miss"] = _time(run, earlier, repeat=1)
+            result[f"{label}_hit"] = _time(run, earlier, repeat=1)
+            result[f"{label}_append_day"] = _time(run, full, repeat=1)
+        # A new cache on the same folder reads the results back from disk.
+        full.result_cache = ResultCache(path=directory)
+        result["disk_reopen_hit"] = _time(run, full, repeat=1)
+    return result
+
+
+def bench_scrape(workers: int = 2, driver_factory=None) -> dict:
+    """
+    Scrape the bundled holdings back from the local fixture site. Needs Chrome and the driver in "config.json",
+    unless `driver_factory` returns another driver, e.g. a `FixtureDriver`.
+    The fixed sleeps of the previous pagination (1 second per click) are not run, only estimated from the page counts.
+    """
+    from scraper_pool import ScraperPool
+
+    local = load_local_holdings()
+    with tempfile.TemporaryDirectory() as directory:
+        page_counts = write_fixture_site(directory, local)
+        with serve_directory(directory) as base_url:
+            with ScraperPool(
+                workers=workers,
+                holdings_url=f"{base_url}/{{}}/index.html",
+                driver_factory=driver_factory,
+            ) as pool:
+                _, report = pool.scrape(list(local.keys()))
+    return {
+        "name": "_scrape_holdings",
+        "size": f"{len(local)} ETFs, {sum(page_counts.values())} pages",
+        "seconds": report["seconds"],
+        "rows_per_second": report["rows_per_second"],
+        "estimated_sleep_seconds": sum(p + 1 for p in page_counts.values()),
+    }
+
+
+def bench_scrape_offline(workers: int = 2, page_timeout: float = 0.2) -> dict:
+    """
+    `bench_scrape` with `FixtureDriver` browsers, so it runs without Chrome,
+    and the time a scrape takes to fail when a page never loads.
+    """
+    local = load_local_holdings()
+    result = bench_scrape(workers, driver_factory=lambda: FixtureDriver(local))
+    result["name"] = "_scrape_holdings offline"
+
+    ticker = max(local, key=lambda t: len(local[t]))
+    etf = Etf(ticker)
+    etf.holdings_url = "http://fixture/{}/index.html"
+    # Page 1 is the switch to 60 rows.
+    for page in [1, 2]:
+        driver = FixtureDriver(local, stuck_pages=[page])
+        start = time.perf_counter()
+        try:
+            etf._scrape_holdings(browser=driver, page_timeout=page_timeout)
+        except TimeoutError:
+            pass
+        result[f"stuck_page_{page}_seconds"] = time.perf_counter() - start
+    return result
+
+
+def bench_page_weight(driver_path: str = None) -> dict:
+    """
+    Load the fixture pages, with a style sheet, a font, images and a third party script like the real page,
+    in the default browser profile and in the lean one. Needs Chrome and the driver in "config.json".
+
+    The third party host is the same server reached as "localhost", which the lean profile blocks like an ad host.
+    """
+    from browser_profile import BrowserProfile, BLOCKED_URL_PATTERNS, measure_page_loads
+    from etf import _read_config
+
+    driver_path = driver_path or _read_config()["chrome_driver_path"]
+    local = load_local_holdings()
+    profiles = {
+        "default": BrowserProfile(headless=True),
+        "lean": BrowserProfile(
+            headless=True,
+            lean=True,
+            blocked_urls=BLOCKED_URL_PATTERNS + ["*localhost*"],
+        ),
+    }
+    result = {"name": "page_weight"}
+    with tempfile.TemporaryDirectory() as directory:
+        with serve_directory(directory) as base_url:
+            third_party_url = base_url.replace("127.0.0.1", "localhost")
+            page_counts = write_fixture_site(directory, local, third_party_url)
+            urls = [
+                f"{base_url}/{t}/page{p}.html"
+                for t, count in page_counts.items()
+                for p in range(1, count + 1)
+            ]
+            result["size"] = f"{len(urls)} pages"
+            for label, profile in profiles.items():
+                driver = profile.create_driver(driver_path)
+                try:
+                    pages = measure_page_loads(driver, urls)
+                finally:
+                    driver.quit()
+                result[label] = {
+                    "seconds_per_page": sum(p["seconds"] for p in pages) / len(pages),
+                    "bytes_per_page": sum(p["bytes"] for p in pages) / len(pages),
+                    "resources_per_page": sum(p["resources"] for p in pages)
+                    / len(pages),
+                }
+    result["speedup"] = (
+        result["default"]["seconds_per_page"] / result["lean"]["seconds_per_page"]
+    )
+    return result
+
+
+"""----------------------------------- Suite -----------------------------------"""
+
+# Size of each suite run: tickers x days of prices, and ETFs of holdings.
+SUITE_SIZES = {
+    "small": {"tickers": 10, "days": 1260, "etfs": 10},
+    "medium": {"tickers": 100, "days": 2520, "etfs": 100},
+    "large": {"tickers": 500, "days": 5040, "etfs": 1000},
+}
+
+# A case is a regression when it is this many times slower than the baseline, and slower by more than
+# the noise floor in seconds.
+REGRESSION_THRESHOLD = 1.25
+NOISE_SECONDS = 0.01
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"
+)
+
+
+def make_holdings_tables(n_etfs: int, seed: int = 0) -> dict:
+    """
+    :param n_etfs: Number of ETFs.
+    :return: (dict) Ticker mapped to a holdings table indexed by symbol, like `Etf.get_holdings`.
+    """
+    holdings = make_holdings_frame(n_etfs, max(n_etfs * 20, 1000), seed)
+    return {t: df.drop(columns="etf") for t, df in holdings.groupby("etf", sort=False)}
+
+
+def _suite_cases(size: dict, directory: str) -> dict:
+    """
+    :param size: Entry of `SUITE_SIZES`.
+    :param directory: Temporary folder of the holdings store.
+    :return: (dict) Case name mapped to a function without arguments.
+    """
+    close, dividends = make_price_data(
+        size["tickers"], size["days"], frequencies=(4, 12, 2, 1)
+    )
+    compare = make_compare(close, dividends)
+    etfs = {t: Etf(t) for t in close.columns}
+
+    store = NumpyHoldingsStore(directory)
+    store.save_many(make_holdings_tables(size["etfs"]))
+    holders = []
+    for t in store.tickers():
+        etf = Etf(t)
+        etf._holdings_store = store
+        holders.append(etf)
+
+    return {
+        "get_dividends": lambda: [
+            e.get_dividends(close[t], dividends[t]) for t, e in etfs.items()
+        ],
+        "_create_trailing_change": lambda: compare._create_trailing_change(close),
+        "compare_dividends": compare.compare_dividends,
+        "compare_dividend_growth": compare.compare_dividend_growth,
+        "get_holdings": lambda: [e.get_holdings() for e in holders],
+    }
+
+
+def run_suite(sizes: list = None, repeat: int = 3) -> dict:
+    """
+    Time the hot paths of `Etf` and `EtfCompare` on synthetic data of growing size, without network access.
+
+    Parameters
+    ----------
+    sizes : list
+        Keys of `SUITE_SIZES` to run. If None, every size is run.
+    repeat : int
+        Minimum number of runs of each case. Fast cases run until about half a second is spent.
+        The fastest run is reported.
+
+    Returns
+    -------
+    dict
+        "meta": versions and date of the run. "results": "{case}[{size}]" mapped to seconds.
+    """
+    sizes = list(SUITE_SIZES) if sizes is None else sizes
+    results = {}
+    for name in sizes:
+        size = SUITE_SIZES[name]
+        with tempfile.TemporaryDirectory() as directory:
+            for case, func in _suite_cases(size, directory).items():
+                first = _time(func, repeat=1)
+                runs = max(repeat, min(50, int(0.5 / max(first, 1e-6))))
+                results[f"{case}[{name}]"] = min(first, _time(func, repeat=runs - 1))
+    meta = {
+        "date": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sizes": {n: SUITE_SIZES[n] for n in sizes},
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_to_baseline(
+    run: dict,
+    baseline: dict,
+    threshold: float = REGRESSION_THRESHOLD,
+    noise_seconds: float = NOISE_SECONDS,
+) -> pd.DataFrame:
+    """
+    :param run: Output of `run_suite`.
+    :param baseline: Output of an earlier `run_suite`, e.g. read from `BASELINE_PATH`.
+    :param threshold: Ratio of the current time to the baseline time above which a case is a regression.
+    :param noise_seconds: Slowdowns smaller than this are timing noise, never a regression.
+    :return: (pd.DataFrame) One row per case of both runs, with "baseline", "current", "ratio" and "regression".
+    """
+    df = pd.DataFrame(
+        {"baseline": baseline["results"], "current": run["results"]}
+    ).dropna()
+    df["ratio"] = df["current"] / df["baseline"]
+    slower = df["current"] - df["baseline"]
+    df["regression"] = (df["ratio"] > threshold) & (slower > noise_seconds)
+    return df
+
+
+def write_results(run: dict, path: str) -> None:
+    """
+    :param run: Output of `run_suite`.
+    :param path: JSON file written.
+    """
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(run, file, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_results(path: str) -> dict:
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of EtfCompare.")
+    parser.add_argument(
+        "--suite", action="store_true", help="Run the scaling suite only."
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", choices=list(SUITE_SIZES), help="Suite sizes to run."
+    )
+    parser.add_argument("--output", help="JSON file of the suite results.")
+    parser.add_argument(
+        "--baseline", default=BASELINE_PATH, help="JSON file of the baseline results."
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Write the suite results as the new baseline.",
+    )
+    parser.add_argument(
+        "--scrape", action="store_true", help="Also run the browser benchmark."
+    )
+    args = parser.parse_args()
+
+    if args.suite:
+        run = run_suite(args.sizes)
+        if args.output:
+            write_results(run, args.output)
+        if args.save_baseline:
+            write_results(run, args.baseline)
+        elif os.path.exists(args.baseline):
+            report = compare_to_baseline(run, read_results(args.baseline))
+            print(report.to_string(float_format="{:.4f}".format))
+            if report["regression"].any():
+                print(f"[Regressions] {report.index[report['regression']].to_list()}")
+                sys.exit(1)
+        else:
+            print(json.dumps(run["results"], indent=2))
+            print(f"[No Baseline] Run with --save-baseline to write {args.baseline}")
+        sys.exit(0)
+
+    print(bench_dividends())
+    print(bench_trailing_change())
+    print(bench_dividend_growth())
+    print(bench_payout_frequency())
+    print(bench_dividends_memory())
+    print(bench_table_extraction())
+    print(bench_value_parser())
+    print(bench_holdings_load())
+    print(bench_holdings_memory())
+    print(bench_holdings_overlap())
+    print(bench_lookthrough())
+    print(bench_holdings_history())
+    print(bench_holdings_index())
+    print(bench_etf_construction())
+    print(bench_instrumentation())
+    print(bench_price_cache())
+    print(bench_fetch_pipeline())
+    print(bench_plot())
+    print(bench_compare_engine())
+    print(bench_result_cache())
+    print(bench_scrape_offline())
+    if args.scrape:
+        print(bench_scrape())
+        print(bench_page_weight())
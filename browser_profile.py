@@ -0,0 +1,201 @@
+import os
+import time
+
+# Requests blocked by the lean profile. Patterns use the "*" wildcard of `Network.setBlockedURLs`.
+IMAGE_PATTERNS = [
+    "*.png*",
+    "*.jpg*",
+    "*.jpeg*",
+    "*.gif*",
+    "*.svg*",
+    "*.webp*",
+    "*.ico*",
+]
+FONT_PATTERNS = ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"]
+STYLE_PATTERNS = ["*.css*"]
+# Ad, analytics and tracking hosts loaded by the holdings page. The table does not need any of them.
+THIRD_PARTY_PATTERNS = [
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*googletagservices.com*",
+    "*adobedtm.com*",
+    "*omtrdc.net*",
+    "*demdex.net*",
+    "*facebook.net*",
+    "*facebook.com/tr*",
+    "*linkedin.com/px*",
+    "*bing.com/bat*",
+    "*hotjar.com*",
+    "*quantserve.com*",
+    "*scorecardresearch.com*",
+    "*adsrvr.org*",
+    "*criteo.com*",
+    "*taboola.com*",
+    "*outbrain.com*",
+    "*newrelic.com*",
+    "*nr-data.net*",
+    "*optimizely.com*",
+    "*qualtrics.com*",
+    "*onetrust.com*",
+    "*cookielaw.org*",
+]
+BLOCKED_URL_PATTERNS = (
+    IMAGE_PATTERNS + FONT_PATTERNS + STYLE_PATTERNS + THIRD_PARTY_PATTERNS
+)
+
+
+class BrowserProfile:
+    """
+    Settings of the Chrome sessions used by the scraper.
+
+    The default profile matches the previous behaviour: a browser with a window that loads every resource.
+    The lean profile runs headless, waits for the DOM only ("eager" page loads, the table is read by script anyway),
+    and blocks images, fonts, style sheets and ad/analytics hosts with the DevTools protocol before the first page.
+    """
+
+    def __init__(
+        self,
+        headless: bool = False,
+        lean: bool = False,
+        user_data_dir: str = None,
+        blocked_urls: list = None,
+        page_load_strategy: str = None,
+    ) -> None:
+        """
+        :param headless: Boolean to determine if Chrome runs without a window.
+        :param lean: Boolean to determine if resources the table does not need are blocked, and pages load eagerly.
+        :param user_data_dir: Chrome profile folder reused across runs, so the cache and cookies persist. None for a new temporary profile.
+        :param blocked_urls: URL patterns blocked when `lean` is True. Defaults to `BLOCKED_URL_PATTERNS`.
+        :param page_load_strategy: "normal", "eager" or "none". Defaults to "eager" when `lean` is True, else "normal".
+        """
+        self.headless = headless
+        self.lean = lean
+        self.user_data_dir = user_data_dir
+        self.blocked_urls = (
+            list(BLOCKED_URL_PATTERNS) if blocked_urls is None else list(blocked_urls)
+        )
+        self.page_load_strategy = page_load_strategy or ("eager" if lean else "normal")
+
+    @classmethod
+    def from_config(cls, config: dict, **overrides) -> "BrowserProfile":
+        """
+        :param config: Contents of "config.json". Its optional "browser" entry holds the arguments of `BrowserProfile`,
+            e.g. {"headless": true, "lean": true, "user_data_dir": "D:\\ChromeProfile"}.
+        :param overrides: Arguments replacing the ones of the config.
+        :return: (BrowserProfile) Profile of the config.
+        """
+        settings = dict(config.get("browser", {}))
+        settings.update(overrides)
+        return cls(**settings)
+
+    def options(self, user_data_dir: str = None):
+        """
+        :param user_data_dir: Profile folder of this browser. Defaults to `self.user_data_dir`.
+        :return: (webdriver.ChromeOptions) Options of a browser of this profile.
+        """
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--disable-gpu")
+        options.page_load_strategy = self.page_load_strategy
+        if self.headless:
+            options.add_argument("--headless=new")
+        user_data_dir = user_data_dir or self.user_data_dir
+        if user_data_dir:
+            options.add_argument(f"--user-data-dir={os.path.abspath(user_data_dir)}")
+        if self.lean:
+            for argument in [
+                "--blink-settings=imagesEnabled=false",
+                "--disable-extensions",
+                "--disable-background-networking",
+                "--disable-default-apps",
+                "--disable-sync",
+                "--no-first-run",
+                "--mute-audio",
+                "--disable-dev-shm-usage",
+            ]:
+                options.add_argument(argument)
+            options.add_experimental_option(
+                "prefs", {"profile.managed_default_content_settings.images": 2}
+            )
+        return options
+
+    def prepare(self, driver) -> None:
+        """
+        Block the URLs of the profile in a new browser. Must run before the first page is opened.
+
+        :param driver: Chrome WebDriver.
+        """
+        if not self.lean or not self.blocked_urls:
+            return
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_urls})
+
+    def create_driver(self, chrome_driver_path: str, user_data_dir: str = None):
+        """
+        :param chrome_driver_path: Path of the ChromeDriver executable.
+        :param user_data_dir: Profile folder of this browser. Defaults to `self.user_data_dir`.
+        :return: (webdriver.Chrome) Browser of this profile, ready to open pages.
+        """
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        service = Service(executable_path=chrome_driver_path)
+        driver = webdriver.Chrome(service=service, options=self.options(user_data_dir))
+        self.prepare(driver)
+        return driver
+
+
+"""----------------------------------- Measurement Operations -----------------------------------"""
+
+# Load time and bytes of the current page, from the Resource Timing API.
+# transferSize is 0 for cached responses, so the encoded body size is used for them.
+_PAGE_WEIGHT_SCRIPT = """
+const navigation = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+const size = (entry) => entry.transferSize || entry.encodedBodySize || 0;
+return {
+    dom_content_loaded: navigation ? navigation.domContentLoadedEventEnd / 1000 : null,
+    document_bytes: navigation ? size(navigation) : 0,
+    resource_bytes: resources.reduce((total, entry) => total + size(entry), 0),
+    resources: resources.length,
+};
+"""
+
+
+def measure_page_loads(driver, urls: list) -> list:
+    """
+    Open every url and report how long it took and how many bytes were transferred.
+
+    Blocked requests never start, so they are not counted.
+
+    :param driver: Browser to measure, e.g. from `BrowserProfile.create_driver`.
+    :param urls: Pages to open, in order.
+    :return: (list) One dict per page with "url", "seconds" (until `get` returned, which depends on the page load strategy),
+        "dom_content_loaded" (seconds after the navigation started),
+        "bytes" (document and resources, once the page is complete) and "resources" (number of resources loaded).
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    pages = []
+    for url in urls:
+        start = time.perf_counter()
+        driver.get(url)
+        seconds = time.perf_counter() - start
+        # An eager load returns before the resources finish, so wait for them before counting the bytes.
+        WebDriverWait(driver, 30, poll_frequency=0.05).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        weight = driver.execute_script(_PAGE_WEIGHT_SCRIPT)
+        pages.append(
+            {
+                "url": url,
+                "seconds": seconds,
+                "dom_content_loaded": weight["dom_content_loaded"],
+                "bytes": weight["document_bytes"] + weight["resource_bytes"],
+                "resources": weight["resources"],
+            }
+        )
+    return pages
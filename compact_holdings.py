@@ -0,0 +1,321 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from holdings_store import HOLDINGS_COLUMNS, NumpyHoldingsStore, normalize_holdings
+from holdings_overlap import HoldingsMatrix
+
+
+class SecurityTable:
+    """
+    Interned securities shared by every ETF: each (symbol, name) is stored once and referred to by an int32 id.
+
+    The name is part of the key since placeholder symbols like "--" are listed for several securities.
+    """
+
+    def __init__(self) -> None:
+        self._lookup = {}
+        self._symbols = []
+        self._names = []
+        # Distinct symbols, and the position of each security's symbol among them.
+        self._symbol_lookup = {}
+        self._symbol_ids = []
+        self._views = None
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def intern(self, symbols, names) -> np.ndarray:
+        """
+        :param symbols: Symbol of each security to look up.
+        :param names: Name of each security. Securities not in the table are added.
+        :return: (np.ndarray) int32 id of each security.
+        """
+        lookup = self._lookup
+        ids = np.empty(len(symbols), dtype=np.int32)
+        for i, key in enumerate(zip(map(str, symbols), map(str, names))):
+            code = lookup.get(key)
+            if code is None:
+                code = lookup[key] = len(self._symbols)
+                self._symbols.append(key[0])
+                self._names.append(key[1])
+                symbol_id = self._symbol_lookup.setdefault(
+                    key[0], len(self._symbol_lookup)
+                )
+                self._symbol_ids.append(symbol_id)
+                self._views = None
+            ids[i] = code
+        return ids
+
+    def _view(self) -> tuple:
+        if self._views is None:
+            self._views = (
+                pd.Index(np.array(self._symbols, dtype=object), name="symbol"),
+                np.array(self._names, dtype=object),
+                np.array(self._symbol_ids, dtype=np.int64),
+            )
+        return self._views
+
+    @property
+    def symbols(self) -> pd.Index:
+        """
+        :return: (pd.Index) Symbol of each id.
+        """
+        return self._view()[0]
+
+    @property
+    def names(self) -> np.ndarray:
+        """
+        :return: (np.ndarray) Name of each id.
+        """
+        return self._view()[1]
+
+    @property
+    def symbol_ids(self) -> np.ndarray:
+        """
+        :return: (np.ndarray) Position of each id's symbol in `distinct_symbols`, so ids sharing a symbol share it.
+        """
+        return self._view()[2]
+
+    @property
+    def distinct_symbols(self) -> list:
+        return list(self._symbol_lookup)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: (int) Bytes held by the table, counting each string once.
+        """
+        # The symbols and names are the same objects as the lookup keys, so each is counted once.
+        distinct = {id(s): s for s in self._symbols + self._names}.values()
+        strings = sum(sys.getsizeof(s) for s in distinct)
+        containers = [self._lookup, self._symbol_lookup, self._symbols, self._names]
+        keys = sys.getsizeof(("", "")) * len(self._lookup)
+        return (
+            strings
+            + keys
+            + sum(sys.getsizeof(c) for c in containers)
+            + 28 * len(self._symbol_ids)
+        )
+
+
+class _EtfArrays:
+    """
+    Holdings of one ETF as typed arrays. Rows keep the order of the scraped table.
+    """
+
+    __slots__ = ("security", "weight", "shares_held", "market_value")
+
+    def __init__(self, security, weight, shares_held, market_value) -> None:
+        # Copies, so nothing keeps a reference to a caller's frame or a memory mapped file.
+        self.security = np.array(security, dtype=np.int32)
+        self.weight = np.array(weight, dtype=np.float32)
+        self.shares_held = np.array(shares_held, dtype=np.float64)
+        self.market_value = np.array(market_value, dtype=np.float64)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, a).nbytes for a in self.__slots__)
+
+
+def _weights(weights: np.ndarray) -> np.ndarray:
+    """
+    :return: (np.ndarray) float32 weights as float64, rounded to the 7 significant digits float32 keeps,
+        so 7.29 reads back as 7.29 instead of 7.2899999618.
+    """
+    weights = weights.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        digits = 6 - np.floor(np.log10(np.abs(weights)))
+    scale = 10.0 ** np.where(np.isfinite(digits), digits, 0)
+    return np.round(weights * scale) / scale
+
+
+class CompactHoldings:
+    """
+    Holdings of a universe of ETFs without one DataFrame per ETF.
+
+    Securities are interned in one `SecurityTable`, and each ETF keeps int32 security ids, float32 weights and
+    float64 shares held and market values. DataFrames are only built when `frame` or `to_frame` is called.
+    """
+
+    def __init__(self) -> None:
+        self.securities = SecurityTable()
+        self._etfs = {}
+        # Number of times each ETF was added, so frames built from older holdings can be told apart.
+        self._versions = {}
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._etfs
+
+    def __len__(self) -> int:
+        return len(self._etfs)
+
+    def tickers(self) -> list:
+        return list(self._etfs)
+
+    def version(self, ticker: str) -> int:
+        """
+        :return: (int) Number of times the ETF was added or replaced. 0 if it was never added.
+        """
+        return self._versions.get(ticker.upper(), 0)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: (int) Bytes held by the arrays of every ETF and the security table.
+        """
+        return self.securities.nbytes + sum(a.nbytes for a in self._etfs.values())
+
+    """----------------------------------- Build Operations -----------------------------------"""
+
+    def add(self, ticker: str, df: pd.DataFrame) -> None:
+        """
+        :param ticker: ETF added or replaced.
+        :param df: Holdings of the ETF indexed by symbol, as scraped or loaded.
+        """
+        df = normalize_holdings(df)
+        self._set(
+            ticker,
+            _EtfArrays(
+                self.securities.intern(df.index, df["name"].to_numpy(dtype=object)),
+                df["weight"].to_numpy(),
+                df["shares_held"].to_numpy(),
+                df["market_value"].to_numpy(),
+            ),
+        )
+
+    def _set(self, ticker: str, arrays: _EtfArrays) -> None:
+        ticker = ticker.upper()
+        self._etfs[ticker] = arrays
+        self._versions[ticker] = self._versions.get(ticker, 0) + 1
+
+    def add_many(self, holdings: dict) -> None:
+        """
+        :param holdings: Ticker mapped to its holdings indexed by symbol.
+        """
+        for ticker, df in holdings.items():
+            self.add(ticker, df)
+
+    @classmethod
+    def from_store(cls, store, tickers: list = None) -> "CompactHoldings":
+        """
+        :param store: Holdings store to read.
+        :param tickers: ETFs to read. If None, every stored ETF is read.
+        :return: (CompactHoldings) Holdings of the ETFs. A `NumpyHoldingsStore` is read without building DataFrames.
+        """
+        compact = cls()
+        tickers = store.tickers() if tickers is None else tickers
+        if not isinstance(store, NumpyHoldingsStore):
+            for t in tickers:
+                compact.add(t, store.load(t))
+            return compact
+
+        meta = store._read_meta()
+        missing = [t for t in tickers if t not in meta["tickers"]]
+        if missing:
+            raise FileNotFoundError(f"{missing} are not in {store.path}")
+        if not tickers:
+            return compact
+        # Each segment's security table is mapped once, then every ETF is a slice of the mapped codes.
+        segments = {}
+        for t in tickers:
+            segment, start, stop = meta["tickers"][t]
+            if segment not in segments:
+                columns = store._read_columns(segment)
+                ids = compact.securities.intern(
+                    columns["security_symbol"].tolist(),
+                    columns["security_name"].tolist(),
+                )
+                segments[segment] = columns, ids
+            columns, ids = segments[segment]
+            rows = slice(start, stop)
+            compact._set(
+                t,
+                _EtfArrays(
+                    ids[np.asarray(columns["security"][rows])],
+                    columns["weight"][rows],
+                    columns["shares_held"][rows],
+                    columns["market_value"][rows],
+                ),
+            )
+        return compact
+
+    """----------------------------------- View Operations -----------------------------------"""
+
+    def _arrays(self, ticker: str) -> _EtfArrays:
+        try:
+            return self._etfs[ticker.upper()]
+        except KeyError:
+            raise KeyError(f"No holdings loaded for {ticker}") from None
+
+    def frame(self, ticker: str) -> pd.DataFrame:
+        """
+        :param ticker: ETF to return.
+        :return: (pd.DataFrame) Holdings of the ETF indexed by symbol, like `Etf.get_holdings`. Built on each call.
+        """
+        arrays = self._arrays(ticker)
+        return pd.DataFrame(
+            {
+                "name": self.securities.names[arrays.security],
+                "weight": _weights(arrays.weight),
+                "shares_held": arrays.shares_held,
+                "market_value": arrays.market_value,
+            },
+            index=self.securities.symbols[arrays.security],
+        )
+
+    def to_frame(self, tickers: list = None) -> pd.DataFrame:
+        """
+        :param tickers: ETFs to return. If None, every ETF is returned.
+        :return: (pd.DataFrame) Long holdings of the ETFs, like `HoldingsStore.load_many`.
+        """
+        tickers = self.tickers() if tickers is None else tickers
+        if not tickers:
+            return pd.DataFrame(columns=["etf"] + HOLDINGS_COLUMNS)
+        arrays = [self._arrays(t) for t in tickers]
+        lengths = [len(a.security) for a in arrays]
+        security = np.concatenate([a.security for a in arrays])
+        df = pd.DataFrame(
+            {
+                "etf": np.repeat(np.array(tickers, dtype=object), lengths),
+                "name": self.securities.names[security],
+                "weight": _weights(np.concatenate([a.weight for a in arrays])),
+                "shares_held": np.concatenate([a.shares_held for a in arrays]),
+                "market_value": np.concatenate([a.market_value for a in arrays]),
+            },
+            index=self.securities.symbols[security],
+        )
+        return df
+
+    def to_matrix(self, tickers: list = None) -> HoldingsMatrix:
+        """
+        :param tickers: ETFs of the rows. If None, every ETF is used.
+        :return: (HoldingsMatrix) Weights of the ETFs, built from the ids without a DataFrame.
+            Like `HoldingsMatrix.from_holdings`, holdings without a positive weight are left out
+            and a symbol listed twice in an ETF counts once, at its largest weight.
+        """
+        tickers = self.tickers() if tickers is None else list(tickers)
+        arrays = [self._arrays(t) for t in tickers]
+        lengths = [len(a.security) for a in arrays]
+        etf_ids = np.repeat(np.arange(len(tickers), dtype=np.int64), lengths)
+        security = np.concatenate([a.security for a in arrays] + [[]]).astype(np.int64)
+        # Securities sharing a symbol (with different names) are one column, like in `from_holdings`.
+        symbol = self.securities.symbol_ids[security]
+        weights = _weights(np.concatenate([a.weight for a in arrays] + [[]]))
+
+        held = weights > 0
+        keys = (etf_ids[held] << 32) | symbol[held]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        largest = np.full(len(keys), -np.inf)
+        np.maximum.at(largest, inverse, weights[held])
+
+        # Only the symbols held become columns.
+        used, columns = np.unique(keys & 0xFFFFFFFF, return_inverse=True)
+        return HoldingsMatrix(
+            tickers,
+            [self.securities.distinct_symbols[i] for i in used],
+            keys >> 32,
+            columns,
+            largest,
+        )
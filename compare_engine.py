@@ -0,0 +1,308 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from etf import (
+    get_dividend_frame,
+    get_trailing_change,
+    detect_payout_frequency,
+    _trailing_sum,
+    _window_start,
+)
+from dividend_store import DividendStore
+from instrumentation import instruments
+
+BACKENDS = ["serial", "thread", "process"]
+
+
+def dividend_values(
+    close: pd.DataFrame, dividends: pd.DataFrame, ttm: bool = False
+) -> np.ndarray:
+    """
+    :param close: Close prices, one column per ticker.
+    :param dividends: Dividends with the same columns.
+    :param ttm: See `EtfCompare.compare_dividends`.
+    :return: (np.ndarray) (n_dates, n_tickers, 3) dividend, annual yield and dividend growth of every ticker,
+        the fields of `DividendStore.FIELDS`.
+    """
+    with instruments.timer("dividend_frame"):
+        divs = get_dividend_frame(close, dividends, ttm=ttm)
+    dividend = divs.xs("dividend", axis=1, level=1)
+    annual_yield = divs.xs("annual_yield", axis=1, level=1)
+    with instruments.timer("trailing_change"):
+        growth = get_trailing_change(dividend)
+    return np.stack(
+        [dividend.to_numpy(), annual_yield.to_numpy(), growth.to_numpy()], axis=2
+    )
+
+
+def extend_dividend_values(
+    previous: np.ndarray,
+    close: pd.DataFrame,
+    dividends: pd.DataFrame,
+    ttm: bool = False,
+) -> np.ndarray:
+    """
+    Extend the result of `dividend_values` to rows appended to its prices, computing only what the new rows change.
+
+    Tickers paying in the new rows are computed again, since a payout changes the days before it and can change
+    the detected payout frequency. For the others the earlier rows stay the same, and the new rows carry the last payout.
+
+    :param previous: (n_rows, n_tickers, 3) result of `dividend_values` for the first rows of the prices.
+    :param close: Close prices with the earlier rows followed by the new rows. The earlier rows must not have changed.
+    :param dividends: Dividends with the same index and columns.
+    :param ttm: See `EtfCompare.compare_dividends`.
+    :return: (np.ndarray) Same as `dividend_values(close, dividends, ttm)`, in the dtype of `previous`.
+        With `ttm`, the trailing sums of the new rows are summed over their window only,
+        so they can differ from a full computation by floating point rounding.
+    """
+    rows = len(previous)
+    values = np.empty((len(dividends),) + previous.shape[1:], dtype=previous.dtype)
+    values[:rows] = previous
+    new_payouts = (np.nan_to_num(dividends.iloc[rows:].to_numpy(dtype=float)) > 0).any(
+        axis=0
+    )
+    paying = np.flatnonzero(new_payouts)
+    if len(paying):
+        values[:, paying] = dividend_values(
+            close.iloc[:, paying], dividends.iloc[:, paying], ttm=ttm
+        )
+
+    others = np.flatnonzero(~new_payouts)
+    if len(others):
+        # The payouts are read from the dividends rather than from `previous`, which may be rounded to float32.
+        payouts = np.nan_to_num(dividends.iloc[:, others].to_numpy(dtype=float))
+        paid = payouts > 0
+        columns = np.arange(len(others))
+        last = np.where(
+            paid.any(axis=0),
+            payouts[len(paid) - 1 - paid[::-1].argmax(axis=0), columns],
+            np.nan,
+        )
+        # The first row carries the first payout after it, or the last payout if there is none.
+        anchor = np.where(
+            paid[1:].any(axis=0), payouts[1 + paid[1:].argmax(axis=0), columns], last
+        )
+
+        # Same arithmetic as `get_dividend_frame` and `get_trailing_change`, for the new rows only.
+        dividend = np.broadcast_to(last, (len(dividends) - rows, len(others)))
+        price = close.iloc[rows:, others].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if ttm:
+                index = pd.to_datetime(dividends.index)
+                start = max(_window_start(index)[rows], 0)
+                trailing = _trailing_sum(payouts[start:], index[start:])[rows - start :]
+                annual_yield = (trailing / price) * 100
+            else:
+                periods = (
+                    detect_payout_frequency(dividends.iloc[:, others])
+                    .fillna(4)
+                    .to_numpy()
+                )
+                annual_yield = ((dividend / price) * 100) * periods
+            growth = ((dividend - anchor) / anchor) * 100
+        values[rows:, others] = np.stack([dividend, annual_yield, growth], axis=2)
+    return values
+
+
+"""----------------------------------- Shared Memory Operations -----------------------------------"""
+
+
+def _share(shape: tuple, dtype, values: np.ndarray = None) -> tuple:
+    """
+    :param shape: Shape of the array.
+    :param dtype: Dtype of the array.
+    :param values: Values copied to the block. If None, the block is left uninitialized.
+    :return: (tuple[SharedMemory, tuple]) A new block (1 byte for empty arrays),
+        and the (name, shape, dtype) a worker needs to attach to it.
+    """
+    dtype = np.dtype(dtype)
+    block = shared_memory.SharedMemory(
+        create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1)
+    )
+    if values is not None:
+        np.ndarray(shape, dtype=dtype, buffer=block.buf)[...] = values
+    return block, (block.name, tuple(shape), dtype.str)
+
+
+def _attach(spec: tuple) -> tuple:
+    """
+    :param spec: (name, shape, dtype) returned by `_share`.
+    :return: (tuple[SharedMemory, np.ndarray]) The block, and an array over it without a copy.
+    """
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _shard_in_process(specs: dict, columns: tuple, ttm: bool) -> None:
+    """
+    Compute one shard of tickers inside a worker process, reading the prices from and writing the result to shared memory.
+
+    :param specs: "index", "close", "dividends" and "output" mapped to the spec of their block.
+    :param columns: (start, stop) of the shard's tickers.
+    """
+    blocks = {}
+    try:
+        arrays = {}
+        for key, spec in specs.items():
+            blocks[key], arrays[key] = _attach(spec)
+        start, stop = columns
+        index = pd.DatetimeIndex(arrays["index"])
+        close = pd.DataFrame(arrays["close"][:, start:stop], index=index, copy=False)
+        dividends = pd.DataFrame(
+            arrays["dividends"][:, start:stop], index=index, copy=False
+        )
+        arrays["output"][:, start:stop] = dividend_values(close, dividends, ttm=ttm)
+        del close, dividends, index, arrays
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+class CompareEngine:
+    """
+    Runs the per-ticker analytics of `EtfCompare` over shards of the tickers, serially, in a thread pool or in a process pool.
+
+    Every shard writes its own columns of one result array, so the output is in the order of the tickers whatever the
+    order the shards finish in. The process backend passes the prices to the workers and gets the results back through
+    shared memory blocks, so no DataFrame is pickled.
+    """
+
+    def __init__(self, backend: str = "serial", workers: int = None) -> None:
+        """
+        :param backend: "serial", "thread" or "process".
+        :param workers: Number of threads or processes. Defaults to the number of CPU cores.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shut down the worker pool, if one was started. It is started again on the next call.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None and self.backend != "serial":
+            if self.backend == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _shards(self, n_tickers: int, shard_size: int) -> list:
+        """
+        :return: (list) (start, stop) columns of each shard: at most `shard_size` tickers, and at least one shard per worker.
+        """
+        if self.backend != "serial":
+            shard_size = min(shard_size, -(-n_tickers // self.workers))
+        shard_size = max(shard_size, 1)
+        return [
+            (i, min(i + shard_size, n_tickers)) for i in range(0, n_tickers, shard_size)
+        ]
+
+    """----------------------------------- Compute Operations -----------------------------------"""
+
+    def dividend_values(
+        self,
+        close: pd.DataFrame,
+        dividends: pd.DataFrame,
+        ttm: bool = False,
+        dtype=None,
+        shard_size: int = 250,
+    ) -> np.ndarray:
+        """
+        Compute `dividend_values` for every ticker, one shard of tickers per task.
+
+        Parameters
+        ----------
+        close : pd.DataFrame
+            Close prices, one column per ticker.
+        dividends : pd.DataFrame
+            Dividends with the same index and columns.
+        ttm : bool
+            See `EtfCompare.compare_dividends`.
+        dtype : np.dtype
+            Dtype of the result. Defaults to float64.
+        shard_size : int
+            Maximum number of tickers per task, which bounds the intermediate frames of each worker.
+
+        Returns
+        -------
+        np.ndarray
+            (n_dates, n_tickers, 3) dividend, annual yield and dividend growth, in the order of the columns.
+        """
+        n_dates, n_tickers = dividends.shape
+        output = np.empty(
+            (n_dates, n_tickers, len(DividendStore.FIELDS)), dtype=dtype or np.float64
+        )
+        shards = self._shards(n_tickers, shard_size)
+        if self.backend == "process":
+            self._run_processes(close, dividends, output, shards, ttm)
+            return output
+
+        def run(columns):
+            start, stop = columns
+            output[:, start:stop] = dividend_values(
+                close.iloc[:, start:stop], dividends.iloc[:, start:stop], ttm=ttm
+            )
+
+        if self.backend == "serial":
+            for columns in shards:
+                run(columns)
+        else:
+            # Consuming the results re-raises the first error of a shard.
+            list(self.executor.map(run, shards))
+        return output
+
+    def _run_processes(
+        self,
+        close: pd.DataFrame,
+        dividends: pd.DataFrame,
+        output: np.ndarray,
+        shards: list,
+        ttm: bool,
+    ) -> None:
+        """
+        Copy the inputs to shared memory, let the worker processes fill the shared result, and copy it to `output`.
+        """
+        index = pd.DatetimeIndex(dividends.index).to_numpy(dtype="datetime64[ns]")
+        blocks = {}
+        try:
+            specs = {}
+            for key, values in [
+                ("index", index),
+                ("close", close.to_numpy(dtype=np.float64)),
+                ("dividends", dividends.to_numpy(dtype=np.float64)),
+            ]:
+                blocks[key], specs[key] = _share(values.shape, values.dtype, values)
+            blocks["output"], specs["output"] = _share(output.shape, output.dtype)
+            futures = [
+                self.executor.submit(_shard_in_process, specs, columns, ttm)
+                for columns in shards
+            ]
+            for future in futures:
+                future.result()
+            output[...] = np.ndarray(
+                output.shape, dtype=output.dtype, buffer=blocks["output"].buf
+            )
+        finally:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
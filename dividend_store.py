@@ -0,0 +1,108 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class DividendStore:
+    """
+    Output of `EtfCompare.compare_dividends` in one folder of NumPy arrays, written one batch of tickers at a time.
+
+    Files:
+        - "meta.json": dates, tickers, fields and dtype.
+        - "{field}.npy": one days x tickers array per field (Fortran order), read with memory mapping.
+    """
+
+    FIELDS = ["dividend", "annual_yield", "dividend_growth"]
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_meta(self) -> dict:
+        with open(self._file("meta.json"), "r") as file:
+            return json.load(file)
+
+    def write(self, batches, index: pd.DatetimeIndex, tickers: list, dtype=np.float32):
+        """
+        Append every batch to the files as it arrives, so only one batch is held in memory.
+
+        The arrays are stored in Fortran order, so the values of a batch of tickers are one contiguous block of the file.
+
+        :param batches: Iterable of DataFrames with (ticker, field) columns, covering `tickers` in order.
+        :param index: Dates of the rows.
+        :param tickers: Every ticker of the batches.
+        :param dtype: Dtype of the stored values.
+        :return: (list) Tickers written.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        dtype = np.dtype(dtype)
+        header = {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": True,
+            "shape": (len(index), len(tickers)),
+        }
+        # Write to temporary files first, so readers never see a half written store.
+        files = {f: open(self._file(f"{f}.tmp.npy"), "wb") for f in self.FIELDS}
+        try:
+            for file in files.values():
+                np.lib.format.write_array_header_1_0(file, header)
+
+            column = 0
+            for batch in batches:
+                batch_tickers = list(dict.fromkeys(batch.columns.get_level_values(0)))
+                if batch_tickers != tickers[column : column + len(batch_tickers)]:
+                    raise ValueError(f"Batch {batch_tickers[:3]}... is out of order")
+                for f, file in files.items():
+                    values = batch.xs(f, axis=1, level=1).to_numpy()
+                    np.ascontiguousarray(values.T, dtype=dtype).tofile(file)
+                column += len(batch_tickers)
+            if column != len(tickers):
+                raise ValueError(f"Batches covered {column} of {len(tickers)} tickers")
+        finally:
+            for file in files.values():
+                file.close()
+
+        for f in self.FIELDS:
+            os.replace(self._file(f"{f}.tmp.npy"), self._file(f"{f}.npy"))
+        meta = {
+            "index": [d.isoformat() for d in pd.to_datetime(index)],
+            "tickers": list(tickers),
+            "fields": self.FIELDS,
+            "dtype": dtype.name,
+        }
+        with open(self._file("meta.json.tmp"), "w") as file:
+            json.dump(meta, file)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+        return list(tickers)
+
+    def tickers(self) -> list:
+        return self._read_meta()["tickers"]
+
+    def load(self, tickers: list = None, fields: list = None) -> pd.DataFrame:
+        """
+        :param tickers: Tickers to load. If None, every ticker is loaded.
+        :param fields: Fields to load. If None, every field is loaded.
+        :return: (pd.DataFrame) Columns are a MultiIndex of (ticker, field), like `EtfCompare.compare_dividends`.
+        """
+        meta = self._read_meta()
+        tickers = meta["tickers"] if tickers is None else tickers
+        fields = self.FIELDS if fields is None else fields
+        lookup = {t: i for i, t in enumerate(meta["tickers"])}
+        missing = [t for t in tickers if t not in lookup]
+        if missing:
+            raise KeyError(f"{missing} are not in {self.path}")
+        columns = np.array([lookup[t] for t in tickers], dtype=np.int64)
+
+        arrays = [
+            np.load(self._file(f"{f}.npy"), mmap_mode="r")[:, columns] for f in fields
+        ]
+        data = np.stack(arrays, axis=2)
+        return pd.DataFrame(
+            data.reshape(len(meta["index"]), len(tickers) * len(fields)),
+            index=pd.DatetimeIndex(meta["index"]),
+            columns=pd.MultiIndex.from_product([tickers, fields]),
+        )
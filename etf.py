@@ -1,25 +1,21 @@
 import os
 import json
-import time
-import yfinance as yf
+import functools
+import datetime as dt
+import numpy as np
 import pandas as pd
 
-from etfpy import ETF, load_etf, get_available_etfs_list
-
-# Selenium imports
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import (
-    NoSuchElementException,
-    TimeoutException,
-    StaleElementReferenceException,
-)
+# Selenium is imported inside the browser and scraping methods, so reading holdings and dividends does not load it.
 
 import logging
 
+from holdings_store import CsvHoldingsStore, get_holdings_store, normalize_holdings
+from holdings_history import get_holdings_history
+from holdings_index import get_holdings_index
+from value_parser import parse_numbers
+from instrumentation import instruments
+from browser_profile import BrowserProfile
+
 # Suppress logging from Selenium and other related modules
 logging.getLogger("selenium").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -31,60 +27,119 @@ cwd = os.getcwd()
 
 
 class Etf:
-    def __init__(self, ticker: str) -> None:
+    def __init__(self, ticker: str, universe=None) -> None:
+        """
+        :param ticker: Ticker of the ETF.
+        :param universe: Optional `CompactHoldings` shared by many ETFs. If given, the holdings are kept in it
+            as compact arrays, and `holdings` builds a DataFrame from them once, until the ETF is added to it again.
+        """
         self.ticker = ticker.upper()
-
-        self.chrome_driver_path = self._get_chrome_driver_path()
-        self.base_export_path = self._get_data_export_path()
-        os.makedirs(self.base_export_path, exist_ok=True)  # Create folder for ROIC data
+        self.universe = universe
         self.holdings_url = "https://www.schwab.wallst.com/schwab/Prospect/research/etfs/schwabETF/index.asp?type=holdings&symbol={}"
 
-        """ -- Chromedriver options -- """
-        self.chrome_options = webdriver.ChromeOptions()
-        self.chrome_options.add_argument("--disable-gpu")
+        # Config, the holdings store, the browser profile and holdings are loaded on first access.
+        self._holdings = None
+        # Version of the universe's holdings `_holdings` was built from.
+        self._holdings_version = None
+        self._holdings_store = None
+        self._holdings_history = None
+        self._holdings_index = None
+        self._browser_profile = None
+
+    """-----------------------------------"""
+
+    @property
+    def holdings(self) -> pd.DataFrame:
+        """
+        Holdings of the ETF, read (or scraped) the first time they are accessed.
+
+        With a `universe`, the same frame is returned until the ETF's holdings in the universe are replaced,
+        so changes made to it are kept until then.
+        """
+        if self.universe is not None:
+            if self.ticker not in self.universe:
+                self.universe.add(self.ticker, self.get_holdings())
+            version = self.universe.version(self.ticker)
+            if self._holdings is None or self._holdings_version != version:
+                self._holdings = self.universe.frame(self.ticker)
+                self._holdings_version = version
+            return self._holdings
+        if self._holdings is None:
+            self._holdings = self.get_holdings()
+        return self._holdings
+
+    @holdings.setter
+    def holdings(self, df: pd.DataFrame) -> None:
+        if self.universe is not None:
+            self.universe.add(self.ticker, df)
+            # Built again from the universe on the next access.
+            self._holdings = None
+        else:
+            self._holdings = df
+
+    @property
+    def base_export_path(self) -> str:
+        return self._get_data_export_path()
+
+    @property
+    def chrome_driver_path(self) -> str:
+        return self._get_chrome_driver_path()
+
+    @property
+    def holdings_store(self):
+        if self._holdings_store is None:
+            self._holdings_store = get_holdings_store(
+                self.base_export_path, _read_config().get("holdings_store", "numpy")
+            )
+        return self._holdings_store
+
+    @property
+    def holdings_history(self):
+        if self._holdings_history is None:
+            self._holdings_history = get_holdings_history(self.base_export_path)
+        return self._holdings_history
+
+    @property
+    def holdings_index(self):
+        if self._holdings_index is None:
+            self._holdings_index = get_holdings_index(self.base_export_path)
+        return self._holdings_index
+
+    @property
+    def browser_profile(self) -> BrowserProfile:
+        if self._browser_profile is None:
+            self._browser_profile = BrowserProfile.from_config(_read_config())
+        return self._browser_profile
+
+    @browser_profile.setter
+    def browser_profile(self, profile: BrowserProfile) -> None:
+        self._browser_profile = profile
 
-        # Fill in data for etf.
-        self.holdings = self.get_holdings()
+    @property
+    def chrome_options(self):
+        return self.browser_profile.options()
 
     """-----------------------------------"""
 
     def _get_data_export_path(self):
-        try:
-            internal_path = f"{os.getcwd()}\\config.json"
-            with open(internal_path, "r") as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            external_path = f"{os.getcwd()}\\EtfCompare\\config.json"
-            with open(external_path, "r") as file:
-                data = json.load(file)
-        return data["data_export_path"]
+        return _read_config()["data_export_path"]
 
     """-----------------------------------"""
     """----------------------------------- Browser Operations -----------------------------------"""
 
     def _get_chrome_driver_path(self):
-        try:
-            internal_path = f"{os.getcwd()}\\config.json"
-            with open(internal_path, "r") as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            external_path = f"{os.getcwd()}\\EtfCompare\\config.json"
-            with open(external_path, "r") as file:
-                data = json.load(file)
-        return data["chrome_driver_path"]
+        return _read_config()["chrome_driver_path"]
 
     def _create_browser(self, url=None):
         """
-        :param url: The website to visit.
+        :param url: The website to visit. Defaults to the holdings page of the ETF.
         :return: None
         """
-        service = Service(executable_path=self.chrome_driver_path)
-        self.browser = webdriver.Chrome(service=service, options=self.chrome_options)
-        # Default browser route
-        if url == None:
-            self.browser.get(url=self.sec_annual_url)
-        # External browser route
-        else:
+        with instruments.timer("browser_start", self.ticker):
+            self.browser = self.browser_profile.create_driver(self.chrome_driver_path)
+        if url is None:
+            url = self.holdings_url.format(self.ticker)
+        with instruments.timer("page_load", self.ticker):
             self.browser.get(url=url)
 
     def _clean_close(self) -> None:
@@ -100,14 +155,20 @@ class Etf:
         :param wait_time: Integer that represents how many seconds selenium should wait, if wait is True.
         :return: (str) Text of the element.
         """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
+        instruments.count("webdriver_calls", ticker=self.ticker)
         if wait:
             try:
-                data = (
-                    WebDriverWait(self.browser, _wait_time)
-                    .until(EC.presence_of_element_located((By.XPATH, xpath)))
-                    .text
-                )
+                with instruments.timer("element_wait", self.ticker):
+                    data = (
+                        WebDriverWait(self.browser, _wait_time)
+                        .until(EC.presence_of_element_located((By.XPATH, xpath)))
+                        .text
+                    )
             except TimeoutException:
                 print(f"[Failed Xpath] {xpath}")
                 if tag != "":
@@ -138,16 +199,22 @@ class Etf:
         :param wait_time: Integer that represents how many seconds selenium should wait, if wait is True.
         :return: None. Because this function clicks the button but does not return any information about the button or any related web elements.
         """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
+        instruments.count("webdriver_calls", ticker=self.ticker)
         if wait:
             try:
-                element = WebDriverWait(self.browser, _wait_time).until(
-                    EC.presence_of_element_located((By.XPATH, xpath))
-                )
-                # If the webdriver needs to scroll before clicking the element.
-                if scroll:
-                    self.browser.execute_script("arguments[0].click();", element)
-                element.click()
+                with instruments.timer("click", self.ticker):
+                    element = WebDriverWait(self.browser, _wait_time).until(
+                        EC.presence_of_element_located((By.XPATH, xpath))
+                    )
+                    # If the webdriver needs to scroll before clicking the element.
+                    if scroll:
+                        self.browser.execute_script("arguments[0].click();", element)
+                    element.click()
             except TimeoutException:
                 print(f"[Failed Xpath] {xpath}")
                 if tag != "":
@@ -165,158 +232,261 @@ class Etf:
         """
         Get holdings of an ETF.
         Will try to read data locally first.
-        If it does not exist locally, it will scrape new data, and save it in the respective folder.
+        If it does not exist locally, it will scrape new data, and save it in the holdings store.
         """
+        with instruments.timer("get_holdings", self.ticker):
+            try:
+                df = self.holdings_store.load(self.ticker)
+                instruments.count("holdings_store_hits", ticker=self.ticker)
+                return df
+            except FileNotFoundError:
+                pass
+            # Holdings saved before the store existed are kept as "{ticker}/holdings.csv".
+            try:
+                df = CsvHoldingsStore(self.base_export_path).load(self.ticker)
+            except FileNotFoundError:
+                instruments.count("holdings_scrapes", ticker=self.ticker)
+                return self.save_holdings(self._scrape_holdings())
+            instruments.count("holdings_csv_hits", ticker=self.ticker)
+            # The date of the csv holdings is unknown, so they are not added to the history.
+            return self.save_holdings(df, snapshot=False)
 
-        # Make a directory for the ETF if one does not exist.
-        etf_folder = f"{self.base_export_path}\\{self.ticker}"
-        holdings_file = f"{etf_folder}\\holdings.csv"
-        os.makedirs(etf_folder, exist_ok=True)
-        try:
-
-            df = pd.read_csv(holdings_file)
-            df.set_index("symbol", inplace=True)
-            return df
-        except FileNotFoundError:
-            df = self._scrape_holdings()
-            df.to_csv(holdings_file)
-            return df
+    def save_holdings(
+        self, df: pd.DataFrame, snapshot: bool = True, date=None, store: bool = True
+    ) -> pd.DataFrame:
+        """
+        :param df: Holdings to save in the holdings store, indexed by symbol.
+        :param snapshot: Boolean to determine if the holdings are also added to the holdings history.
+        :param date: Date of the snapshot. Defaults to today.
+        :param store: Boolean to determine if the holdings are written to the holdings store.
+            False when the caller saved them already, e.g. with one `save_many` for many ETFs.
+        :return: (pd.DataFrame) The saved holdings, with "weight" as a float in percent.
+        """
+        df = normalize_holdings(df)
+        if store:
+            self.holdings_store.save(self.ticker, df)
+        # Keep the reverse index current, once it has been built.
+        if self.holdings_index.exists():
+            self.holdings_index.update(self.ticker, df)
+        if snapshot:
+            self.holdings_history.append(date or dt.date.today(), {self.ticker: df})
+        self.holdings = df
+        return df
 
     def get_dividends(
         self,
         close: pd.Series,
         dividends: pd.Series,
-        quarterly: bool = True,
+        quarterly: bool = False,
         biannual: bool = False,
         monthly: bool = False,
+        ttm: bool = False,
+        vectorized: bool = True,
     ):
-
-        d_index = 0
-        d_indexes = {}
-        prev_timestamp = dividends.index[0]
-        sections = []
-        # Search indexes where a dividend occurs.
-        for i in range(len(dividends)):
-            current_timestamp = dividends.index[i]
-            d = dividends.iloc[d_index]
-            if d > 0:
-                d_indexes[dividends.index[i]] = d.item()
-                data = {
-                    "start": prev_timestamp,
-                    "end": current_timestamp,
-                    "value": d.item(),
-                }
-                sections.append(data)
-                prev_timestamp = current_timestamp
-            d_index += 1
-
-        # Add last section.
-        sections.append(
-            {
-                "start": sections[-1]["end"],
-                "end": dividends.index[-1],
-                "value": sections[-1]["value"],
-            }
-        )
-        df = pd.DataFrame(index=dividends.index, columns=["close", "dividend"])
-        df["close"] = close
-        df.index = pd.to_datetime(df.index)
-        # df.index = pd.to_datetime(df.index)
-        for s in sections:
-            df.loc[s["start"] : s["end"], "dividend"] = s["value"]
-
-        # Calculate the yield
-        df["close"] = close
-        df["yield"] = (df["dividend"] / df["close"]) * 100
-
+        """
+        :param close: Close prices of the ETF.
+        :param dividends: Dividends of the ETF, 0 on days without a payout.
+        :param quarterly: Annualize the yield with 4 payouts per year.
+        :param biannual: Annualize the yield with 2 payouts per year.
+        :param monthly: Annualize the yield with 12 payouts per year.
+        :param ttm: Boolean to determine if the annual yield is the sum of the payouts of the last 365 days divided by the price.
+        :param vectorized: Boolean to determine if the single pass engine is used instead of the per-row loop.
+        :return: (pd.DataFrame) Columns "close", "dividend", "yield" and "annual_yield".
+        """
         if quarterly:
-            df["annual_yield"] = df["yield"] * 4
+            periods_per_year = 4
         elif biannual:
-            df["annual_yield"] = df["yield"] * 2
+            periods_per_year = 2
         elif monthly:
-            df["annual_yield"] = df["yield"] * 12
-        # No parameter is chosen, default to quarterly, since that is the frequency of the majority of companies.
+            periods_per_year = 12
+        # No parameter is chosen, detect the frequency from the spacing of the payouts.
         else:
-            df["annual_yield"] = df["yield"] * 4
+            periods_per_year = None
+
+        if not vectorized:
+            if periods_per_year is None:
+                detected = detect_payout_frequency(dividends.to_frame(self.ticker))
+                # Default to quarterly, since that is the frequency of the majority of companies.
+                periods_per_year = detected.fillna(4).iloc[0]
+            return _get_dividends_loop(close, dividends, periods_per_year)
+
+        frame = get_dividend_frame(
+            close.to_frame(self.ticker),
+            dividends.to_frame(self.ticker),
+            periods_per_year,
+            ttm=ttm,
+        )
+        df = frame[self.ticker].copy()
+        df.insert(0, "close", close)
         return df
 
     """----------------------------------- Scraping Operations -----------------------------------"""
 
-    def _scrape_holdings(self):
-        # Button to display 60 rows in the table.
-        display_60_elements_button_xpath = "/html/body/div[1]/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/div/ul[1]/li[4]"
-        # Xpath for "Next Page" button.
-        next_path_xpath = "/html/body/div[1]/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/div/ul[2]/li[7]/a"
-        # next_path_xpath = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/div/ul[2]/li[6]/a"
-        # Controls which page number the scraper is on.
-        page_num = 3
-        page_num_xpath = "/html/body/div[1]/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/div/ul[2]/li[{}]/a"
-        # Booleans to control loop.
-        elements_available = True
+    def _scrape_holdings(self, browser=None, page_timeout: float = 10):
+        """
+        :param browser: An open WebDriver to reuse. If None, a new browser is created and closed when done.
+        :param page_timeout: Seconds to wait for the table to change after clicking to another page.
+        :return: (pd.DataFrame) Holdings indexed by symbol. Raises TimeoutError if a page does not load.
+        """
+        with instruments.timer("scrape", self.ticker):
+            df = self._scrape_pages(browser, page_timeout)
+        instruments.count("rows_scraped", len(df), ticker=self.ticker)
+        return df
 
-        self._create_browser(self.holdings_url.format(self.ticker))
+    def _scrape_pages(self, browser=None, page_timeout: float = 10):
         """
-        Logic Here 
+        Body of `_scrape_holdings`.
         """
-        # Display 60 rows of data.
-        tickers = []
+        if browser is None:
+            self._create_browser(self.holdings_url.format(self.ticker))
+        else:
+            self.browser = browser
+            with instruments.timer("page_load", self.ticker):
+                self.browser.get(url=self.holdings_url.format(self.ticker))
+        try:
+            rows = self._read_pages(page_timeout)
+        finally:
+            # Browsers passed in belong to the caller, so only close the ones created here.
+            if browser is None:
+                self._clean_close()
 
-        self._scrape_table()
-        page_data = {}
-        cur_page = 1
-        index = 0
-        while elements_available:
-            # This button only needs to be clicked on the first iteration.
-            if index == 0:
-                self._click_button(display_60_elements_button_xpath, wait=True)
-                time.sleep(1)
-
-            tickers = self._scrape_table()
-            page_data[cur_page] = tickers
-
-            # CLick the "Next Page" button.
-            if page_num % 7 == 0:
-                try:
-                    self._click_button(next_path_xpath)
-                    page_num = 2
-                    cur_page += 1
-                    time.sleep(1)
-                except NoSuchElementException:
-                    elements_available = False
-            else:
-                try:
-                    self._click_button(page_num_xpath.format(page_num))
-                    page_num += 1
-                    cur_page += 1
-                    time.sleep(1)
-                except NoSuchElementException:
-                    elements_available = False
-
-            index += 1
-        # Consolidate data from all pages into one list.
-        consolidated_data = []
-
-        for key, value in page_data.items():
-            for v in value:
-                consolidated_data.append(v)
-        df = pd.DataFrame(consolidated_data)
+        # Convert the rows of every page in one pass.
+        df = pd.DataFrame(self._format_rows(rows))
         df.drop_duplicates(inplace=True)
         df.set_index("symbol", inplace=True)
-        self._clean_close()
-
         return df
 
-    def _scrape_table(self):
-        symbol_xpath = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/table/tbody/tr[{}]/td[1]"
-        name_xpath = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/table/tbody/tr[{}]/td[2]/span"
-        weight_xpath = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/table/tbody/tr[{}]/td[3]"
-        shares_held_xpath = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/table/tbody/tr[{}]/td[4]"
-        market_value_xpath = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/table/tbody/tr[{}]/td[5]"
-        market_value_xpath = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/table/tbody/tr[1]/td[5]"
+    def _read_pages(self, page_timeout: float = 10) -> list:
+        """
+        :param page_timeout: Seconds to wait for the table to change after clicking to another page.
+        :return: (list) Cell texts of the rows of every page. Raises TimeoutError if a page does not load,
+            rather than reading the previous page again. A page that does not change after the click and has
+            fewer rows than `HOLDINGS_PAGE_ROWS` is the last one.
+        """
+        # Button to display 60 rows in the table.
+        display_60_elements_button_xpath = "/html/body/div[1]/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/div/ul[1]/li[4]"
+
+        # Display 60 rows of data.
+        table = self._read_table()
+        self._click_button(display_60_elements_button_xpath, wait=True)
+        if table is not None and not self._wait_for_page_change(table, page_timeout):
+            # A table shorter than the default 20 rows may be displayed whole already.
+            if len(table["rows"]) >= 20:
+                raise TimeoutError(
+                    f"{self.ticker} table did not switch to 60 rows within {page_timeout}s"
+                )
+
+        rows = []
+        cur_page = 1
+        while True:
+            table = self._read_table()
+            if table is None:
+                break
+            rows.extend(table["rows"])
+            instruments.count("pages_scraped", ticker=self.ticker)
+
+            # Click the link to the next page. There is none on the last page.
+            instruments.count("webdriver_calls", ticker=self.ticker)
+            clicked = self.browser.execute_script(
+                _CLICK_NEXT_PAGE_SCRIPT, HOLDINGS_PAGINATION_XPATH, cur_page + 1
+            )
+            if not clicked:
+                break
+            if not self._wait_for_page_change(table, page_timeout):
+                # A Next link left enabled on the last page does nothing. Only the last page has fewer rows.
+                if len(table["rows"]) < HOLDINGS_PAGE_ROWS:
+                    break
+                raise TimeoutError(
+                    f"{self.ticker} page {cur_page + 1} did not load within {page_timeout}s"
+                )
+            cur_page += 1
+        return rows
+
+    def _wait_for_page_change(self, table: dict, timeout: float = 10) -> bool:
+        """
+        Wait until the table read by `_read_table` is replaced, or its rows change.
+
+        :param table: Result of `_read_table` before the click.
+        :param timeout: Seconds to wait before giving up.
+        :return: (bool) True if the page changed, False if the timeout was reached.
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import (
+            StaleElementReferenceException,
+            TimeoutException,
+        )
+
+        def page_changed(browser):
+            instruments.count("webdriver_calls", ticker=self.ticker)
+            try:
+                return browser.execute_script(
+                    _PAGE_CHANGED_SCRIPT, table["table"], table["signature"]
+                )
+            except StaleElementReferenceException:
+                return True
+
+        try:
+            with instruments.timer("page_wait", self.ticker):
+                WebDriverWait(self.browser, timeout, poll_frequency=0.05).until(
+                    page_changed
+                )
+            return True
+        except TimeoutException:
+            print(f"[Page Unchanged] {self.ticker} after {timeout}s")
+            return False
+
+    def _scrape_table(self, bulk: bool = True, _wait_time: int = 5):
+        """
+        :param bulk: Boolean to determine if the whole table is read with one script call, instead of one wait per cell.
+        :param _wait_time: Integer that represents how many seconds selenium should wait for the table.
+        :return: (list) One dict per row with "symbol", "name", "weight", "shares_held" and "market_value".
+        """
+        if not bulk:
+            return self._scrape_table_cells()
+        table = self._read_table(_wait_time)
+        if table is None:
+            return []
+        return self._format_rows(table["rows"])
+
+    def _read_table(self, _wait_time: int = 5):
+        """
+        :param _wait_time: Integer that represents how many seconds selenium should wait for the table.
+        :return: (dict | None) "rows" with the cell texts, "table" with the table element and "signature" of its rows. None if the table is not found.
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+
+        def read(browser):
+            instruments.count("webdriver_calls", ticker=self.ticker)
+            return browser.execute_script(_READ_TABLE_SCRIPT, HOLDINGS_TABLE_XPATH)
+
+        try:
+            # The script returns null until the table exists, so the wait only costs one call once it is loaded.
+            with instruments.timer("table_read", self.ticker):
+                table = WebDriverWait(self.browser, _wait_time).until(read)
+        except TimeoutException:
+            print(f"[Failed Xpath] {HOLDINGS_TABLE_XPATH}")
+            return None
+        if instruments.enabled:
+            size = sum(len(cell) for row in table["rows"] for cell in row)
+            instruments.count("bytes_read", size, ticker=self.ticker)
+        return table
+
+    def _scrape_table_cells(self):
+        from selenium.common.exceptions import (
+            NoSuchElementException,
+            StaleElementReferenceException,
+        )
+
+        symbol_xpath = HOLDINGS_TABLE_XPATH + "/tbody/tr[{}]/td[1]"
+        name_xpath = HOLDINGS_TABLE_XPATH + "/tbody/tr[{}]/td[2]/span"
+        weight_xpath = HOLDINGS_TABLE_XPATH + "/tbody/tr[{}]/td[3]"
+        shares_held_xpath = HOLDINGS_TABLE_XPATH + "/tbody/tr[{}]/td[4]"
+        market_value_xpath = HOLDINGS_TABLE_XPATH + "/tbody/tr[{}]/td[5]"
         scraping = True
         row_index = 1
 
-        tickers = []
+        rows = []
         while scraping:
 
             try:
@@ -329,46 +499,41 @@ class Etf:
                 market_value = self._read_data(
                     market_value_xpath.format(row_index), wait=True
                 )
-                data = {
-                    "symbol": symbol,
-                    "name": name,
-                    "weight": weight,
-                    "shares_held": self._format_value(shares_held),
-                    "market_value": self._format_value(market_value),
-                }
-                tickers.append(data)
+                rows.append([symbol, name, weight, shares_held, market_value])
             except NoSuchElementException:
                 scraping = False
             except StaleElementReferenceException:
                 scraping = False
 
             row_index += 1
-        return tickers
+        return self._format_rows(rows)
+
+    def _format_rows(self, rows: list):
+        """
+        :param rows: Cell texts of each row, in table order.
+        :return: (list) One dict per row, with "weight", "shares_held" and "market_value" converted to floats.
+            Cells that can not be read are NaN, and counted per column in `parse_errors`.
+        """
+        columns = ["symbol", "name", "weight", "shares_held", "market_value"]
+        values = dict(zip(columns, map(list, zip(*rows)))) if rows else {}
+        self.parse_errors = {}
+        for c in ["weight", "shares_held", "market_value"]:
+            values[c], self.parse_errors[c] = parse_numbers(values.get(c, []))
+        if any(self.parse_errors.values()):
+            print(f"[Parse Errors] {self.ticker}: {self.parse_errors}")
+        return [
+            dict(zip(columns, row))
+            for row in zip(*(values.get(c, []) for c in columns))
+        ]
 
     """----------------------------------- Formatting Operations -----------------------------------"""
 
     def _format_value(self, value):
-        # Get the magnitude of the value (B = billions, etc. )
-        magnitude = value[-1]
-
-        # Remove dollar sign and magnitude
-        if value[0] == "$":
-            value = value[1:-1]
-        else:
-            value = value[:-1]
-        # Convert value to float
-        value = float(value)
-
-        if magnitude == "K":
-            multiplier = 1_000
-        elif magnitude == "M":
-            multiplier = 1_000_000
-        elif magnitude == "B":
-            multiplier = 1_000_000_000
-        else:
-            multiplier = 1
-        new_value = value * multiplier
-        return new_value
+        """
+        :param value: Scraped number, e.g. "$39.60B" or "87.60M".
+        :return: (float) Value of the text, NaN if it can not be read.
+        """
+        return parse_numbers([value])[0][0]
 
     # t = yf.Ticker(ticker)
     # print(f"T: {t.info}")
@@ -376,6 +541,495 @@ class Etf:
     # print(f"Holdings: {holdings}")
 
 
+"""----------------------------------- Table Operations -----------------------------------"""
+
+HOLDINGS_TABLE_XPATH = "/html/body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/table"
+HOLDINGS_PAGINATION_XPATH = (
+    "/html/body/div[1]/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/div/ul[2]"
+)
+# Rows of every page but the last, once the table displays 60 rows.
+HOLDINGS_PAGE_ROWS = 60
+
+# Signature of the table rows, used to notice when another page is displayed.
+_TABLE_SIGNATURE = """
+const signature = (table) => {
+    const rows = table.tBodies.length ? table.tBodies[0].rows : [];
+    if (!rows.length) { return "0"; }
+    return [rows.length, rows[0].textContent, rows[rows.length - 1].textContent].join("|");
+};
+"""
+
+# Reads every row of the holdings table in one call. Returns null while the table is missing.
+_READ_TABLE_SCRIPT = _TABLE_SIGNATURE + """
+const table = document.evaluate(
+    arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+if (!table || !table.tBodies.length) { return null; }
+const text = (node) => node.textContent.trim();
+const rows = [];
+for (const row of table.tBodies[0].rows) {
+    const cells = row.cells;
+    if (cells.length < 5) { continue; }
+    rows.push([
+        text(cells[0]),
+        text(cells[1].querySelector("span") || cells[1]),
+        text(cells[2]),
+        text(cells[3]),
+        text(cells[4]),
+    ]);
+}
+return {rows: rows, table: table, signature: signature(table)};
+"""
+
+# True once the table passed in is detached or shows other rows.
+_PAGE_CHANGED_SCRIPT = _TABLE_SIGNATURE + """
+const table = arguments[0];
+if (!table.isConnected) { return true; }
+return signature(table) !== arguments[1];
+"""
+
+# Clicks the link to page arguments[1], or the "Next" link when it is outside the displayed block.
+# Returns false on the last page.
+_CLICK_NEXT_PAGE_SCRIPT = """
+const pagination = document.evaluate(
+    arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+if (!pagination) { return false; }
+const links = Array.from(pagination.querySelectorAll("a"));
+const target = String(arguments[1]);
+const link = links.find((a) => a.textContent.trim() === target)
+    || links.find((a) => a.textContent.trim().toLowerCase().startsWith("next"));
+if (!link || link.closest(".disabled")) { return false; }
+link.click();
+return true;
+"""
+
+
+"""----------------------------------- Config Operations -----------------------------------"""
+
+
+@functools.lru_cache(maxsize=None)
+def _read_config() -> dict:
+    """
+    Read "config.json" from the working directory, or from the "EtfCompare" folder inside it.
+    The file is read once per process.
+    """
+    try:
+        internal_path = os.path.join(os.getcwd(), "config.json")
+        with open(internal_path, "r") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        external_path = os.path.join(os.getcwd(), "EtfCompare", "config.json")
+        with open(external_path, "r") as file:
+            data = json.load(file)
+    return data
+
+
+def create_chrome_options(headless: bool = False):
+    """
+    :param headless: Boolean to determine if Chrome should run without a window.
+    :return: (webdriver.ChromeOptions) Options used for every browser created by the scraper.
+    """
+    return BrowserProfile(headless=headless).options()
+
+
+"""----------------------------------- Dividend Operations -----------------------------------"""
+
+
+def get_dividend_frame(
+    close: pd.DataFrame,
+    dividends: pd.DataFrame,
+    periods_per_year=None,
+    ttm: bool = False,
+) -> pd.DataFrame:
+    """
+    Create the dividend, yield and annual yield of every ticker in one pass.
+
+    Parameters
+    ----------
+    close : pd.DataFrame
+        Close prices, one column per ticker (the "Close" block of `yf.download`).
+    dividends : pd.DataFrame
+        Dividends, one column per ticker (the "Dividends" block of `yf.download`).
+    periods_per_year : int | dict | pd.Series | None
+        Number of payouts per year used to annualize the yield, for every ticker or per ticker.
+        If None, it is detected from the spacing of the payouts with `detect_payout_frequency`,
+        and tickers with fewer than 2 payouts are annualized as quarterly.
+    ttm : bool
+        Boolean to determine if the annual yield is the sum of the payouts of the last 365 days divided by the price,
+        instead of the yield annualized with `periods_per_year`. NaN until a full year of history exists.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns are a MultiIndex of (ticker, field) where field is "dividend", "yield" or "annual_yield".
+        Each day carries the next payout after it, and days after the last payout carry the last payout.
+        This matches the sections created by the per-row loop.
+    """
+    tickers = dividends.columns.to_list()
+    close = close.reindex(index=dividends.index, columns=tickers)
+    values = dividends.to_numpy(dtype=float)
+    dividend = _dividend_sections(values)
+    price = close.to_numpy(dtype=float)
+    index = pd.to_datetime(dividends.index)
+    if ttm:
+        paid = _trailing_sum(np.nan_to_num(values), index)
+    elif periods_per_year is None:
+        # Default to quarterly for tickers with fewer than 2 payouts, like `Etf.get_dividends`.
+        periods = detect_payout_frequency(dividends).fillna(4).to_numpy()
+    elif np.isscalar(periods_per_year):
+        periods = np.full(len(tickers), periods_per_year, dtype=float)
+    else:
+        periods = pd.Series(periods_per_year).reindex(tickers).to_numpy(dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yld = (dividend / price) * 100
+        annual_yield = (paid / price) * 100 if ttm else yld * periods
+
+    fields = ["dividend", "yield", "annual_yield"]
+    data = np.stack([dividend, yld, annual_yield], axis=2)
+    columns = pd.MultiIndex.from_product([tickers, fields])
+    return pd.DataFrame(
+        data.reshape(len(index), len(tickers) * len(fields)),
+        index=index,
+        columns=columns,
+    )
+
+
+def get_dividend_growth(dividends: pd.DataFrame, window_days: int = 365) -> dict:
+    """
+    Growth statistics of every ticker's payouts, computed on the whole frame at once.
+
+    Parameters
+    ----------
+    dividends : pd.DataFrame
+        Dividends, one column per ticker (the "Dividends" block of `yf.download`). Zero or NaN on days without a payout.
+    window_days : int
+        Length of the trailing window, in calendar days.
+
+    Returns
+    -------
+    dict
+        "summary": DataFrame indexed by ticker with "start_date", "end_date", "start" (first payout), "end" (last payout),
+            "growth" (last vs first payout, in percent), "cagr" (annualized growth, in percent), "payouts",
+            "ttm" (payouts of the last window) and "ttm_growth" (last window vs the window before it, in percent).
+        "ttm": DataFrame of the trailing payouts sum on each day. NaN until a full window of history exists.
+        "yoy_growth": DataFrame of the change of "ttm" against one window earlier, in percent.
+    """
+    tickers = dividends.columns.to_list()
+    index = pd.to_datetime(dividends.index)
+    values = np.nan_to_num(dividends.to_numpy(dtype=float))
+    rows, cols = values.shape
+    columns = np.arange(cols)
+
+    paid = values > 0
+    has_payout = paid.any(axis=0)
+    first = paid.argmax(axis=0)
+    last = rows - 1 - paid[::-1].argmax(axis=0)
+    start = np.where(has_payout, values[first, columns], np.nan)
+    end = np.where(has_payout, values[last, columns], np.nan)
+    start_date = index[first].where(has_payout)
+    end_date = index[last].where(has_payout)
+
+    ttm = _trailing_sum(values, index, window_days)
+    previous = _window_start(index, window_days)
+    yoy_growth = _yoy_growth(ttm, ttm, previous)
+    summary = _growth_summary(
+        tickers, start_date, end_date, start, end, paid.sum(axis=0), ttm, yoy_growth
+    )
+    return {
+        "summary": summary,
+        "ttm": pd.DataFrame(ttm, index=index, columns=tickers),
+        "yoy_growth": pd.DataFrame(yoy_growth, index=index, columns=tickers),
+    }
+
+
+def update_dividend_growth(
+    growth: dict, dividends: pd.DataFrame, window_days: int = 365
+) -> dict:
+    """
+    Extend the result of `get_dividend_growth` to rows appended to its dividends, computing only the new rows.
+
+    Parameters
+    ----------
+    growth : dict
+        Result of `get_dividend_growth` for the first rows of `dividends`, with the same tickers and window.
+    dividends : pd.DataFrame
+        Dividends with the rows of `growth` followed by the new rows. The earlier rows must not have changed.
+    window_days : int
+        Length of the trailing window, in calendar days.
+
+    Returns
+    -------
+    dict
+        Same as `get_dividend_growth(dividends, window_days)`. The trailing sums of the new rows are summed over
+        their window only, so they can differ from a full computation by floating point rounding.
+    """
+    tickers = dividends.columns.to_list()
+    index = pd.to_datetime(dividends.index)
+    rows = len(growth["ttm"])
+    window = _window_start(index, window_days)
+    # The new trailing sums need the rows of their window, and their growth the trailing sums one window earlier.
+    start = max(window[rows], 0)
+    values = np.nan_to_num(dividends.iloc[start:].to_numpy(dtype=float))
+    new_ttm = _trailing_sum(values, index[start:], window_days)[rows - start :]
+    ttm = np.vstack([growth["ttm"].to_numpy(), new_ttm])
+    new_yoy = _yoy_growth(new_ttm, ttm, window[rows:])
+    yoy_growth = np.vstack([growth["yoy_growth"].to_numpy(), new_yoy])
+
+    summary = growth["summary"]
+    new = values[rows - start :]
+    paid = new > 0
+    columns = np.arange(len(tickers))
+    has_new = paid.any(axis=0)
+    first = paid.argmax(axis=0)
+    last = len(new) - 1 - paid[::-1].argmax(axis=0)
+    had_payout = summary["payouts"].to_numpy() > 0
+    # The first payout only changes for tickers without earlier payouts, the last one for tickers paying in the new rows.
+    use_first = has_new & ~had_payout
+    start_date = summary["start_date"].where(
+        ~use_first, pd.Series(index[rows:][first], index=summary.index)
+    )
+    end_date = summary["end_date"].where(
+        ~has_new, pd.Series(index[rows:][last], index=summary.index)
+    )
+    start_value = np.where(use_first, new[first, columns], summary["start"])
+    end_value = np.where(has_new, new[last, columns], summary["end"])
+    summary = _growth_summary(
+        tickers,
+        pd.DatetimeIndex(start_date),
+        pd.DatetimeIndex(end_date),
+        start_value,
+        end_value,
+        summary["payouts"].to_numpy() + paid.sum(axis=0),
+        ttm,
+        yoy_growth,
+    )
+    return {
+        "summary": summary,
+        "ttm": pd.DataFrame(ttm, index=index, columns=tickers),
+        "yoy_growth": pd.DataFrame(yoy_growth, index=index, columns=tickers),
+    }
+
+
+def _yoy_growth(
+    ttm: np.ndarray, history: np.ndarray, previous: np.ndarray
+) -> np.ndarray:
+    """
+    :param ttm: Trailing sums of the rows to compare.
+    :param history: Trailing sums of every row, which `previous` points into.
+    :param previous: Row one window before each row of `ttm`, -1 if there is none.
+    :return: (np.ndarray) Change of each trailing sum against the one a window earlier, in percent.
+    """
+    prior = np.full_like(ttm, np.nan)
+    prior[previous >= 0] = history[previous[previous >= 0]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(prior > 0, ((ttm - prior) / prior) * 100, np.nan)
+
+
+def _growth_summary(
+    tickers: list,
+    start_date: pd.DatetimeIndex,
+    end_date: pd.DatetimeIndex,
+    start: np.ndarray,
+    end: np.ndarray,
+    payouts: np.ndarray,
+    ttm: np.ndarray,
+    yoy_growth: np.ndarray,
+) -> pd.DataFrame:
+    """
+    :return: (pd.DataFrame) "summary" of `get_dividend_growth`, from the first and last payouts and the trailing sums.
+    """
+    years = (end_date - start_date).days.to_numpy(dtype=float) / 365.25
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = ((end - start) / np.abs(start)) * 100
+        cagr = np.where(years > 0, ((end / start) ** (1 / years) - 1) * 100, np.nan)
+    return pd.DataFrame(
+        {
+            "start_date": start_date,
+            "end_date": end_date,
+            "start": start,
+            "end": end,
+            "growth": growth,
+            "cagr": cagr,
+            "payouts": payouts,
+            "ttm": ttm[-1],
+            "ttm_growth": yoy_growth[-1],
+        },
+        index=pd.Index(tickers),
+    )
+
+
+# Standard payout frequencies, in payouts per year.
+PAYOUT_FREQUENCIES = np.array([1, 2, 4, 12, 52])
+
+
+def get_trailing_change(values, window: int = None, payouts: bool = False):
+    """
+    Percent change of every column relative to an anchor value.
+
+    :param values: (pd.Series | pd.DataFrame) Values to compare, one column per ticker.
+    :param window: If None, every value is compared to the first value. Otherwise it is compared to the value `window` steps earlier.
+    :param payouts: Boolean to determine if `window` counts payouts (non-zero values) instead of rows. Non-payout rows are NaN.
+    :return: (pd.Series | pd.DataFrame) Change in percent, same shape as `values`. The first row (or first `window` steps) is NaN.
+    """
+    is_series = isinstance(values, pd.Series)
+    frame = values.to_frame() if is_series else values
+    frame = frame.astype(float)
+
+    if window is None:
+        anchor = frame.iloc[0]
+        data = ((frame - anchor) / anchor) * 100
+        data.iloc[:1] = np.nan
+    elif payouts:
+        # Long form keeps only the payouts, so shifting within each ticker skips the days between them.
+        events = frame.where(frame > 0).stack().dropna()
+        previous = events.groupby(level=1, sort=False).shift(window)
+        change = ((events - previous) / previous) * 100
+        data = change.unstack().reindex(index=frame.index, columns=frame.columns)
+    else:
+        previous = frame.shift(window)
+        data = ((frame - previous) / previous) * 100
+
+    if is_series:
+        return data.iloc[:, 0].rename(values.name)
+    return data
+
+
+def detect_payout_frequency(dividends: pd.DataFrame) -> pd.Series:
+    """
+    Infer how often every ticker pays from the spacing of its ex-dividend dates.
+
+    The median number of days between payouts is snapped to the closest standard frequency
+    (annual, biannual, quarterly, monthly or weekly), so a skipped or special payout does not change the result.
+
+    :param dividends: Dividends, one column per ticker. Zero or NaN on days without a payout.
+    :return: (pd.Series) Payouts per year of each ticker. NaN for tickers with fewer than 2 payouts.
+    """
+    values = np.nan_to_num(dividends.to_numpy(dtype=float))
+    cols = values.shape[1]
+    days = (
+        pd.to_datetime(dividends.index)
+        .to_numpy()
+        .astype("datetime64[D]")
+        .astype(np.int64)
+    )
+
+    # Every payout as (column, day), sorted by column then day.
+    payout_cols, payout_rows = np.nonzero((values > 0).T)
+    same = payout_cols[1:] == payout_cols[:-1]
+    gap_cols = payout_cols[1:][same]
+    gaps = np.diff(days[payout_rows])[same]
+
+    # Median gap of each column, read from the gaps sorted within each column.
+    order = np.lexsort((gaps, gap_cols))
+    gaps = gaps[order]
+    counts = np.bincount(gap_cols, minlength=cols)
+    starts = np.cumsum(counts) - counts
+    has_gaps = counts > 0
+    low = np.where(has_gaps, starts + (counts - 1) // 2, 0)
+    high = np.where(has_gaps, starts + counts // 2, 0)
+    median = np.full(cols, np.nan)
+    if len(gaps):
+        median[has_gaps] = (gaps[low[has_gaps]] + gaps[high[has_gaps]]) / 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_year = 365.25 / median
+    closest = np.abs(
+        np.log(per_year[:, None]) - np.log(PAYOUT_FREQUENCIES[None, :])
+    ).argmin(axis=1)
+    frequency = np.where(np.isfinite(per_year), PAYOUT_FREQUENCIES[closest], np.nan)
+    return pd.Series(frequency, index=dividends.columns, name="payouts_per_year")
+
+
+def _window_start(index: pd.DatetimeIndex, window_days: int = 365) -> np.ndarray:
+    """
+    :return: (np.ndarray) Row of the last day that is a full window (or more) before each day. -1 if there is none.
+    """
+    window = pd.Timedelta(days=window_days)
+    return np.searchsorted(index, index - window, side="right") - 1
+
+
+def _trailing_sum(
+    values: np.ndarray, index: pd.DatetimeIndex, window_days: int = 365
+) -> np.ndarray:
+    """
+    :param values: 2D array (rows are days, columns are tickers) without NaN.
+    :return: (np.ndarray) Sum of the values of the last `window_days` of each day. NaN until a full window of history exists.
+    """
+    previous = _window_start(index, window_days)
+    cumulative = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    total = cumulative[1:] - cumulative[previous + 1]
+    total[previous < 0] = np.nan
+    return total
+
+
+def _dividend_sections(values: np.ndarray) -> np.ndarray:
+    """
+    :param values: 2D array of dividends (rows are days, columns are tickers).
+    :return: (np.ndarray) For each day, the first payout strictly after it. Days after the last payout hold the last payout.
+    """
+    rows, cols = values.shape
+    positions = np.arange(rows)[:, None]
+    paid = values > 0
+    # Index of the first payout at or after each row, `rows` if there is none.
+    next_index = np.where(paid, positions, rows)
+    next_index = np.minimum.accumulate(next_index[::-1], axis=0)[::-1]
+    # Shift by one row so a payout day carries the following payout.
+    next_index = np.vstack([next_index[1:], np.full((1, cols), rows)])
+    # Forward fill the tail after the last payout with the last payout.
+    last_index = np.where(paid, positions, -1).max(axis=0, initial=-1)
+    last_index = np.where(last_index < 0, rows, last_index)
+    next_index = np.where(next_index == rows, last_index, next_index)
+
+    padded = np.vstack([values, np.full((1, cols), np.nan)])
+    return np.take_along_axis(padded, next_index, axis=0)
+
+
+def _get_dividends_loop(close: pd.Series, dividends: pd.Series, periods_per_year: int):
+    """
+    Per-row implementation of `Etf.get_dividends`. Kept as the reference for the vectorized engine.
+    """
+    d_index = 0
+    d_indexes = {}
+    prev_timestamp = dividends.index[0]
+    sections = []
+    # Search indexes where a dividend occurs.
+    for i in range(len(dividends)):
+        current_timestamp = dividends.index[i]
+        d = dividends.iloc[d_index]
+        if d > 0:
+            d_indexes[dividends.index[i]] = d.item()
+            data = {
+                "start": prev_timestamp,
+                "end": current_timestamp,
+                "value": d.item(),
+            }
+            sections.append(data)
+            prev_timestamp = current_timestamp
+        d_index += 1
+
+    # Add last section.
+    sections.append(
+        {
+            "start": sections[-1]["end"],
+            "end": dividends.index[-1],
+            "value": sections[-1]["value"],
+        }
+    )
+    df = pd.DataFrame(index=dividends.index, columns=["close", "dividend"])
+    df["close"] = close
+    df.index = pd.to_datetime(df.index)
+    for s in sections:
+        df.loc[s["start"] : s["end"], "dividend"] = s["value"]
+
+    # Calculate the yield
+    df["close"] = close
+    df["yield"] = (df["dividend"] / df["close"]) * 100
+    df["annual_yield"] = df["yield"] * periods_per_year
+    return df
+
+
 if __name__ == "__main__":
 
     ticker = "SPY"
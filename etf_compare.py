@@ -1,4 +1,20 @@
-from etf import Etf
+from etf import (
+    Etf,
+    get_dividend_growth,
+    get_trailing_change,
+    update_dividend_growth,
+    _read_config,
+)
+from compact_holdings import CompactHoldings
+from lookthrough import LookThrough
+from dividend_store import DividendStore
+from holdings_history import get_holdings_history
+from holdings_index import get_holdings_index
+from holdings_store import get_holdings_store, normalize_holdings
+from instrumentation import instruments
+from line_plot import draw_lines, render_lines
+from compare_engine import dividend_values, extend_dividend_values
+from result_cache import fingerprint, row_fingerprints
 import numpy as np
 import pandas as pd
 
@@ -56,133 +72,444 @@ class EtfCompare:
         ticker_list: list,
         comparison_start: dt.datetime,
         comparison_end: dt.datetime,
+        price_cache=None,
+        pipeline=None,
+        engine=None,
+        result_cache=None,
     ) -> None:
+        """
+        :param ticker_list: Tickers to compare.
+        :param comparison_start: First date of the price history.
+        :param comparison_end: Last date of the price history.
+        :param price_cache: Optional `PriceCache`. If given, prices are read from it and only missing dates are downloaded.
+        :param pipeline: Optional `FetchPipeline`. If given, prices and holdings are fetched concurrently, and its report is kept in `fetch_report`.
+        :param engine: Optional `CompareEngine`. If given, `compare_dividends` shards the tickers across its threads or processes.
+        :param result_cache: Optional `ResultCache`. If given, `compare_dividends` and `compare_dividend_growth` reuse the results
+            of earlier calls with the same prices and parameters, and only compute the new rows when days were appended.
+        """
         self.start = comparison_start
         self.end = comparison_end
         self.ticker_list = ticker_list
+        self.price_cache = price_cache
+        self.pipeline = pipeline
+        self.engine = engine
+        self.result_cache = result_cache
         self.ticker_data = None
+        self.fetch_report = None
+        # Holdings of every ETF, kept as compact arrays with one shared security table.
+        self.holdings_universe = CompactHoldings()
+        self._holdings_index = None
         self.ticker_objects = self.create_objects(ticker_list)
-        self.color_index = [
-            "blue",
-            "yellow",
-            "cyan",
-            "orange",
-            "purple",
-            "red",
-            "grey",
-            "grey",
-            "grey",
-            "grey",
-        ]
 
     def create_objects(self, ticker_list: list):
         object_dict = {}
-        self.ticker_data = yf.download(
-            tickers=ticker_list, start=self.start, end=self.end, actions=True
-        )
+        if self.pipeline is not None:
+            self.ticker_data, holdings, self.fetch_report = self.pipeline.fetch(
+                ticker_list, self.start, self.end
+            )
+            for t in ticker_list:
+                object_dict[t] = Etf(t, universe=self.holdings_universe)
+                if t.upper() in holdings:
+                    object_dict[t].holdings = holdings[t.upper()]
+            return object_dict
+        if self.price_cache is not None:
+            self.ticker_data = self.price_cache.download(
+                ticker_list, self.start, self.end
+            )
+        else:
+            instruments.count("price_downloads")
+            with instruments.timer("price_download"):
+                self.ticker_data = yf.download(
+                    tickers=ticker_list,
+                    start=self.start,
+                    end=self.end,
+                    actions=True,
+                )
         for t in ticker_list:
-            etf = Etf(t)
+            etf = Etf(t, universe=self.holdings_universe)
             object_dict[t] = etf
         return object_dict
 
+    def refresh_holdings(self, workers: int = 4, retries: int = 2):
+        """
+        Scrape new holdings for every ticker with a pool of reusable headless browsers, and save them.
+
+        :param workers: Maximum number of browsers running at the same time.
+        :param retries: Number of extra attempts per ticker after a failure.
+        :return: (dict) Report of the scrape, with failed tickers and throughput.
+        """
+        from scraper_pool import ScraperPool
+
+        with ScraperPool(workers=workers, retries=retries) as pool:
+            holdings, report = pool.scrape(self.ticker_list)
+        if holdings:
+            # One store segment and one snapshot segment for every refreshed ETF.
+            holdings = {t: normalize_holdings(df) for t, df in holdings.items()}
+            self.holdings_store().save_many(holdings)
+            # The pool returns upper case tickers, the objects are keyed like `ticker_list`.
+            for etf in self.ticker_objects.values():
+                if etf.ticker in holdings:
+                    etf.save_holdings(holdings[etf.ticker], snapshot=False, store=False)
+            self.holdings_history().append(dt.date.today(), holdings)
+        return report
+
+    def holdings_history(self):
+        """
+        :return: (HoldingsHistory) Dated holdings snapshots of every ETF in the data export folder.
+        """
+        return get_holdings_history(_read_config()["data_export_path"])
+
+    def holdings_store(self):
+        """
+        :return: (HoldingsStore) Store of the holdings in the data export folder.
+        """
+        config = _read_config()
+        return get_holdings_store(
+            config["data_export_path"], config.get("holdings_store", "numpy")
+        )
+
+    def holdings_index(self):
+        """
+        :return: (HoldingsIndex) Reverse index of every ETF in the holdings store, built on first use.
+            The same index is kept for every lookup, and reads the disk again only when an ETF was refreshed.
+        """
+        if self._holdings_index is None:
+            self._holdings_index = get_holdings_index(
+                _read_config()["data_export_path"], self.holdings_store()
+            )
+        return self._holdings_index
+
+    def holders(self, symbols) -> pd.DataFrame:
+        """
+        Which of the ETFs hold each symbol, and at what weight.
+
+        :param symbols: (str | list) Symbol or symbols to look up.
+        :return: (pd.DataFrame) One row per (symbol, ETF) holding, indexed by symbol, with the columns "etf",
+            "weight", "shares_held" and "market_value".
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        return self.holdings_index().holders_many(symbols, etfs=self.ticker_list)
+
+    def diff_holdings(self, start, end, min_change: float = 0.0) -> pd.DataFrame:
+        """
+        Additions, deletions and weight changes of every ETF between the snapshots as of two dates.
+
+        :param start: Date of the earlier snapshots.
+        :param end: Date of the later snapshots.
+        :param min_change: Weight changes of at most this many percentage points are left out.
+        :return: (pd.DataFrame) One row per changed holding, see `HoldingsHistory.diff_many`.
+        """
+        return self.holdings_history().diff_many(
+            start, end, self.ticker_list, min_change
+        )
+
     """----------------------------------- Compare Operations -----------------------------------"""
 
-    def compare_dividend_growth(self, plot: bool = False):
-        dividend_data = {}
-        dividends = self.ticker_data["Dividends"]
-        cols = dividends.columns.to_list()
-        df = pd.DataFrame()
-        for c in cols:
-            data = dividends[c]
-            data = data.loc[data != 0]
-            start_div = data.iloc[0]
-            end_div = data.iloc[1]
-            growth = ((end_div - start_div) / abs(start_div)) * 100
-            df.loc["start_date", c] = dt.datetime.strftime(data.index[0], "%Y-%m-%d")
-
-            df.loc["end_date", c] = dt.datetime.strftime(data.index[-1], "%Y-%m-%d")
-            df.loc["start", c] = start_div
-            df.loc["end", c] = end_div
-            df.loc["growth", c] = growth
-
-        return df
-
-    def compare_dividends(self, plot: bool = False):
-        dividend_data = {}
-
-        dates = self.ticker_data[list(self.ticker_data.keys())[0]].index
-
-        for k, v in self.ticker_objects.items():
-            divs = v.get_dividends(
-                self.ticker_data["Close"][k],
-                self.ticker_data["Dividends"][k],
-                True,
+    def compare_holdings(self) -> dict:
+        """
+        Pairwise overlap of the holdings of every ETF.
+
+        Returns
+        -------
+        dict
+            "overlap" (sum of the smaller weight of each shared holding, in percent), "jaccard" and "cosine",
+            each an ETF x ETF DataFrame.
+        """
+        return self._holdings_universe().to_matrix(self.ticker_list).compare()
+
+    def look_through(self, positions: dict) -> LookThrough:
+        """
+        :param positions: Ticker mapped to the dollars invested in the ETF.
+        :return: (LookThrough) Exposure to every underlying symbol. Use `update_positions` for what-if changes.
+        """
+        holdings = self._holdings_universe().to_frame(self.ticker_list)
+        return LookThrough(holdings, positions)
+
+    def _holdings_universe(self) -> CompactHoldings:
+        """
+        :return: (CompactHoldings) Holdings of every ticker, loaded (or scraped) on first use.
+        """
+        for t in self.ticker_list:
+            if t not in self.holdings_universe:
+                self.holdings_universe.add(t, self.ticker_objects[t].get_holdings())
+        return self.holdings_universe
+
+    def compare_dividend_growth(
+        self, plot: bool = False, windows: bool = False, plot_path: str = None
+    ):
+        """
+        Compare the payout growth of every ticker.
+
+        :param plot: Boolean to determine if the trailing 12 month payouts are plotted.
+        :param plot_path: If given, the plot is saved to this image file instead of shown, see `_create_plot`.
+        :param windows: Boolean to determine if the daily trailing 12 month sums and year over year growth are returned with the summary.
+        :return: (pd.DataFrame | dict) Summary with one column per ticker: "start_date", "end_date", "start", "end", "growth",
+            "cagr", "payouts", "ttm" and "ttm_growth". If `windows` is True, the dict of `get_dividend_growth` with the summary transposed.
+        """
+        dividends = self.ticker_data["Dividends"][self.ticker_list]
+
+        def compute():
+            with instruments.timer("dividend_growth"):
+                return get_dividend_growth(dividends)
+
+        def extend(previous, rows):
+            with instruments.timer("dividend_growth"):
+                return update_dividend_growth(previous, dividends)
+
+        growth = self._cached(
+            "compare_dividend_growth", {}, ["Dividends"], compute, extend
+        )
+        summary = growth["summary"].copy()
+        for c in ["start_date", "end_date"]:
+            summary[c] = summary[c].dt.strftime("%Y-%m-%d")
+        summary = summary.T
+
+        if plot:
+            ttm = growth["ttm"]
+            self._create_plot(
+                ttm[self.ticker_list],
+                chart_title=f"{self._plot_label()} Trailing 12 Month Dividends",
+                y_axis_label="Dividends ($)",
+                path=plot_path,
             )
-            dividend_data[(k, "dividend")] = divs["dividend"]
-            dividend_data[(k, "annual_yield")] = divs["annual_yield"]
-            dividend_data[(k, "dividend_growth")] = self._create_trailing_change(
-                divs["dividend"]
+        if windows:
+            growth["summary"] = summary
+            return growth
+        return summary
+
+    def compare_dividends(
+        self,
+        plot: bool = False,
+        ttm: bool = False,
+        dtype=None,
+        batch_size: int = 250,
+        plot_path: str = None,
+    ):
+        """
+        :param plot: Boolean to determine if the dividends are plotted instead of returned.
+        :param ttm: Boolean to determine if the annual yield is the sum of the payouts of the last 365 days divided by the price.
+            Otherwise the yield is annualized with the payout frequency detected for each ticker.
+        :param dtype: Dtype of the returned values, e.g. np.float32 to halve the memory. Defaults to float64.
+        :param batch_size: Number of tickers computed at once. The intermediate frames only hold one batch.
+            With an `engine`, the largest shard of tickers given to a worker.
+        :param plot_path: If given, the plot is saved to this image file instead of shown, see `_create_plot`.
+        :return: (pd.DataFrame) Columns are a MultiIndex of (ticker, field) with "dividend", "annual_yield" and "dividend_growth".
+        """
+        fields = DividendStore.FIELDS
+        dates = self.ticker_data.index
+
+        def extend(previous, rows):
+            return extend_dividend_values(
+                previous,
+                self._price_block("Close", self.ticker_list),
+                self._price_block("Dividends", self.ticker_list),
+                ttm=ttm,
             )
 
-        data = pd.DataFrame(dividend_data, index=dates)
+        values = self._cached(
+            "compare_dividends",
+            {"ttm": ttm, "dtype": np.dtype(dtype or np.float64).str},
+            ["Close", "Dividends"],
+            lambda: self._dividend_values(ttm, dtype, batch_size),
+            extend,
+        )
+        data = pd.DataFrame(
+            values.reshape(len(dates), -1),
+            index=dates,
+            columns=pd.MultiIndex.from_product([self.ticker_list, fields]),
+            copy=False,
+        )
         if plot:
-            data_to_plot = {}
-            for t in self.ticker_list:
-                data_to_plot[t] = data[t]["dividend"]
             self._create_plot(
-                data_to_plot,
-                chart_title=f"{self.ticker_list} Dividend Comparison",
+                data.xs("dividend", axis=1, level=1),
+                chart_title=f"{self._plot_label()} Dividend Comparison",
                 y_axis_label="Dividends ($)",
+                path=plot_path,
             )
 
         else:
             return data
 
+    def _dividend_values(self, ttm: bool, dtype, batch_size: int) -> np.ndarray:
+        """
+        :return: (np.ndarray) (n_dates, n_tickers, 3) values of `compare_dividends`, computed by the engine or in batches.
+        """
+        fields = DividendStore.FIELDS
+        dates = self.ticker_data.index
+        if self.engine is not None:
+            return self.engine.dividend_values(
+                self._price_block("Close", self.ticker_list),
+                self._price_block("Dividends", self.ticker_list),
+                ttm=ttm,
+                dtype=dtype,
+                shard_size=batch_size,
+            )
+        values = np.empty(
+            (len(dates), len(self.ticker_list), len(fields)), dtype=dtype or np.float64
+        )
+        column = 0
+        for batch in self.iter_dividends(batch_size, ttm=ttm, dtype=dtype):
+            width = batch.shape[1] // len(fields)
+            values[:, column : column + width] = batch.to_numpy().reshape(
+                len(dates), width, len(fields)
+            )
+            column += width
+        return values
+
+    def _cached(self, method: str, params: dict, blocks: list, compute, extend=None):
+        """
+        Return the result of `compute`, read from `result_cache` when the same inputs were computed before.
+
+        When the cache holds the latest result of the same call for fewer rows, and those rows did not change,
+        `extend(previous, rows)` only computes the rows appended since.
+
+        :param method: Name of the analytics.
+        :param params: Parameters changing the result.
+        :param blocks: Fields of `ticker_data` the result depends on, e.g. ["Close", "Dividends"].
+        :param compute: Callable returning the result from scratch.
+        :param extend: Callable extending the previous result, which covered the first `rows` rows.
+        :return: The result.
+        """
+        cache = self.result_cache
+        if cache is None:
+            return compute()
+        data = self.ticker_data[[(f, t) for f in blocks for t in self.ticker_list]]
+        family = fingerprint(
+            method, self.ticker_list, self.start, sorted(params.items())
+        )
+        previous = cache.latest(family) if extend is not None else None
+        if previous is not None and previous[1]["rows"] >= len(data):
+            previous = None
+        # The rows of the previous result are hashed in the same pass as the whole prices.
+        counts = [previous[1]["rows"]] if previous is not None else []
+        digests = row_fingerprints(data, counts + [len(data)])
+        key = fingerprint(family, self.end, digests[-1])
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        if previous is not None:
+            old_key, meta, old_value = previous
+            # The previous rows must be unchanged, e.g. the last close was not revised.
+            if old_key == fingerprint(family, meta["end"], digests[0]):
+                instruments.count("result_cache_tail_updates")
+                value = extend(old_value, meta["rows"])
+        if value is None:
+            value = compute()
+        cache.put(key, value, family=family, meta={"rows": len(data), "end": self.end})
+        return value
+
+    def iter_dividends(self, batch_size: int = 250, ttm: bool = False, dtype=None):
+        """
+        Yield the output of `compare_dividends` one batch of tickers at a time, so only one batch is held in memory.
+
+        :param batch_size: Number of tickers per batch.
+        :param ttm: See `compare_dividends`.
+        :param dtype: See `compare_dividends`.
+        :return: (generator) DataFrames with the (ticker, field) columns of each batch, in the order of `ticker_list`.
+        """
+        for i in range(0, len(self.ticker_list), batch_size):
+            yield self._dividend_batch(
+                self.ticker_list[i : i + batch_size], ttm=ttm, dtype=dtype
+            )
+
+    def export_dividends(
+        self, path: str, batch_size: int = 250, ttm: bool = False, dtype=np.float32
+    ) -> DividendStore:
+        """
+        Write the output of `compare_dividends` to a columnar folder, one batch of tickers at a time.
+
+        :param path: Folder of the `DividendStore`.
+        :param batch_size: Number of tickers per batch.
+        :param ttm: See `compare_dividends`.
+        :param dtype: Dtype of the stored values.
+        :return: (DividendStore) Store to read the results back with `load`.
+        """
+        store = DividendStore(path)
+        store.write(
+            self.iter_dividends(batch_size, ttm=ttm, dtype=dtype),
+            index=self.ticker_data.index,
+            tickers=self.ticker_list,
+            dtype=dtype,
+        )
+        return store
+
+    def _price_block(self, field: str, tickers: list) -> pd.DataFrame:
+        """
+        :return: (pd.DataFrame) Column `field` of `ticker_data` for the tickers, one column per ticker.
+        """
+        # Select the tickers' columns directly, since ticker_data[field] copies every ticker.
+        return self.ticker_data[[(field, t) for t in tickers]].droplevel(0, axis=1)
+
+    def _dividend_batch(
+        self, tickers: list, ttm: bool = False, dtype=None
+    ) -> pd.DataFrame:
+        """
+        :param tickers: Tickers of the batch.
+        :return: (pd.DataFrame) Dividend, annual yield and dividend growth of the tickers, with (ticker, field) columns.
+        """
+        dates = self.ticker_data.index
+        data = dividend_values(
+            self._price_block("Close", tickers),
+            self._price_block("Dividends", tickers),
+            ttm=ttm,
+        )
+        fields = DividendStore.FIELDS
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return pd.DataFrame(
+            data.reshape(len(dates), len(tickers) * len(fields)),
+            index=dates,
+            columns=pd.MultiIndex.from_product([tickers, fields]),
+        )
+
+    def _plot_label(self) -> str:
+        """
+        :return: (str) Tickers named in plot titles, or their count past 10 tickers.
+        """
+        if len(self.ticker_list) > 10:
+            return f"{len(self.ticker_list)} ETFs"
+        return str(self.ticker_list)
+
     def _create_plot(
-        self, data_to_plot, chart_title: str = "", y_axis_label: str = "Values"
+        self,
+        data_to_plot,
+        chart_title: str = "",
+        y_axis_label: str = "Values",
+        path: str = None,
+        method: str = "minmax",
     ):
-
-        # Plotting the data with matplotlib
-        plt.figure(figsize=(10, 6))
-        color_index = 0
-        for k, v in data_to_plot.items():
-            index = data_to_plot[k].index
-            plt.plot(
-                index,
-                v,
-                label=k,
-                color=self.color_index[color_index],
+        """
+        Plot one line per ticker. The lines are decimated to the width of the plot and drawn as one collection,
+        with a color per ticker for any number of tickers.
+
+        :param data_to_plot: (pd.DataFrame | dict) One column (or Series) per ticker, indexed by date.
+        :param path: If given, the plot is rendered with the Agg backend and saved to this image file, without a window.
+            Otherwise it is shown with `plt.show`, which blocks.
+        :param method: Decimation of the lines, "minmax", "lttb" or "none". See `line_plot.draw_lines`.
+        :return: (str | None) `path`, if given.
+        """
+        data = pd.DataFrame(data_to_plot)
+        if path is not None:
+            return render_lines(
+                data, path, title=chart_title, y_axis_label=y_axis_label, method=method
             )
 
-            color_index += 1
-        # Adding title and labels
+        plt.figure(figsize=(10, 6))
+        draw_lines(plt.gca(), data, method=method)
         plt.title(chart_title)
         plt.xlabel("Date")
         plt.ylabel(y_axis_label)
-
-        # Adding a legend
-        plt.legend()
-
-        # Display the plot
         plt.show()
 
-    def _create_trailing_change(self, values: pd.Series):
-        index = 0
-        dates = values.index.to_list()
-        data = pd.Series()
-        for i in values:
-            cur_date = dates[index]
-            if index == 0:
-                anchor_value = i
-                data.loc[cur_date] = np.nan
-            else:
-                # print(f"[{cur_date}]: {anchor_value}   I: {i}")
-                data.loc[cur_date] = ((i - anchor_value) / anchor_value) * 100
-
-            index += 1
-
-        # data.dropna(inplace=True)
-        return data
+    def _create_trailing_change(
+        self, values, window: int = None, payouts: bool = False
+    ):
+        """
+        Percent change of every column relative to an anchor value, see `etf.get_trailing_change`.
+        """
+        return get_trailing_change(values, window=window, payouts=payouts)
 
 
 def get_delta(period: int, period_unit: str):
@@ -0,0 +1,170 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from etf import Etf
+
+
+class FetchPipeline:
+    """
+    Fetch the prices and the holdings of many tickers at the same time with asyncio.
+
+    Prices are downloaded in batches of tickers and holdings one ticker at a time. Both stages run concurrently,
+    each with its own limit of calls in flight. The blocking calls (yfinance, Selenium, file reads) run in a
+    thread pool, so network and browser waits overlap.
+    """
+
+    def __init__(
+        self,
+        price_fetcher=None,
+        holdings_fetcher=None,
+        price_batch_size: int = 50,
+        price_concurrency: int = 2,
+        holdings_concurrency: int = 4,
+    ) -> None:
+        """
+        :param price_fetcher: Callable (tickers, start, end) returning a frame shaped like `yf.download(..., actions=True)`. Defaults to `yf.download`.
+        :param holdings_fetcher: Callable (ticker) returning the holdings DataFrame. Defaults to `Etf(ticker).holdings`, read locally or scraped.
+        :param price_batch_size: Number of tickers per price download.
+        :param price_concurrency: Maximum number of price downloads running at the same time.
+        :param holdings_concurrency: Maximum number of holdings fetched at the same time, e.g. the number of browsers.
+        """
+        self.price_fetcher = price_fetcher or self._download_prices
+        self.holdings_fetcher = holdings_fetcher or self._load_holdings
+        self.price_batch_size = price_batch_size
+        self.price_concurrency = price_concurrency
+        self.holdings_concurrency = holdings_concurrency
+
+    @staticmethod
+    def _download_prices(tickers: list, start, end) -> pd.DataFrame:
+        import yfinance as yf
+
+        return yf.download(tickers=tickers, start=start, end=end, actions=True)
+
+    @staticmethod
+    def _load_holdings(ticker: str) -> pd.DataFrame:
+        return Etf(ticker).holdings
+
+    """----------------------------------- Stage Operations -----------------------------------"""
+
+    async def _run_stage(self, executor, limit: int, jobs: dict) -> dict:
+        """
+        :param executor: Thread pool of the blocking calls.
+        :param limit: Maximum number of jobs running at the same time.
+        :param jobs: Key mapped to a callable without arguments.
+        :return: (dict) Results, errors and timings of the stage.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(limit)
+        results, errors, seconds = {}, {}, {}
+
+        async def run(key, job):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    results[key] = await loop.run_in_executor(executor, job)
+                except Exception as e:
+                    errors[key] = e
+                    print(f"[Fetch Failed] {key}: {e!r}")
+                seconds[key] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run(k, j) for k, j in jobs.items()))
+        return {
+            "results": results,
+            "errors": errors,
+            "seconds": time.perf_counter() - start,
+            "busy_seconds": sum(seconds.values()),
+            "job_seconds": seconds,
+        }
+
+    async def fetch_async(self, tickers: list, start, end):
+        """
+        Coroutine of `fetch`, to run inside an existing event loop.
+        """
+        tickers = [t.upper() for t in tickers]
+        batches = [
+            tickers[i : i + self.price_batch_size]
+            for i in range(0, len(tickers), self.price_batch_size)
+        ]
+        price_jobs = {
+            i: (lambda b=b: self.price_fetcher(b, start, end))
+            for i, b in enumerate(batches)
+        }
+        holdings_jobs = {t: (lambda t=t: self.holdings_fetcher(t)) for t in tickers}
+
+        workers = self.price_concurrency + self.holdings_concurrency
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            prices, holdings = await asyncio.gather(
+                self._run_stage(executor, self.price_concurrency, price_jobs),
+                self._run_stage(executor, self.holdings_concurrency, holdings_jobs),
+            )
+        elapsed = time.perf_counter() - started
+
+        if prices["errors"]:
+            key, error = next(iter(prices["errors"].items()))
+            raise RuntimeError(f"Price download of {batches[key]} failed") from error
+        data = _combine_prices(
+            [prices["results"][i] for i in range(len(batches))], batches, tickers
+        )
+
+        report = {
+            "tickers": len(tickers),
+            "seconds": elapsed,
+            "stages": {
+                "prices": {
+                    "batches": len(batches),
+                    "seconds": prices["seconds"],
+                    "busy_seconds": prices["busy_seconds"],
+                },
+                "holdings": {
+                    "succeeded": len(holdings["results"]),
+                    "failed": {t: repr(e) for t, e in holdings["errors"].items()},
+                    "seconds": holdings["seconds"],
+                    "busy_seconds": holdings["busy_seconds"],
+                    "ticker_seconds": holdings["job_seconds"],
+                },
+            },
+        }
+        return data, holdings["results"], report
+
+    def fetch(self, tickers: list, start, end):
+        """
+        Download the prices and fetch the holdings of every ticker concurrently.
+
+        Parameters
+        ----------
+        tickers : list
+            Tickers to fetch.
+        start : dt.datetime
+            First date of the prices.
+        end : dt.datetime
+            End of the prices, excluded like in `yf.download`.
+
+        Returns
+        -------
+        tuple[pd.DataFrame, dict, dict]
+            Prices with (field, ticker) columns like `yf.download`, ticker mapped to its holdings
+            (failed tickers are left out), and a report with the wall time, busy time and failures of each stage.
+        """
+        return asyncio.run(self.fetch_async(tickers, start, end))
+
+
+def _combine_prices(frames: list, batches: list, tickers: list) -> pd.DataFrame:
+    """
+    :param frames: Frame returned for each batch.
+    :param batches: Tickers of each batch.
+    :return: (pd.DataFrame) One frame with (field, ticker) columns, in the order of `tickers`.
+    """
+    parts = []
+    for df, batch in zip(frames, batches):
+        # A download of a single ticker has one column per field.
+        if not isinstance(df.columns, pd.MultiIndex):
+            df = pd.concat({batch[0]: df}, axis=1).swaplevel(axis=1)
+        parts.append(df)
+    data = pd.concat(parts, axis=1)
+    fields = list(dict.fromkeys(data.columns.get_level_values(0)))
+    return data.reindex(columns=pd.MultiIndex.from_product([fields, tickers]))
@@ -0,0 +1,387 @@
+"""
+Static copy of the Schwab holdings pages, built from local holdings files.
+
+The pages keep the element layout the scraper's XPaths expect:
+    - ul[1]/li[4] switches the table to 60 rows.
+    - ul[2]/li[2..6] link to the pages of the current block of 5, ul[2]/li[7] links to the next block.
+Point `Etf.holdings_url` at `{base_url}/{}/index.html` to scrape it, or use a `FixtureDriver` to scrape it without a browser.
+"""
+
+import os
+import re
+import glob
+import html
+import threading
+import contextlib
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pandas as pd
+
+DEFAULT_ROWS = 20
+ROWS_PER_PAGE = 60
+PAGES_PER_BLOCK = 5
+
+
+"""----------------------------------- Formatting Operations -----------------------------------"""
+
+
+def _format_magnitude(value: float, dollar: bool = False) -> str:
+    """
+    :param value: Number to display.
+    :param dollar: Boolean to determine if a dollar sign is prefixed.
+    :return: (str) Value written the way the Schwab table does, e.g. "$39.60B" or "87.60M".
+    """
+    for magnitude, multiplier in (("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if abs(value) >= multiplier:
+            text = f"{value / multiplier:.2f}{magnitude}"
+            break
+    else:
+        text = f"{value:.2f}"
+    return f"${text}" if dollar else text
+
+
+def _format_weight(weight) -> str:
+    if isinstance(weight, str):
+        return weight
+    return f"{weight:.2f}%"
+
+
+def _row_cells(holdings: pd.DataFrame) -> list:
+    """
+    :param holdings: Holdings indexed by symbol.
+    :return: (list) Texts of the 5 cells of each row, as displayed in the table.
+    """
+    return [
+        [
+            str(symbol),
+            str(row["name"]),
+            _format_weight(row["weight"]),
+            _format_magnitude(row["shares_held"]),
+            _format_magnitude(row["market_value"], dollar=True),
+        ]
+        for symbol, row in holdings.iterrows()
+    ]
+
+
+"""----------------------------------- Page Operations -----------------------------------"""
+
+
+def _render_rows(holdings: pd.DataFrame) -> str:
+    rows = []
+    for symbol, name, weight, shares_held, market_value in _row_cells(holdings):
+        rows.append(
+            "<tr>"
+            f"<td>{html.escape(symbol)}</td>"
+            f"<td><span>{html.escape(name)}</span></td>"
+            f"<td>{weight}</td>"
+            f"<td>{shares_held}</td>"
+            f"<td>{market_value}</td>"
+            "</tr>"
+        )
+    return "".join(rows)
+
+
+def _render_pagination(page: int, page_count: int) -> str:
+    """
+    :param page: Current page, starting at 1. 0 is the default view before "show 60" is clicked.
+    :param page_count: Number of 60 row pages.
+    :return: (str) Both lists of the table footer.
+    """
+    show_60 = (
+        "<ul>"
+        "<li><a>Show</a></li>"
+        "<li><a>20</a></li>"
+        "<li><a>40</a></li>"
+        '<li><a href="page1.html">60</a></li>'
+        "</ul>"
+    )
+    block_start = ((max(page, 1) - 1) // PAGES_PER_BLOCK) * PAGES_PER_BLOCK + 1
+    links = ["<li><a>Prev</a></li>"]
+    for p in range(block_start, block_start + PAGES_PER_BLOCK):
+        if p <= page_count:
+            links.append(f'<li><a href="page{p}.html">{p}</a></li>')
+    next_page = block_start + PAGES_PER_BLOCK
+    if next_page <= page_count:
+        links.append(f'<li><a href="page{next_page}.html">Next</a></li>')
+    return show_60 + f"<ul>{''.join(links)}</ul>"
+
+
+def render_page(
+    holdings: pd.DataFrame, page: int, page_count: int, assets: str = ""
+) -> str:
+    """
+    :param holdings: Rows displayed on the page, indexed by symbol.
+    :param page: Current page, starting at 1. 0 is the default view.
+    :param page_count: Number of 60 row pages.
+    :param assets: HTML of the style sheets, scripts and images added to the head, see `_render_assets`.
+    :return: (str) HTML document.
+    """
+    table = (
+        "<table><thead><tr><th>Symbol</th><th>Name</th><th>Weight</th>"
+        "<th>Shares Held</th><th>Market Value</th></tr></thead>"
+        f"<tbody>{_render_rows(holdings)}</tbody></table>"
+    )
+    footer = f"<div>{_render_pagination(page, page_count)}</div>"
+    # body/div/div[2]/div[3]/div[2]/div[2]/div/div[3]/div/(table | div/ul)
+    content = f"<div></div><div></div><div><div>{table}{footer}</div></div>"
+    content = f"<div></div><div><div>{content}</div></div>"
+    content = f"<div></div><div>{content}</div>"
+    content = f"<div></div><div></div><div>{content}</div>"
+    return (
+        f"<!DOCTYPE html><html><head><title>Holdings</title>{assets}</head>"
+        f"<body><div><div></div><div>{content}</div></div></body></html>"
+    )
+
+
+# Size of each asset written by `_write_assets`, in bytes. Roughly the weight of the real page's resources.
+ASSET_SIZES = {
+    "assets/site.css": 80_000,
+    "assets/logo.png": 150_000,
+    "assets/banner.jpg": 250_000,
+    "assets/font.woff2": 60_000,
+    "analytics.js": 120_000,
+}
+
+
+def _write_assets(directory: str) -> None:
+    """
+    Write the assets of `ASSET_SIZES`, filled with bytes that do not compress.
+    """
+    for name, size in ASSET_SIZES.items():
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = os.urandom(size)
+        if name.endswith(".css"):
+            # A valid style sheet that also loads the font.
+            rule = "@font-face{font-family:f;src:url(font.woff2)}body{font-family:f}"
+            content = (
+                rule + "/*" + content.hex()[: size - len(rule) - 4] + "*/"
+            ).encode()
+        elif name.endswith(".js"):
+            content = ("//" + content.hex()[: size - 2]).encode()
+        with open(path, "wb") as file:
+            file.write(content)
+
+
+def _render_assets(third_party_url: str) -> str:
+    """
+    :param third_party_url: Base url of the host serving "analytics.js", standing in for the ad and analytics hosts.
+    :return: (str) HTML loading every asset of `ASSET_SIZES`.
+    """
+    return (
+        '<link rel="stylesheet" href="../assets/site.css">'
+        f'<script async src="{third_party_url}/analytics.js"></script>'
+        '<img src="../assets/logo.png" alt=""><img src="../assets/banner.jpg" alt="">'
+    )
+
+
+def write_fixture_site(
+    directory: str, holdings: dict, third_party_url: str = None
+) -> dict:
+    """
+    Write the pages of every ETF into `directory`.
+
+    Parameters
+    ----------
+    directory : str
+        Folder served as the site root.
+    holdings : dict
+        Ticker mapped to its holdings DataFrame, indexed by symbol.
+    third_party_url : str
+        If given, every page also loads a style sheet, a font, two images and a script from this host,
+        like the real page. The assets are written to `directory`, which the third party host should also serve.
+
+    Returns
+    -------
+    dict
+        Ticker mapped to its number of 60 row pages.
+    """
+    assets = ""
+    if third_party_url is not None:
+        _write_assets(directory)
+        assets = _render_assets(third_party_url)
+    page_counts = {}
+    for ticker, df in holdings.items():
+        etf_folder = os.path.join(directory, ticker)
+        os.makedirs(etf_folder, exist_ok=True)
+        page_count = max(1, -(-len(df) // ROWS_PER_PAGE))
+        pages = {
+            "index.html": render_page(df.iloc[:DEFAULT_ROWS], 0, page_count, assets)
+        }
+        for p in range(1, page_count + 1):
+            rows = df.iloc[(p - 1) * ROWS_PER_PAGE : p * ROWS_PER_PAGE]
+            pages[f"page{p}.html"] = render_page(rows, p, page_count, assets)
+        for name, content in pages.items():
+            with open(os.path.join(etf_folder, name), "w", encoding="utf-8") as file:
+                file.write(content)
+        page_counts[ticker] = page_count
+    return page_counts
+
+
+def load_local_holdings(base_path: str = "EtfData") -> dict:
+    """
+    :param base_path: Folder that contains one "{ticker}/holdings.csv" per ETF.
+    :return: (dict) Ticker mapped to its holdings DataFrame.
+    """
+    holdings = {}
+    for path in sorted(glob.glob(os.path.join(base_path, "*", "holdings.csv"))):
+        ticker = os.path.basename(os.path.dirname(path))
+        holdings[ticker] = pd.read_csv(path, index_col="symbol")
+    return holdings
+
+
+"""----------------------------------- Driver Operations -----------------------------------"""
+
+
+class _FixtureElement:
+    def __init__(self, driver, text: str = "", page: int = None) -> None:
+        self.driver = driver
+        self.text = text
+        self.page = page
+
+    def click(self) -> None:
+        if self.page is not None:
+            self.driver._show(self.page)
+
+
+class FixtureDriver:
+    """
+    Offline stand-in for a WebDriver on the fixture site, so the scraper runs without Chrome.
+
+    The scraper's scripts and element lookups are answered from the holdings, with the rows and pagination of the
+    pages written by `write_fixture_site`. Every page displayed gets a new table element, like a page load.
+    Calls are counted in `script_calls` and `element_calls`.
+    """
+
+    def __init__(
+        self, holdings: dict, stuck_pages=(), inert_next: bool = False
+    ) -> None:
+        """
+        :param holdings: Ticker mapped to its holdings DataFrame, indexed by symbol.
+        :param stuck_pages: Pages whose links do nothing when clicked, like a page that never loads.
+        :param inert_next: Boolean to determine if the last page keeps a Next link that does nothing when clicked,
+            instead of a disabled one.
+        """
+        self.holdings = holdings
+        self.stuck_pages = set(stuck_pages)
+        self.inert_next = inert_next
+        self.script_calls = 0
+        self.element_calls = 0
+        self._cells = []
+        self._rows = []
+        self._table = None
+        self._page_count = 0
+
+    def get(self, url: str) -> None:
+        """
+        :param url: Page of an ETF, "{base_url}/{ticker}/index.html" or "{base_url}/{ticker}/page{n}.html".
+        """
+        ticker, name = url.rstrip("/").split("/")[-2:]
+        self._cells = _row_cells(self.holdings[ticker])
+        self._page_count = max(1, -(-len(self._cells) // ROWS_PER_PAGE))
+        self._table = None
+        page = re.fullmatch(r"page(\d+)\.html", name)
+        self._show(int(page.group(1)) if page else 0)
+
+    def _show(self, page: int) -> None:
+        if page in self.stuck_pages:
+            return
+        if page == 0:
+            self._rows = self._cells[:DEFAULT_ROWS]
+        else:
+            self._rows = self._cells[(page - 1) * ROWS_PER_PAGE : page * ROWS_PER_PAGE]
+        self._table = object()
+
+    def _signature(self) -> str:
+        """
+        :return: (str) Same text as the signature script of the scraper.
+        """
+        if not self._rows:
+            return "0"
+        return "|".join(
+            [str(len(self._rows)), "".join(self._rows[0]), "".join(self._rows[-1])]
+        )
+
+    def execute_script(self, script: str, *args):
+        from etf import (
+            _READ_TABLE_SCRIPT,
+            _PAGE_CHANGED_SCRIPT,
+            _CLICK_NEXT_PAGE_SCRIPT,
+        )
+
+        self.script_calls += 1
+        if script == _READ_TABLE_SCRIPT:
+            if self._table is None:
+                return None
+            return {
+                "rows": [list(row) for row in self._rows],
+                "table": self._table,
+                "signature": self._signature(),
+            }
+        if script == _PAGE_CHANGED_SCRIPT:
+            return args[0] is not self._table or args[1] != self._signature()
+        if script == _CLICK_NEXT_PAGE_SCRIPT:
+            if args[1] > self._page_count:
+                return self.inert_next
+            self._show(args[1])
+            return True
+        raise ValueError("Script not supported by FixtureDriver")
+
+    def find_element(self, by: str, value: str):
+        from selenium.common.exceptions import NoSuchElementException
+
+        self.element_calls += 1
+        cell = re.search(r"/tbody/tr\[(\d+)\]/td\[(\d+)\]", value)
+        if cell is not None:
+            row, column = int(cell.group(1)) - 1, int(cell.group(2)) - 1
+            if row < len(self._rows):
+                return _FixtureElement(self, text=self._rows[row][column])
+        # The "60" entry of the rows per page list.
+        elif value.endswith("ul[1]/li[4]"):
+            return _FixtureElement(self, page=1)
+        raise NoSuchElementException(value)
+
+    def close(self) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+
+"""----------------------------------- Server Operations -----------------------------------"""
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_directory(directory: str, port: int = 0):
+    """
+    Serve `directory` over HTTP on localhost from a background thread.
+
+    :param directory: Folder served as the site root.
+    :param port: Port to listen on. 0 picks a free port.
+    :return: (str) Base url of the site, e.g. "http://127.0.0.1:8000".
+    """
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(write_fixture_site(directory, load_local_holdings()))
+        with serve_directory(directory, port=8000) as base_url:
+            print(f"Serving holdings pages at {base_url}/{{ticker}}/index.html")
+            threading.Event().wait()
@@ -0,0 +1,390 @@
+import os
+import json
+import shutil
+import threading
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from holdings_store import HOLDINGS_COLUMNS, file_lock, normalize_holdings
+
+
+class HoldingsHistory:
+    """
+    Dated holdings snapshots of many ETFs, stored append-only.
+
+    Each `append` writes one new segment and one line of the manifest. Nothing already written is changed,
+    so a snapshot stays readable while newer ones are added. Appends hold a lock file in the folder, so several
+    instances and processes can append to the same folder.
+
+    Files:
+        - "manifest.jsonl": one line per segment, with its date and the row range of each ETF.
+        - "securities.jsonl": security table, one [symbol, name] per line. A security's code is its line number.
+        - "append.lock": Held while appending.
+        - "segments/{n}/security.npy": int32 code of each row into the security table.
+        - "segments/{n}/weight.npy", "shares_held.npy", "market_value.npy": float64 columns.
+    """
+
+    VALUE_COLUMNS = ["weight", "shares_held", "market_value"]
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._entries = self._entry_frame([])
+        self._symbols = pd.Index([], dtype=object)
+        self._names = np.array([], dtype=object)
+        # Bytes of each file already read.
+        self._offsets = {"manifest.jsonl": 0, "securities.jsonl": 0}
+        self._columns = {}
+        self._lock = threading.RLock()
+
+    def _file(self, *names) -> str:
+        return os.path.join(self.path, *names)
+
+    def _segment_path(self, segment: int) -> str:
+        return self._file("segments", f"{segment:06d}")
+
+    """----------------------------------- Storage Operations -----------------------------------"""
+
+    def _read_lines(self, name: str) -> list:
+        """
+        :return: (list) Lines appended to the file since it was last read, parsed. A line still being written is left for the next read.
+        """
+        try:
+            with open(self._file(name), "rb") as file:
+                file.seek(self._offsets[name])
+                data = file.read()
+        except FileNotFoundError:
+            return []
+        end = data.rfind(b"\n") + 1
+        self._offsets[name] += end
+        return [json.loads(line) for line in data[:end].splitlines()]
+
+    def _read(self) -> None:
+        """
+        Read what was added to the manifest and the security table since the last read, by this or any other instance.
+        """
+        with self._lock:
+            rows = []
+            for segment in self._read_lines("manifest.jsonl"):
+                for t, (start, stop) in segment["etfs"].items():
+                    rows.append((t, segment["date"], segment["segment"], start, stop))
+            if rows:
+                self._entries = self._entry_frame(rows, self._entries)
+            # Read after the manifest: securities are written before the segments using them are listed.
+            securities = self._read_lines("securities.jsonl")
+            if securities:
+                self._symbols = self._symbols.append(
+                    pd.Index([symbol for symbol, _ in securities], dtype=object)
+                )
+                names = np.empty(len(securities), dtype=object)
+                names[:] = [name for _, name in securities]
+                self._names = np.concatenate([self._names, names])
+
+    def _next_segment(self) -> int:
+        """
+        :return: (int) Number of the next segment. Folders of segments never listed in the manifest
+            (left by a writer that stopped) are skipped too.
+        """
+        used = [int(n) for n in os.listdir(self._file("segments")) if n.isdigit()]
+        if len(self._entries):
+            used.append(int(self._entries["segment"].max()))
+        return max(used, default=-1) + 1
+
+    @staticmethod
+    def _entry_frame(rows: list, entries: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        :param rows: (etf, date, segment, start, stop) of each snapshot.
+        :param entries: Snapshots already read, to add the rows to.
+        :return: (pd.DataFrame) One row per stored snapshot of an ETF, sorted by ETF, date and segment.
+        """
+        df = pd.DataFrame(rows, columns=["etf", "date", "segment", "start", "stop"])
+        df["date"] = pd.to_datetime(df["date"])
+        if entries is not None and len(entries):
+            df = pd.concat([entries, df])
+        return df.sort_values(["etf", "date", "segment"], ignore_index=True)
+
+    def _segment_columns(self, segment: int) -> dict:
+        """
+        :return: (dict) Every array of the segment, memory mapped.
+        """
+        if segment not in self._columns:
+            names = ["security"] + self.VALUE_COLUMNS
+            self._columns[segment] = {
+                n: np.load(
+                    os.path.join(self._segment_path(segment), f"{n}.npy"), mmap_mode="r"
+                )
+                for n in names
+            }
+        return self._columns[segment]
+
+    def append(self, date, holdings) -> int:
+        """
+        Store the holdings of one or more ETFs on a date.
+
+        A later snapshot of the same ETF and date replaces the earlier one in every lookup, but both stay on disk.
+        A symbol listed twice in an ETF is kept once (the first row).
+
+        :param date: Date of the snapshot.
+        :param holdings: (dict | pd.DataFrame) Ticker mapped to its holdings indexed by symbol, or the long frame of `HoldingsStore.load_many`.
+        :return: (int) Number of the written segment.
+        """
+        date = pd.Timestamp(date).normalize()
+        if isinstance(holdings, dict):
+            if not holdings:
+                raise ValueError("No holdings to append")
+            holdings = pd.concat(
+                {t: df for t, df in holdings.items()}, names=["etf", "symbol"]
+            ).reset_index(level="etf")
+        etf = holdings["etf"].astype(str).str.upper().to_numpy()
+        df = normalize_holdings(holdings)
+        unique = ~pd.MultiIndex.from_arrays([etf, df.index]).duplicated()
+        etf_ids, tickers = pd.factorize(etf[unique])
+        order = np.argsort(etf_ids, kind="stable")
+        df = df[unique].iloc[order]
+        offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(etf_ids, minlength=len(tickers)))]
+        )
+        tickers = list(tickers)
+        values = {c: df[c].to_numpy(dtype=np.float64) for c in self.VALUE_COLUMNS}
+
+        os.makedirs(self._file("segments"), exist_ok=True)
+        with self._lock, file_lock(self._file("append.lock")):
+            # Other writers may have added segments and securities since the last read.
+            self._read()
+            # New securities are appended to the security table, known ones keep their code.
+            codes = self._symbols.get_indexer(df.index)
+            new = codes < 0
+            new_symbols = pd.Index(pd.unique(df.index[new]), dtype=object)
+            if new.any():
+                new_names = df["name"][new].groupby(level=0, sort=False).first()
+                codes[new] = len(self._symbols) + new_symbols.get_indexer(df.index[new])
+            codes = codes.astype(np.int32)
+
+            # Write to a temporary folder first. The manifest line makes the segment visible.
+            segment = self._next_segment()
+            temporary = self._segment_path(segment) + ".tmp"
+            shutil.rmtree(temporary, ignore_errors=True)
+            os.makedirs(temporary)
+            for name, array in {"security": codes, **values}.items():
+                np.save(os.path.join(temporary, f"{name}.npy"), array)
+            os.replace(temporary, self._segment_path(segment))
+
+            # The securities are written once the segment is in place, and before the manifest lists it.
+            if len(new_symbols):
+                with open(self._file("securities.jsonl"), "a") as file:
+                    for symbol in new_symbols:
+                        name = new_names[symbol]
+                        file.write(
+                            json.dumps([symbol, None if pd.isna(name) else name])
+                        )
+                        file.write("\n")
+            entry = {
+                "date": date.date().isoformat(),
+                "segment": segment,
+                "etfs": {
+                    t: [int(offsets[i]), int(offsets[i + 1])]
+                    for i, t in enumerate(tickers)
+                },
+            }
+            with open(self._file("manifest.jsonl"), "a") as file:
+                file.write(json.dumps(entry) + "\n")
+            self._read()
+        return segment
+
+    """----------------------------------- Lookup Operations -----------------------------------"""
+
+    def tickers(self) -> list:
+        self._read()
+        return list(pd.unique(self._entries["etf"]))
+
+    def dates(self, ticker: str = None) -> pd.DatetimeIndex:
+        """
+        :param ticker: ETF to list. If None, the dates of every ETF are listed.
+        :return: (pd.DatetimeIndex) Dates with a snapshot, sorted.
+        """
+        self._read()
+        entries = self._entries
+        if ticker is not None:
+            entries = entries[entries["etf"] == ticker.upper()]
+        return pd.DatetimeIndex(entries["date"].unique()).sort_values()
+
+    def _locate(self, date, tickers: list = None) -> pd.DataFrame:
+        """
+        :return: (pd.DataFrame) Latest snapshot at or before `date` of each ETF. ETFs without one are left out.
+        """
+        self._read()
+        entries = self._entries[self._entries["date"] <= pd.Timestamp(date)]
+        if tickers is not None:
+            entries = entries[entries["etf"].isin([t.upper() for t in tickers])]
+        # Entries are sorted by ETF, date and segment, so the last one of each ETF is the latest.
+        return entries.groupby("etf", sort=False).tail(1)
+
+    def _gather(self, located: pd.DataFrame) -> dict:
+        """
+        :param located: Snapshots returned by `_locate`.
+        :return: (dict) "etf" (row of `located` of each holding), "security" and the value columns, as flat arrays.
+        """
+        parts = {n: [] for n in ["etf", "security"] + self.VALUE_COLUMNS}
+        for segment, group in located.groupby("segment", sort=False):
+            columns = self._segment_columns(segment)
+            starts = group["start"].to_numpy()
+            lengths = group["stop"].to_numpy() - starts
+            # Row numbers of every ETF of the segment, built without a Python loop.
+            rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            rows = rows + np.arange(lengths.sum())
+            parts["etf"].append(
+                np.repeat(located.index.get_indexer(group.index), lengths)
+            )
+            for n in ["security"] + self.VALUE_COLUMNS:
+                parts[n].append(np.asarray(columns[n][rows]))
+        if not parts["etf"]:
+            return {
+                "etf": np.zeros(0, dtype=np.int64),
+                "security": np.zeros(0, dtype=np.int32),
+                **{n: np.zeros(0) for n in self.VALUE_COLUMNS},
+            }
+        # Segments are read in turn, so put the holdings back in the order of `located`.
+        order = np.argsort(np.concatenate(parts["etf"]), kind="stable")
+        return {n: np.concatenate(p)[order] for n, p in parts.items()}
+
+    def as_of(self, ticker: str, date) -> pd.DataFrame:
+        """
+        :param ticker: ETF to load.
+        :param date: Date of the lookup.
+        :return: (pd.DataFrame) Holdings of the latest snapshot at or before `date`, like `HoldingsStore.load`.
+            Raises KeyError if the ETF has no snapshot by then.
+        """
+        df = self.as_of_many(date, [ticker])
+        if df.empty:
+            raise KeyError(f"{ticker} has no snapshot on or before {date}")
+        return df.drop(columns=["etf", "date"])
+
+    def as_of_many(self, date, tickers: list = None) -> pd.DataFrame:
+        """
+        :param date: Date of the lookup.
+        :param tickers: ETFs to load. If None, every ETF with a snapshot by `date` is loaded.
+        :return: (pd.DataFrame) Holdings of the latest snapshot of each ETF, with "etf" and "date" (of the snapshot)
+            columns next to the symbol index, like `HoldingsStore.load_many`.
+        """
+        located = self._locate(date, tickers).reset_index(drop=True)
+        data = self._gather(located)
+        codes = data["security"]
+        df = pd.DataFrame(
+            {
+                "etf": located["etf"].to_numpy()[data["etf"]],
+                "date": located["date"].to_numpy()[data["etf"]],
+                "name": self._names[codes],
+                **{c: data[c] for c in self.VALUE_COLUMNS},
+            },
+            index=pd.Index(self._symbols[codes], name="symbol"),
+        )
+        return df[["etf", "date"] + HOLDINGS_COLUMNS]
+
+    """----------------------------------- Diff Operations -----------------------------------"""
+
+    def diff(self, ticker: str, start, end, min_change: float = 0.0) -> pd.DataFrame:
+        """
+        :param ticker: ETF to compare.
+        :return: (pd.DataFrame) Changes of the ETF between the two dates, indexed by symbol. See `diff_many`.
+        """
+        return self.diff_many(start, end, [ticker], min_change).drop(columns="etf")
+
+    def diff_many(
+        self, start, end, tickers: list = None, min_change: float = 0.0
+    ) -> pd.DataFrame:
+        """
+        Compare the snapshots of every ETF as of two dates.
+
+        Parameters
+        ----------
+        start : dt.datetime
+            Date of the earlier snapshots (the latest snapshot at or before it is used).
+        end : dt.datetime
+            Date of the later snapshots.
+        tickers : list
+            ETFs to compare. If None, every ETF with a snapshot by `end` is compared.
+        min_change : float
+            Weight changes of at most this many percentage points are left out.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per changed holding, indexed by symbol, with the columns "etf", "name",
+            "change" ("added", "removed" or "changed"), "weight_before", "weight_after", "weight_change",
+            "shares_before" and "shares_after". ETFs without an earlier snapshot count as added.
+        """
+        after = self._locate(end, tickers).reset_index(drop=True)
+        before = self._locate(start, list(after["etf"]))
+        # Number the ETFs the same way in both snapshots.
+        etfs = pd.Index(after["etf"])
+        before = before.set_index(etfs.get_indexer(before["etf"])).sort_index()
+        old = self._gather(before)
+        old["etf"] = before.index.to_numpy()[old["etf"]]
+        new = self._gather(after)
+
+        # A holding is the pair (ETF, security), packed into one integer key for a hash join.
+        old_keys = (old["etf"].astype(np.int64) << 32) | old["security"]
+        new_keys = (new["etf"].astype(np.int64) << 32) | new["security"]
+        matches = pd.Index(old_keys).get_indexer(new_keys)
+        matched = matches >= 0
+        kept = np.zeros(len(old_keys), dtype=bool)
+        kept[matches[matched]] = True
+
+        # A NaN is appended, so the -1 of an unmatched holding reads NaN.
+        weight_before = np.append(old["weight"], np.nan)[matches]
+        shares_before = np.append(old["shares_held"], np.nan)[matches]
+        weight_change = np.where(matched, new["weight"] - weight_before, new["weight"])
+        changed = ~matched | (np.abs(weight_change) > min_change)
+
+        removed = ~kept
+        etf = np.concatenate([new["etf"][changed], old["etf"][removed]])
+        security = np.concatenate([new["security"][changed], old["security"][removed]])
+        change = np.concatenate(
+            [
+                np.where(matched[changed], "changed", "added"),
+                np.full(removed.sum(), "removed"),
+            ]
+        )
+        df = pd.DataFrame(
+            {
+                "etf": etfs.to_numpy()[etf],
+                "name": self._names[security],
+                "change": change,
+                "weight_before": np.concatenate(
+                    [weight_before[changed], old["weight"][removed]]
+                ),
+                "weight_after": np.concatenate(
+                    [new["weight"][changed], np.full(removed.sum(), np.nan)]
+                ),
+                "weight_change": np.concatenate(
+                    [weight_change[changed], -old["weight"][removed]]
+                ),
+                "shares_before": np.concatenate(
+                    [shares_before[changed], old["shares_held"][removed]]
+                ),
+                "shares_after": np.concatenate(
+                    [new["shares_held"][changed], np.full(removed.sum(), np.nan)]
+                ),
+            },
+            index=pd.Index(self._symbols[security], name="symbol"),
+        )
+        return df
+
+
+def get_holdings_history(base_path: str) -> HoldingsHistory:
+    """
+    :param base_path: Data export folder of the ETFs.
+    :return: (HoldingsHistory) Snapshot history in "{base_path}/holdings_history".
+    """
+    return HoldingsHistory(os.path.join(base_path, "holdings_history"))
+
+
+if __name__ == "__main__":
+    from holdings_store import CsvHoldingsStore
+
+    local = CsvHoldingsStore("EtfData")
+    history = get_holdings_history("EtfData")
+    history.append(dt.date.today(), {t: local.load(t) for t in local.tickers()})
+    print(history.dates())
+    print(history.as_of_many(dt.date.today()))
@@ -0,0 +1,418 @@
+import os
+import glob
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from holdings_store import file_lock, normalize_holdings
+
+INDEX_COLUMNS = ["weight", "shares_held", "market_value"]
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "etf": pd.Series(dtype=object),
+            **{c: pd.Series(dtype=float) for c in INDEX_COLUMNS},
+        },
+        index=pd.Index([], dtype=object, name="symbol"),
+    )
+
+
+class _Postings:
+    """
+    Holdings sorted by symbol, so the ETFs holding a symbol are one slice.
+    """
+
+    def __init__(
+        self, symbols: np.ndarray, offsets: np.ndarray, etfs: np.ndarray, columns: dict
+    ) -> None:
+        """
+        :param symbols: Distinct symbols, in the order of their slices.
+        :param offsets: Start of the slice of each symbol, and the end of the last one.
+        :param etfs: Ticker of each holding.
+        :param columns: "weight", "shares_held" and "market_value" of each holding.
+        """
+        self.symbols = symbols
+        self.offsets = offsets
+        self.etfs = etfs
+        self.columns = columns
+        self.lookup = {s: i for i, s in enumerate(symbols.tolist())}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "_Postings":
+        """
+        :param df: Long holdings indexed by symbol, with an "etf" column.
+        """
+        symbol_ids, symbols = pd.factorize(df.index, sort=True)
+        order = np.argsort(symbol_ids, kind="stable")
+        counts = np.bincount(symbol_ids, minlength=len(symbols))
+        return cls(
+            np.asarray(symbols, dtype=str),
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            df["etf"].to_numpy(dtype=str)[order],
+            {c: df[c].to_numpy(dtype=np.float64)[order] for c in INDEX_COLUMNS},
+        )
+
+    def rows(self, symbols: list) -> tuple:
+        """
+        :return: (tuple) Rows of the holdings of every symbol, and the position in `symbols` of each row.
+        """
+        found = [(i, self.lookup[s]) for i, s in enumerate(symbols) if s in self.lookup]
+        if not found:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        positions, ids = (np.array(a, dtype=np.int64) for a in zip(*found))
+        starts = self.offsets[ids]
+        lengths = self.offsets[ids + 1] - starts
+        # Row numbers of every slice, built without a Python loop.
+        rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return rows + np.arange(lengths.sum()), np.repeat(positions, lengths)
+
+
+class HoldingsIndex:
+    """
+    Inverted index of the holdings: symbol -> the ETFs that hold it, with weight, shares held and market value.
+
+    The base index is sorted by symbol and read with memory mapping, so a symbol is found with one dict lookup.
+    Refreshing an ETF writes a small update file instead of rewriting the base. The ETF's rows of the base are
+    then ignored, and the updates are merged into the base once there are more than `compact_after`.
+
+    Every base is written to a new folder, with its own updates, and the metadata switches to it in one
+    `os.replace`. Readers see either the previous base and its updates or the new one, and folders no longer
+    listed are removed one write later, so readers of the previous metadata can finish. Writers of every instance
+    and process take a lock file, so an update is never lost to a concurrent rebuild or compaction.
+
+    The base and the updates are read once and kept. Lookups only read them again when the index changed on disk,
+    e.g. after another instance refreshed an ETF, so one instance can serve every lookup of a session.
+
+    Files:
+        - "meta.json": number of the current base.
+        - "write.lock": Held while writing.
+        - "bases/{n}/symbols.npy", "offsets.npy": distinct symbols and the slice of each one.
+        - "bases/{n}/etf.npy", "weight.npy", "shares_held.npy", "market_value.npy": one row per holding, sorted by symbol.
+        - "bases/{n}/updates/{ticker}.npz": holdings of an ETF refreshed after the base was built.
+    """
+
+    def __init__(self, path: str, compact_after: int = 100) -> None:
+        """
+        :param path: Folder of the index.
+        :param compact_after: Number of refreshed ETFs kept as update files before they are merged into the base.
+        """
+        self.path = path
+        self.compact_after = compact_after
+        self._base = None
+        self._updates = None
+        self._delta = None
+        # Result of `_disk_state` when the base and the updates were read.
+        self._state = None
+
+    def _file(self, *names) -> str:
+        return os.path.join(self.path, *names)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._file("meta.json"))
+
+    """----------------------------------- Storage Operations -----------------------------------"""
+
+    def _base_path(self, base: int, *names) -> str:
+        return self._file("bases", f"{base:06d}", *names)
+
+    def _read_meta(self):
+        """
+        :return: (dict | None) Metadata of the current base, or None if the index was never written.
+        """
+        try:
+            with open(self._file("meta.json"), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _disk_state(self) -> tuple:
+        """
+        :return: (tuple) Number of the current base, and the modification time and size of each of its update
+            files, which change with every write.
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return None, ()
+        try:
+            with os.scandir(self._base_path(meta["base"], "updates")) as entries:
+                updates = sorted(
+                    (e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                    for e in entries
+                    if e.name.endswith(".npz")
+                )
+        except FileNotFoundError:
+            updates = []
+        return meta["base"], tuple(updates)
+
+    def refresh(self) -> bool:
+        """
+        Forget the base and the updates read so far if the index changed on disk since.
+
+        :return: (bool) True if they are read again on the next lookup.
+        """
+        state = self._disk_state()
+        if state == self._state:
+            return False
+        self._base = None
+        self._updates = None
+        self._delta = None
+        self._state = state
+        return True
+
+    def _current_base(self):
+        """
+        :return: (int | None) Base of the state read last, the one its updates belong to.
+        """
+        if self._state is None:
+            self._state = self._disk_state()
+        return self._state[0]
+
+    def _read_base(self) -> _Postings:
+        if self._base is None:
+            base = self._current_base()
+            if base is None:
+                self._base = _Postings.from_frame(_empty_frame())
+                return self._base
+            arrays = {
+                n: np.load(self._base_path(base, f"{n}.npy"), mmap_mode="r")
+                for n in ["symbols", "offsets", "etf"] + INDEX_COLUMNS
+            }
+            self._base = _Postings(
+                np.asarray(arrays["symbols"]),
+                np.asarray(arrays["offsets"]),
+                arrays["etf"],
+                {c: arrays[c] for c in INDEX_COLUMNS},
+            )
+        return self._base
+
+    def _read_updates(self) -> dict:
+        """
+        :return: (dict) Ticker mapped to the holdings of its update file.
+        """
+        if self._updates is None:
+            self._updates = {}
+            base = self._current_base()
+            paths = (
+                glob.glob(self._base_path(base, "updates", "*.npz"))
+                if base is not None
+                else []
+            )
+            for path in paths:
+                with np.load(path) as data:
+                    df = pd.DataFrame(
+                        {c: data[c] for c in INDEX_COLUMNS},
+                        index=pd.Index(data["symbol"], name="symbol"),
+                    )
+                self._updates[os.path.basename(path)[: -len(".npz")]] = df
+        return self._updates
+
+    def _read_delta(self) -> _Postings:
+        """
+        :return: (_Postings) Holdings of every update file, sorted by symbol.
+        """
+        if self._delta is None:
+            updates = self._read_updates()
+            frames = [df.assign(etf=t) for t, df in updates.items()]
+            df = pd.concat(frames) if frames else _empty_frame()
+            self._delta = _Postings.from_frame(df)
+        return self._delta
+
+    def _write_base(self, postings: _Postings) -> None:
+        """
+        Write a new base without updates and switch to it. Called with the write lock held.
+        """
+        os.makedirs(self._file("bases"), exist_ok=True)
+        previous = self._read_meta()
+        used = [int(n) for n in os.listdir(self._file("bases")) if n.isdigit()]
+        base = max(used, default=-1) + 1
+        arrays = {
+            "symbols": postings.symbols,
+            "offsets": postings.offsets,
+            "etf": postings.etfs,
+            **postings.columns,
+        }
+        # Write to a temporary folder first. The metadata makes the base visible.
+        temporary = self._base_path(base) + ".tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), np.asarray(array))
+        os.replace(temporary, self._base_path(base))
+
+        meta = {
+            "base": base,
+            "holdings": int(len(postings.etfs)),
+            "symbols": len(postings.symbols),
+        }
+        with open(self._file("meta.json.tmp"), "w") as file:
+            json.dump(meta, file)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+        # Bases listed by neither the new nor the previous metadata have no readers left.
+        live = {base} if previous is None else {base, previous["base"]}
+        for n in used:
+            if n not in live:
+                shutil.rmtree(self._base_path(n), ignore_errors=True)
+        self._base = None
+        self._updates = None
+        self._delta = None
+        self._state = None
+
+    """----------------------------------- Build Operations -----------------------------------"""
+
+    def rebuild(self, holdings) -> None:
+        """
+        Replace the whole index.
+
+        :param holdings: (dict | pd.DataFrame) Ticker mapped to its holdings indexed by symbol, or the long frame of `HoldingsStore.load_many`.
+        """
+        if isinstance(holdings, dict):
+            holdings = pd.concat(
+                {t.upper(): normalize_holdings(df) for t, df in holdings.items()},
+                names=["etf", "symbol"],
+            ).reset_index(level="etf")
+        else:
+            holdings = holdings.assign(etf=holdings["etf"].astype(str).str.upper())
+        postings = _Postings.from_frame(holdings)
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self._file("write.lock")):
+            self._write_base(postings)
+
+    def update(self, ticker: str, df: pd.DataFrame) -> None:
+        """
+        Replace the holdings of one ETF.
+
+        :param ticker: ETF refreshed.
+        :param df: New holdings of the ETF, indexed by symbol. An empty frame removes the ETF.
+        """
+        self.update_many({ticker: df})
+
+    def update_many(self, holdings: dict) -> None:
+        """
+        :param holdings: Ticker mapped to its new holdings, indexed by symbol.
+        """
+        frames = {
+            t.upper(): normalize_holdings(df)[INDEX_COLUMNS]
+            for t, df in holdings.items()
+        }
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self._file("write.lock")):
+            if self._read_meta() is None:
+                self._write_base(_Postings.from_frame(_empty_frame()))
+            # Read the updates of other writers, so a compaction below keeps them.
+            self.refresh()
+            base = self._current_base()
+            updates = self._read_updates()
+            os.makedirs(self._base_path(base, "updates"), exist_ok=True)
+            for ticker, df in frames.items():
+                path = self._base_path(base, "updates", f"{ticker}.npz")
+                # Written under another name first, so readers never load a half written update.
+                with open(f"{path}.tmp", "wb") as file:
+                    np.savez(
+                        file,
+                        symbol=df.index.to_numpy(dtype=str),
+                        **{c: df[c].to_numpy(dtype=np.float64) for c in INDEX_COLUMNS},
+                    )
+                os.replace(f"{path}.tmp", path)
+                updates[ticker] = df
+            self._delta = None
+            # The updates kept in memory match the files just written.
+            self._state = self._disk_state()
+            if len(updates) > self.compact_after:
+                self._write_base(_Postings.from_frame(self.to_frame()))
+
+    def compact(self) -> None:
+        """
+        Merge the update files into the base index.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self._file("write.lock")):
+            self._write_base(_Postings.from_frame(self.to_frame()))
+
+    """----------------------------------- Lookup Operations -----------------------------------"""
+
+    def _gather(self, postings: _Postings, rows: np.ndarray) -> dict:
+        return {
+            "etf": np.asarray(postings.etfs[rows]),
+            **{c: np.asarray(postings.columns[c][rows]) for c in INDEX_COLUMNS},
+        }
+
+    def holders_many(self, symbols: list, etfs: list = None) -> pd.DataFrame:
+        """
+        :param symbols: Symbols to look up.
+        :param etfs: ETFs to keep. If None, every ETF is kept.
+        :return: (pd.DataFrame) One row per (symbol, ETF) holding, indexed by symbol, with the columns "etf",
+            "weight", "shares_held" and "market_value". Rows follow the order of `symbols`.
+        """
+        symbols = list(symbols)
+        self.refresh()
+        base = self._read_base()
+        delta = self._read_delta()
+        base_rows, base_positions = base.rows(symbols)
+        delta_rows, delta_positions = delta.rows(symbols)
+        old = self._gather(base, base_rows)
+        new = self._gather(delta, delta_rows)
+
+        # Rows of the base that belong to a refreshed ETF are replaced by its update.
+        current = ~np.isin(old["etf"], list(self._read_updates()))
+        data = {n: np.concatenate([old[n][current], new[n]]) for n in old}
+        positions = np.concatenate([base_positions[current], delta_positions])
+        if etfs is not None:
+            keep = np.isin(data["etf"], [t.upper() for t in etfs])
+            data = {n: v[keep] for n, v in data.items()}
+            positions = positions[keep]
+
+        order = np.argsort(positions, kind="stable")
+        df = pd.DataFrame(
+            {n: v[order] for n, v in data.items()},
+            index=pd.Index(
+                np.array(symbols, dtype=object)[positions[order]], name="symbol"
+            ),
+        )
+        df["etf"] = df["etf"].astype(object)
+        return df
+
+    def holders(self, symbol: str, etfs: list = None) -> pd.DataFrame:
+        """
+        :param symbol: Symbol to look up.
+        :param etfs: ETFs to keep. If None, every ETF is kept.
+        :return: (pd.DataFrame) "weight", "shares_held" and "market_value" of each ETF holding the symbol,
+            indexed by ETF, largest weight first.
+        """
+        df = self.holders_many([symbol], etfs).set_index("etf")
+        return df.sort_values("weight", ascending=False)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        :return: (pd.DataFrame) Every holding of the index, like `HoldingsStore.load_many`, without the names.
+        """
+        self.refresh()
+        base = self._read_base()
+        data = self._gather(base, np.arange(len(base.etfs)))
+        symbols = np.repeat(base.symbols, np.diff(base.offsets))
+        current = ~np.isin(data["etf"], list(self._read_updates()))
+        df = pd.DataFrame(
+            {n: v[current] for n, v in data.items()},
+            index=pd.Index(symbols[current], name="symbol"),
+        )
+        frames = [df] + [
+            u.assign(etf=t)[["etf"] + INDEX_COLUMNS]
+            for t, u in self._read_updates().items()
+        ]
+        return pd.concat(frames)
+
+
+def get_holdings_index(base_path: str, store=None) -> HoldingsIndex:
+    """
+    :param base_path: Data export folder of the ETFs.
+    :param store: Holdings store used to build the index if it does not exist yet.
+    :return: (HoldingsIndex) Index in "{base_path}/holdings_index".
+    """
+    index = HoldingsIndex(os.path.join(base_path, "holdings_index"))
+    if not index.exists() and store is not None:
+        index.rebuild(store.load_many())
+    return index
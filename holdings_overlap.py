@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# Maximum number of ETF pairs expanded at once when summing the overlap of each security.
+PAIR_CHUNK = 1 << 22
+
+
+class HoldingsMatrix:
+    """
+    Sparse ETF x security weight matrix, stored as one entry per holding.
+
+    Entries are sorted by security, so the ETFs that hold the same security are contiguous.
+    Weights are in percent, like the "weight" column of the holdings.
+    """
+
+    def __init__(
+        self,
+        etfs: list,
+        symbols: list,
+        etf_ids: np.ndarray,
+        security_ids: np.ndarray,
+        weights: np.ndarray,
+    ) -> None:
+        """
+        :param etfs: Ticker of each row.
+        :param symbols: Symbol of each column.
+        :param etf_ids: Row of each entry.
+        :param security_ids: Column of each entry.
+        :param weights: Weight of each entry, in percent.
+        """
+        order = np.lexsort((etf_ids, security_ids))
+        self.etfs = list(etfs)
+        self.symbols = list(symbols)
+        self.etf_ids = np.asarray(etf_ids, dtype=np.int64)[order]
+        self.security_ids = np.asarray(security_ids, dtype=np.int64)[order]
+        self.weights = np.asarray(weights, dtype=np.float64)[order]
+
+    @classmethod
+    def from_holdings(cls, holdings) -> "HoldingsMatrix":
+        """
+        :param holdings: (dict | pd.DataFrame) Ticker mapped to its holdings indexed by symbol, or the long frame of `HoldingsStore.load_many`.
+        :return: (HoldingsMatrix) Matrix of every ETF and every symbol held.
+        """
+        if isinstance(holdings, dict):
+            holdings = pd.concat(
+                {t: df[["weight"]] for t, df in holdings.items()},
+                names=["etf", "symbol"],
+            ).reset_index(level="etf")
+        df = holdings[["etf", "weight"]].copy()
+        df = df[df["weight"].notna() & (df["weight"] > 0)]
+        # Holdings listed twice in an ETF (e.g. on two pages) count once.
+        df = df.groupby(["etf", df.index], sort=False)["weight"].max()
+
+        etf_ids, etfs = pd.factorize(df.index.get_level_values(0))
+        security_ids, symbols = pd.factorize(df.index.get_level_values(1))
+        return cls(etfs, symbols, etf_ids, security_ids, df.to_numpy())
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self.etfs), len(self.symbols))
+
+    def to_dense(self, dtype=np.float32) -> np.ndarray:
+        """
+        :return: (np.ndarray) ETF x security weights. Zero where the ETF does not hold the security.
+        """
+        matrix = np.zeros(self.shape, dtype=dtype)
+        matrix[self.etf_ids, self.security_ids] = self.weights
+        return matrix
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.to_dense(np.float64), index=self.etfs, columns=self.symbols
+        )
+
+    """----------------------------------- Compare Operations -----------------------------------"""
+
+    def _overlap(self) -> np.ndarray:
+        """
+        Sum over securities of the smaller weight of every pair of ETFs that hold it.
+        Each pair is expanded once (upper triangle), so the work grows with the holders of each security squared.
+
+        :return: (np.ndarray) ETF x ETF weighted overlap, in percent.
+        """
+        n = len(self.etfs)
+        overlap = np.zeros(n * n)
+        if len(self.weights) == 0:
+            return overlap.reshape(n, n)
+
+        group_starts = np.flatnonzero(
+            np.r_[True, self.security_ids[1:] != self.security_ids[:-1]]
+        )
+        group_sizes = np.diff(np.r_[group_starts, len(self.security_ids)])
+        # Rank of each entry inside its security. It pairs with itself and the entries after it.
+        ranks = np.arange(len(self.security_ids)) - np.repeat(group_starts, group_sizes)
+        partners = np.repeat(group_sizes, group_sizes) - ranks
+
+        # Split the entries so each chunk expands at most PAIR_CHUNK pairs (a single larger entry is its own chunk).
+        chunk_ends = np.cumsum(partners)
+        first = 0
+        while first < len(partners):
+            limit = (chunk_ends[first - 1] if first else 0) + PAIR_CHUNK
+            last = max(first + 1, int(np.searchsorted(chunk_ends, limit, side="right")))
+
+            counts = partners[first:last]
+            left = np.repeat(np.arange(first, last), counts)
+            block_starts = np.repeat(np.cumsum(counts) - counts, counts)
+            right = left + np.arange(len(left)) - block_starts
+
+            # Entries of a security are sorted by ETF, so every pair falls in the upper triangle.
+            cells = self.etf_ids[left] * n + self.etf_ids[right]
+            overlap += np.bincount(
+                cells,
+                np.minimum(self.weights[left], self.weights[right]),
+                minlength=n * n,
+            )
+            first = last
+
+        overlap = overlap.reshape(n, n)
+        return overlap + overlap.T - np.diag(np.diag(overlap))
+
+    def compare(self) -> dict:
+        """
+        Pairwise similarity of every ETF.
+
+        Returns
+        -------
+        dict
+            "overlap": sum over securities of the smaller weight of the pair, in percent.
+            "jaccard": shared securities divided by the securities held by either ETF.
+            "cosine": cosine similarity of the weight vectors.
+            Each value is an ETF x ETF DataFrame.
+        """
+        weights = self.to_dense(np.float32)
+        held = (weights > 0).astype(np.float32)
+        # Both are single matrix products over the securities.
+        product = (weights @ weights.T).astype(np.float64)
+        shared = (held @ held.T).astype(np.float64)
+        overlap = self._overlap()
+
+        counts = np.diag(shared)
+        norms = np.sqrt(np.diag(product))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            jaccard = shared / (counts[:, None] + counts[None, :] - shared)
+            cosine = product / np.outer(norms, norms)
+
+        def frame(values):
+            return pd.DataFrame(values, index=self.etfs, columns=self.etfs)
+
+        return {
+            "overlap": frame(overlap),
+            "jaccard": frame(jaccard),
+            "cosine": frame(cosine),
+        }
@@ -0,0 +1,330 @@
+import os
+import glob
+import json
+import time
+import shutil
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+from value_parser import parse_numbers
+
+HOLDINGS_COLUMNS = ["name", "weight", "shares_held", "market_value"]
+
+
+def normalize_holdings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param df: Holdings indexed by symbol, as scraped or read from a csv file.
+    :return: (pd.DataFrame) Same holdings with "weight" as a float in percent (7.29 for "7.29%").
+    """
+    df = df[HOLDINGS_COLUMNS].copy()
+    if df["weight"].dtype == object:
+        df["weight"] = parse_numbers(df["weight"])[0]
+    df["weight"] = df["weight"].astype(float)
+    df["shares_held"] = df["shares_held"].astype(float)
+    df["market_value"] = df["market_value"].astype(float)
+    df.index = df.index.astype(str)
+    df.index.name = "symbol"
+    return df
+
+
+@contextlib.contextmanager
+def file_lock(path: str, timeout: float = 60.0):
+    """
+    Hold a lock file shared by every instance and process writing the same folder.
+
+    :param path: Lock file, created while the lock is held.
+    :param timeout: Seconds to wait for another writer before raising TimeoutError.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"{path} is held by another writer. Remove it if no writer is running."
+                )
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+class HoldingsStore:
+    """
+    Storage backend of ETF holdings.
+
+    Holdings are returned indexed by "symbol" with the columns "name", "weight" (float, in percent),
+    "shares_held" and "market_value".
+    """
+
+    def load(self, ticker: str) -> pd.DataFrame:
+        """
+        :param ticker: ETF to load.
+        :return: (pd.DataFrame) Holdings of the ETF. Raises FileNotFoundError if the ETF is not stored.
+        """
+        raise NotImplementedError
+
+    def load_many(self, tickers: list = None) -> pd.DataFrame:
+        """
+        :param tickers: ETFs to load. If None, every stored ETF is loaded.
+        :return: (pd.DataFrame) Holdings of every ETF, with an "etf" column next to the symbol index.
+        """
+        raise NotImplementedError
+
+    def save(self, ticker: str, df: pd.DataFrame) -> None:
+        self.save_many({ticker: df})
+
+    def save_many(self, holdings: dict) -> None:
+        """
+        :param holdings: Ticker mapped to its holdings DataFrame. Stored ETFs are replaced.
+        """
+        raise NotImplementedError
+
+    def tickers(self) -> list:
+        """
+        :return: (list) Every stored ETF.
+        """
+        raise NotImplementedError
+
+
+class CsvHoldingsStore(HoldingsStore):
+    """
+    One "{ticker}/holdings.csv" per ETF, the layout of the "EtfData" folder.
+    """
+
+    def __init__(self, base_path: str) -> None:
+        self.base_path = base_path
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.base_path, ticker, "holdings.csv")
+
+    def load(self, ticker: str) -> pd.DataFrame:
+        df = pd.read_csv(self._path(ticker), index_col="symbol")
+        return normalize_holdings(df)
+
+    def load_many(self, tickers: list = None) -> pd.DataFrame:
+        tickers = self.tickers() if tickers is None else tickers
+        frames = {t: self.load(t) for t in tickers}
+        if not frames:
+            return pd.DataFrame(columns=["etf"] + HOLDINGS_COLUMNS)
+        df = pd.concat(frames, names=["etf", "symbol"]).reset_index(level="etf")
+        return df
+
+    def save_many(self, holdings: dict) -> None:
+        for ticker, df in holdings.items():
+            os.makedirs(os.path.join(self.base_path, ticker), exist_ok=True)
+            normalize_holdings(df).to_csv(self._path(ticker))
+
+    def tickers(self) -> list:
+        paths = glob.glob(os.path.join(self.base_path, "*", "holdings.csv"))
+        return sorted(os.path.basename(os.path.dirname(p)) for p in paths)
+
+
+class NumpyHoldingsStore(HoldingsStore):
+    """
+    Holdings of every ETF in segments of typed NumPy arrays, read with memory mapping.
+
+    Each `save_many` writes the saved ETFs to a new segment, then lists them in the metadata, which is replaced
+    in one `os.replace`. Readers see either every ETF of a save or none, and a save costs the size of the saved
+    holdings, not of the store. Segments no longer listed are removed one save later, so readers of the previous
+    metadata can finish. Past `MAX_SEGMENTS` segments, a save rewrites every ETF into one segment.
+
+    Files:
+        - "meta.json": segment and row range of each ETF.
+        - "save.lock": Held while saving.
+        - "segments/{n}/security.npy": int32 code of each row into the security table of the segment.
+        - "segments/{n}/security_symbol.npy", "security_name.npy": security table, one row per distinct (symbol, name).
+        - "segments/{n}/weight.npy", "shares_held.npy", "market_value.npy": float64 columns.
+    """
+
+    VALUE_COLUMNS = ["weight", "shares_held", "market_value"]
+    MAX_SEGMENTS = 64
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _file(self, *names) -> str:
+        return os.path.join(self.path, *names)
+
+    def _segment_path(self, segment: int) -> str:
+        return self._file("segments", f"{segment:06d}")
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._file("meta.json"), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"tickers": {}, "rows": 0}
+
+    def _read_columns(self, segment: int) -> dict:
+        """
+        :return: (dict) Every array of the segment, memory mapped.
+        """
+        names = ["security", "security_symbol", "security_name"] + self.VALUE_COLUMNS
+        path = self._segment_path(segment)
+        return {
+            n: np.load(os.path.join(path, f"{n}.npy"), mmap_mode="r") for n in names
+        }
+
+    def _to_frame(self, columns: dict, rows) -> pd.DataFrame:
+        """
+        :param columns: Arrays returned by `_read_columns`.
+        :param rows: Slice or index array of the rows to return.
+        """
+        codes = np.asarray(columns["security"][rows])
+        df = pd.DataFrame(
+            {
+                "name": columns["security_name"][codes].astype(object),
+                "weight": np.asarray(columns["weight"][rows]),
+                "shares_held": np.asarray(columns["shares_held"][rows]),
+                "market_value": np.asarray(columns["market_value"][rows]),
+            },
+            index=pd.Index(
+                columns["security_symbol"][codes].astype(object), name="symbol"
+            ),
+        )
+        return df
+
+    def load(self, ticker: str) -> pd.DataFrame:
+        meta = self._read_meta()
+        if ticker not in meta["tickers"]:
+            raise FileNotFoundError(f"{ticker} is not in {self.path}")
+        segment, start, stop = meta["tickers"][ticker]
+        return self._to_frame(self._read_columns(segment), slice(start, stop))
+
+    def load_many(self, tickers: list = None) -> pd.DataFrame:
+        meta = self._read_meta()
+        tickers = list(meta["tickers"]) if tickers is None else tickers
+        missing = [t for t in tickers if t not in meta["tickers"]]
+        if missing:
+            raise FileNotFoundError(f"{missing} are not in {self.path}")
+        if not tickers:
+            return pd.DataFrame(columns=["etf"] + HOLDINGS_COLUMNS)
+
+        locations = np.array([meta["tickers"][t] for t in tickers], dtype=np.int64)
+        frames, positions = [], []
+        for segment in pd.unique(locations[:, 0]):
+            members = np.flatnonzero(locations[:, 0] == segment)
+            starts, stops = locations[members, 1], locations[members, 2]
+            lengths = stops - starts
+            # Row numbers of every requested ETF of the segment, built without a Python loop.
+            rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            rows = rows + np.arange(lengths.sum())
+            frames.append(self._to_frame(self._read_columns(int(segment)), rows))
+            positions.append(np.repeat(members, lengths))
+
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        positions = np.concatenate(positions)
+        if len(frames) > 1:
+            # Segments are read in turn, so put the holdings back in the order of `tickers`.
+            order = np.argsort(positions, kind="stable")
+            df, positions = df.iloc[order], positions[order]
+        df.insert(0, "etf", np.array(tickers, dtype=object)[positions])
+        return df
+
+    def save_many(self, holdings: dict) -> None:
+        frames = {t: normalize_holdings(df) for t, df in holdings.items()}
+        if not frames:
+            return
+        os.makedirs(self._file("segments"), exist_ok=True)
+        with file_lock(self._file("save.lock")):
+            previous = self._read_meta()
+            locations = {
+                t: v for t, v in previous["tickers"].items() if t not in frames
+            }
+            if len({v[0] for v in locations.values()}) >= self.MAX_SEGMENTS:
+                # Too many segments to read quickly: rewrite the kept ETFs with the saved ones.
+                stored = self.load_many(list(locations))
+                kept = {t: df.drop(columns="etf") for t, df in stored.groupby("etf")}
+                frames = {**{t: kept[t] for t in locations}, **frames}
+                locations = {}
+
+            used = [int(n) for n in os.listdir(self._file("segments")) if n.isdigit()]
+            segment = max(used, default=-1) + 1
+            offsets = self._write_segment(segment, frames)
+            for i, t in enumerate(frames):
+                locations[t] = [segment, int(offsets[i]), int(offsets[i + 1])]
+
+            meta = {
+                "tickers": locations,
+                "rows": sum(stop - start for _, start, stop in locations.values()),
+            }
+            with open(self._file("meta.json.tmp"), "w") as file:
+                json.dump(meta, file)
+            os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+            # Segments listed by neither the new nor the previous metadata have no readers left.
+            live = {v[0] for v in locations.values()}
+            live.update(v[0] for v in previous["tickers"].values())
+            for n in used:
+                if n not in live:
+                    shutil.rmtree(self._segment_path(n), ignore_errors=True)
+
+    def _write_segment(self, segment: int, frames: dict) -> np.ndarray:
+        """
+        :param segment: Number of the new segment.
+        :param frames: Ticker mapped to its normalized holdings.
+        :return: (np.ndarray) Row offsets of the ETFs in the segment, in the order of `frames`, then the number of rows.
+        """
+        df = pd.concat(list(frames.values()))
+        offsets = np.concatenate([[0], np.cumsum([len(f) for f in frames.values()])])
+        keys = pd.MultiIndex.from_arrays([df.index, df["name"].astype(str)])
+        codes, uniques = pd.factorize(keys)
+        arrays = {
+            "security": codes.astype(np.int32),
+            "security_symbol": np.array(uniques.get_level_values(0), dtype=str),
+            "security_name": np.array(uniques.get_level_values(1), dtype=str),
+        }
+        for c in self.VALUE_COLUMNS:
+            arrays[c] = df[c].to_numpy(dtype=np.float64)
+
+        # Write to a temporary folder first. The metadata makes the segment visible.
+        temporary = self._segment_path(segment) + ".tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), array)
+        os.replace(temporary, self._segment_path(segment))
+        return offsets
+
+    def tickers(self) -> list:
+        return list(self._read_meta()["tickers"])
+
+
+def get_holdings_store(base_path: str, kind: str = "numpy") -> HoldingsStore:
+    """
+    :param base_path: Data export folder of the ETFs.
+    :param kind: "numpy" for the columnar store in "{base_path}/holdings", "csv" for one "{ticker}/holdings.csv" per ETF.
+    :return: (HoldingsStore) Store of the holdings.
+    """
+    if kind == "numpy":
+        return NumpyHoldingsStore(os.path.join(base_path, "holdings"))
+    elif kind == "csv":
+        return CsvHoldingsStore(base_path)
+    raise ValueError(f"Unknown holdings store: {kind}")
+
+
+def migrate_csv_holdings(base_path: str, target: HoldingsStore) -> list:
+    """
+    Copy every "{ticker}/holdings.csv" of `base_path` into `target` in one write.
+
+    :param base_path: Folder with the csv holdings, e.g. "EtfData".
+    :param target: Store that receives the holdings.
+    :return: (list) Migrated tickers.
+    """
+    source = CsvHoldingsStore(base_path)
+    tickers = source.tickers()
+    target.save_many({t: source.load(t) for t in tickers})
+    return tickers
+
+
+if __name__ == "__main__":
+    store = get_holdings_store("EtfData")
+    print(f"Migrated: {migrate_csv_holdings('EtfData', store)}")
+    print(store.load_many())
@@ -0,0 +1,235 @@
+import io
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+import tracemalloc
+
+import pandas as pd
+
+
+class _Timer:
+    """
+    Adds the time spent inside the `with` block to a stage.
+    """
+
+    __slots__ = ("owner", "key", "start")
+
+    def __init__(self, owner, key: tuple) -> None:
+        self.owner = owner
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.owner._add_time(self.key, time.perf_counter() - self.start)
+
+
+# Returned while instrumentation is disabled, so a timed block only costs one attribute check.
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Instrumentation:
+    """
+    Timers and counters of the scraping, download and comparison stages, per stage and per ticker.
+
+    Disabled by default. While disabled, `timer` returns a shared no-op context and `count` returns at once.
+    Safe to use from the worker threads of `ScraperPool` and `FetchPipeline`.
+
+    Stages and counters recorded:
+        - "browser_start", "page_load", "element_wait", "table_read", "page_wait", "click", "scrape" (timers of `Etf` and `ScraperPool`).
+        - "webdriver_calls", "pages_scraped", "rows_scraped", "bytes_read", "scrape_attempts", "scrape_failures".
+        - "get_holdings", "holdings_store_hits", "holdings_csv_hits", "holdings_scrapes".
+        - "price_download", "price_cache_hits", "price_cache_misses", "price_downloads".
+        - "dividend_frame", "trailing_change", "dividend_growth" (timers of `EtfCompare`).
+        - "result_cache_hits", "result_cache_misses", "result_cache_tail_updates".
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Clear every timer, counter and capture.
+        """
+        with self._lock:
+            self._timers = {}
+            self._counters = {}
+        self.profile = None
+        self.memory = None
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    """----------------------------------- Record Operations -----------------------------------"""
+
+    def timer(self, stage: str, ticker: str = None):
+        """
+        :param stage: Name of the stage.
+        :param ticker: Ticker the time is spent on, if any.
+        :return: Context manager adding the time of its block to the stage.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, (stage, ticker))
+
+    def _add_time(self, key: tuple, seconds: float) -> None:
+        with self._lock:
+            calls, total = self._timers.get(key, (0, 0.0))
+            self._timers[key] = (calls + 1, total + seconds)
+
+    def count(self, name: str, value: float = 1, ticker: str = None) -> None:
+        """
+        :param name: Name of the counter.
+        :param value: Amount added to the counter.
+        :param ticker: Ticker the counter belongs to, if any.
+        """
+        if not self.enabled:
+            return
+        key = (name, ticker)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    """----------------------------------- Capture Operations -----------------------------------"""
+
+    @contextlib.contextmanager
+    def capture(self, profile: bool = False, memory: bool = False, reset: bool = True):
+        """
+        Enable the timers and counters inside the `with` block.
+
+        :param profile: Boolean to determine if the block is also run under cProfile. Only the calling thread is profiled.
+        :param memory: Boolean to determine if the allocations of the block are traced with tracemalloc.
+        :param reset: Boolean to determine if earlier timers and counters are cleared first.
+        :return: (Instrumentation) This object, with `report` available after the block.
+        """
+        if reset:
+            self.reset()
+        was_enabled = self.enabled
+        self.enabled = True
+        profiler = cProfile.Profile() if profile else None
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if memory:
+            tracemalloc.reset_peak()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield self
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.profile = pstats.Stats(profiler, stream=io.StringIO())
+            if memory:
+                # Leave out the allocations of the profiler and of the tracer itself.
+                snapshot = tracemalloc.take_snapshot().filter_traces(
+                    [
+                        tracemalloc.Filter(False, cProfile.__file__),
+                        tracemalloc.Filter(False, tracemalloc.__file__),
+                    ]
+                )
+                self.memory = {
+                    "snapshot": snapshot,
+                    "peak_bytes": tracemalloc.get_traced_memory()[1],
+                }
+                if tracing:
+                    tracemalloc.stop()
+            self.enabled = was_enabled
+
+    """----------------------------------- Report Operations -----------------------------------"""
+
+    def report(self, top: int = 20) -> dict:
+        """
+        Parameters
+        ----------
+        top : int
+            Number of functions and allocation sites kept from the profile and the memory trace.
+
+        Returns
+        -------
+        dict
+            "stages": stage mapped to its "calls", "seconds" and per ticker "tickers".
+            "counters": counter mapped to its "total" and per ticker "tickers".
+            "profile": functions with the largest cumulative time, if profiled.
+            "memory": peak traced bytes and the largest allocation sites, if traced.
+        """
+        with self._lock:
+            timers = dict(self._timers)
+            counters = dict(self._counters)
+
+        stages = {}
+        for (stage, ticker), (calls, seconds) in timers.items():
+            entry = stages.setdefault(
+                stage, {"calls": 0, "seconds": 0.0, "tickers": {}}
+            )
+            entry["calls"] += calls
+            entry["seconds"] += seconds
+            if ticker is not None:
+                entry["tickers"][ticker] = {"calls": calls, "seconds": seconds}
+
+        totals = {}
+        for (name, ticker), value in counters.items():
+            entry = totals.setdefault(name, {"total": 0, "tickers": {}})
+            entry["total"] += value
+            if ticker is not None:
+                entry["tickers"][ticker] = value
+
+        report = {"stages": stages, "counters": totals}
+        if self.profile is not None:
+            report["profile"] = self._profile_rows(top)
+        if self.memory is not None:
+            sites = self.memory["snapshot"].statistics("lineno")[:top]
+            report["memory"] = {
+                "peak_bytes": self.memory["peak_bytes"],
+                "top": [
+                    {"site": str(s.traceback), "bytes": s.size, "blocks": s.count}
+                    for s in sites
+                ],
+            }
+        return report
+
+    def _profile_rows(self, top: int) -> list:
+        rows = []
+        for (file, line, name), stat in self.profile.stats.items():
+            calls, total, cumulative = stat[1], stat[2], stat[3]
+            rows.append(
+                {
+                    "function": f"{file}:{line}({name})",
+                    "calls": calls,
+                    "total_seconds": total,
+                    "cumulative_seconds": cumulative,
+                }
+            )
+        rows.sort(key=lambda r: r["cumulative_seconds"], reverse=True)
+        return rows[:top]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        :return: (pd.DataFrame) One row per (kind, name, ticker) with "calls", "seconds" and "value".
+            Timers have kind "stage" and counters kind "counter". Rows without a ticker have an empty ticker.
+        """
+        with self._lock:
+            rows = [
+                ("stage", stage, ticker or "", calls, seconds, float("nan"))
+                for (stage, ticker), (calls, seconds) in self._timers.items()
+            ]
+            rows += [
+                ("counter", name, ticker or "", float("nan"), float("nan"), value)
+                for (name, ticker), value in self._counters.items()
+            ]
+        df = pd.DataFrame(
+            rows, columns=["kind", "name", "ticker", "calls", "seconds", "value"]
+        )
+        return df.set_index(["kind", "name", "ticker"]).sort_index()
+
+
+# Shared by every module, so one `capture` block records the whole run.
+instruments = Instrumentation()
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+# Colors of the first series, kept from the original plots. Larger sets take their colors from a colormap.
+BASE_COLORS = ["blue", "yellow", "cyan", "orange", "purple", "red"]
+
+# Legends are only drawn up to this many series. Past it they cover the plot.
+MAX_LEGEND_ENTRIES = 20
+
+
+"""----------------------------------- Decimation Operations -----------------------------------"""
+
+
+def minmax_decimate(values: np.ndarray, buckets: int) -> tuple:
+    """
+    Keep the smallest and the largest value of every bucket of rows, in row order, so peaks and troughs
+    drawn one bucket per pixel look the same as the full series.
+
+    :param values: (n_rows, n_series) Values of every series. NaN rows are skipped.
+    :param buckets: Number of buckets, e.g. the width of the plot in pixels.
+    :return: (tuple[np.ndarray, np.ndarray]) (2 * buckets, n_series) row of each kept point and its value.
+        A bucket without values keeps NaN, which leaves a gap in the line. Short series are returned whole.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n, m = values.shape
+    if n <= 2 * buckets:
+        rows = np.repeat(np.arange(n)[:, None], m, axis=1)
+        return rows, values
+    width = -(-n // buckets)
+    padded = np.full((buckets * width, m), np.nan)
+    padded[:n] = values
+    padded = padded.reshape(buckets, width, m)
+    missing = np.isnan(padded)
+    low = np.where(missing, np.inf, padded).argmin(axis=1)
+    high = np.where(missing, -np.inf, padded).argmax(axis=1)
+
+    offsets = (np.arange(buckets) * width)[:, None]
+    # The first of the two points in a bucket comes first in the line.
+    rows = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=1)
+    rows = np.minimum(
+        rows.reshape(2 * buckets, m) + np.repeat(offsets, 2, axis=0), n - 1
+    )
+    return rows, values[rows, np.arange(m)]
+
+
+def lttb_decimate(x: np.ndarray, values: np.ndarray, points: int) -> tuple:
+    """
+    Largest triangle three buckets: keep the first and last point, and from every bucket in between the point
+    forming the largest triangle with the point kept before it and the average of the next bucket.
+    Computed for every series at once, one bucket at a time.
+
+    :param x: (n_rows,) Numeric x of the rows, e.g. `matplotlib.dates.date2num` of the dates.
+    :param values: (n_rows, n_series) Values of every series. NaN rows are skipped.
+    :param points: Number of points kept per series, at least 3.
+    :return: (tuple[np.ndarray, np.ndarray]) (points, n_series) row of each kept point and its value.
+        Short series are returned whole.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    n, m = values.shape
+    if n <= points or points < 3:
+        rows = np.repeat(np.arange(n)[:, None], m, axis=1)
+        return rows, values
+    columns = np.arange(m)
+    # Buckets of the rows between the first and the last one.
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+
+    rows = np.empty((points, m), dtype=np.int64)
+    rows[0] = 0
+    rows[-1] = n - 1
+    previous_x = np.full(m, x[0])
+    previous_y = values[0].copy()
+    for b in range(points - 2):
+        start, stop = edges[b], edges[b + 1]
+        # Average of the next bucket, or the last point for the last bucket.
+        following = slice(stop, edges[b + 2]) if b + 2 < len(edges) else slice(n - 1, n)
+        counts = present[following].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average_y = filled[following].sum(axis=0) / counts
+            average_x = (x[following, None] * present[following]).sum(axis=0) / counts
+
+        bucket_x = x[start:stop, None]
+        bucket_y = values[start:stop]
+        area = np.abs(
+            (previous_x - average_x) * (bucket_y - previous_y)
+            - (previous_x - bucket_x) * (average_y - previous_y)
+        )
+        # NaN areas (missing points, or NaN neighbours) lose to any real one.
+        best = np.where(np.isnan(area), -1.0, area).argmax(axis=0)
+        if np.isnan(previous_y).any():
+            # After a gap, the first value of the bucket starts the line again.
+            first = np.where(
+                present[start:stop].any(axis=0), present[start:stop].argmax(axis=0), 0
+            )
+            best = np.where(np.isnan(previous_y), first, best)
+        rows[b + 1] = start + best
+        previous_x = x[rows[b + 1]]
+        previous_y = values[rows[b + 1], columns]
+    return rows, values[rows, columns]
+
+
+"""----------------------------------- Draw Operations -----------------------------------"""
+
+
+def series_colors(n: int, cmap: str = "turbo") -> list:
+    """
+    :param n: Number of series.
+    :param cmap: Matplotlib colormap used past the base colors.
+    :return: (list) One color per series: `BASE_COLORS` for small sets, else evenly spaced colors of `cmap`.
+    """
+    if n <= len(BASE_COLORS):
+        return BASE_COLORS[:n]
+    import matplotlib
+
+    colormap = matplotlib.colormaps[cmap]
+    # A qualitative map with enough colors is used as is, otherwise the map is sampled evenly.
+    if getattr(colormap, "N", 256) >= n and colormap.N < 256:
+        return [colormap(i) for i in range(n)]
+    return [tuple(c) for c in colormap(np.linspace(0, 1, n))]
+
+
+def draw_lines(
+    ax,
+    data: pd.DataFrame,
+    method: str = "minmax",
+    pixels: int = None,
+    cmap: str = "turbo",
+    legend: bool = None,
+):
+    """
+    Draw every column of `data` as one `LineCollection`, after decimating the rows to the width of the axes.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to draw on.
+    data : pd.DataFrame
+        One column per series, indexed by date.
+    method : str
+        "minmax" (smallest and largest value per pixel), "lttb" (largest triangle three buckets) or "none".
+    pixels : int
+        Width of the decimated series. Defaults to the width of the axes in pixels.
+    cmap : str
+        Colormap of the series, see `series_colors`.
+    legend : bool
+        Boolean to determine if a legend is drawn. Defaults to True up to `MAX_LEGEND_ENTRIES` series.
+
+    Returns
+    -------
+    matplotlib.collections.LineCollection
+        The lines drawn.
+    """
+    from matplotlib import dates as mdates
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+
+    if pixels is None:
+        pixels = max(int(ax.get_window_extent().width), 2)
+    if isinstance(data.index, pd.DatetimeIndex):
+        x = mdates.date2num(data.index)
+        ax.xaxis_date()
+    else:
+        x = np.asarray(data.index, dtype=np.float64)
+    values = data.to_numpy(dtype=np.float64)
+    if method == "minmax":
+        rows, values = minmax_decimate(values, pixels)
+    elif method == "lttb":
+        rows, values = lttb_decimate(x, values, pixels)
+    elif method == "none":
+        rows = np.repeat(np.arange(len(x))[:, None], values.shape[1], axis=1)
+    else:
+        raise ValueError(f"Unknown decimation method '{method}'")
+
+    # One (points, 2) segment per series. NaN points leave gaps.
+    segments = np.stack([x[rows], values], axis=-1).transpose(1, 0, 2)
+    colors = series_colors(data.shape[1], cmap)
+    lines = LineCollection(segments, colors=colors, linewidths=1)
+    ax.add_collection(lines)
+
+    finite = np.isfinite(values)
+    if finite.any():
+        low, high = values[finite].min(), values[finite].max()
+        margin = (high - low) * 0.05 or 1.0
+        ax.set_ylim(low - margin, high + margin)
+    if len(x):
+        ax.set_xlim(x[0], x[-1] if x[-1] > x[0] else x[0] + 1)
+
+    if legend is None:
+        legend = data.shape[1] <= MAX_LEGEND_ENTRIES
+    if legend:
+        handles = [Line2D([], [], color=c) for c in colors]
+        ax.legend(handles, [str(c) for c in data.columns])
+    return lines
+
+
+def render_lines(
+    data: pd.DataFrame,
+    path: str,
+    title: str = "",
+    y_axis_label: str = "Values",
+    method: str = "minmax",
+    figsize: tuple = (10, 6),
+    dpi: int = 100,
+    cmap: str = "turbo",
+) -> str:
+    """
+    Draw `data` with `draw_lines` on a figure of its own and save it with the Agg backend,
+    without pyplot or a window, so it does not block and can run from any thread.
+
+    :param data: One column per series, indexed by date.
+    :param path: Image file written. The format follows the extension, e.g. ".png" or ".svg".
+    :param title: Title of the plot.
+    :param y_axis_label: Label of the y axis.
+    :param method: Decimation method, see `draw_lines`.
+    :param figsize: Size of the figure in inches.
+    :param dpi: Pixels per inch. The series are decimated to the width of the axes in pixels.
+    :param cmap: Colormap of the series, see `series_colors`.
+    :return: (str) `path`.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    draw_lines(ax, data, method=method, cmap=cmap)
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel(y_axis_label)
+    figure.savefig(path)
+    return path
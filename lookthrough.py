@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+
+class LookThrough:
+    """
+    Exposure of a portfolio of ETFs to every underlying symbol.
+
+    The holdings are indexed once: entries are grouped by ETF, and each entry points to its symbol.
+    Changing the positions then only touches the entries of the ETFs that changed.
+    """
+
+    def __init__(self, holdings, positions: dict = None) -> None:
+        """
+        :param holdings: (dict | pd.DataFrame) Ticker mapped to its holdings indexed by symbol, or the long frame of `HoldingsStore.load_many`.
+        :param positions: Ticker mapped to the dollars invested in the ETF.
+        """
+        if isinstance(holdings, dict):
+            holdings = pd.concat(
+                {t: df for t, df in holdings.items()}, names=["etf", "symbol"]
+            ).reset_index(level="etf")
+        holdings = holdings[holdings["weight"].notna()]
+
+        etf_ids, etfs = pd.factorize(holdings["etf"])
+        order = np.argsort(etf_ids, kind="stable")
+        security_ids, symbols = pd.factorize(holdings.index)
+
+        self.etfs = list(etfs)
+        self.symbols = pd.Index(symbols, name="symbol")
+        self.names = (
+            holdings["name"].groupby(security_ids).first().to_numpy()
+            if "name" in holdings
+            else None
+        )
+        self._etf_lookup = {t: i for i, t in enumerate(self.etfs)}
+
+        # Entries grouped by ETF. The entries of ETF i are offsets[i]:offsets[i + 1].
+        self.security_ids = security_ids[order]
+        self.fractions = holdings["weight"].to_numpy(dtype=float)[order] / 100
+        counts = np.bincount(etf_ids, minlength=len(self.etfs))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        # Shares of the symbol held per dollar of the ETF's position in it.
+        if {"shares_held", "market_value"} <= set(holdings.columns):
+            shares = holdings["shares_held"].to_numpy(dtype=float)[order]
+            value = holdings["market_value"].to_numpy(dtype=float)[order]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.shares_per_dollar = np.where(value > 0, shares / value, np.nan)
+        else:
+            self.shares_per_dollar = np.full(len(self.security_ids), np.nan)
+
+        self.positions = np.zeros(len(self.etfs))
+        self.dollars = np.zeros(len(self.symbols))
+        self.shares = np.zeros(len(self.symbols))
+        if positions:
+            self.set_positions(positions)
+
+    def _etf_index(self, ticker: str) -> int:
+        try:
+            return self._etf_lookup[ticker]
+        except KeyError:
+            raise KeyError(f"No holdings loaded for {ticker}") from None
+
+    def _entries(self, etf_indexes) -> np.ndarray:
+        """
+        :return: (np.ndarray) Entry numbers of every ETF in `etf_indexes`.
+        """
+        starts = self.offsets[etf_indexes]
+        lengths = self.offsets[np.asarray(etf_indexes) + 1] - starts
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(
+            lengths.sum()
+        )
+
+    """----------------------------------- Position Operations -----------------------------------"""
+
+    def set_positions(self, positions: dict) -> None:
+        """
+        Replace every position and recompute the exposure of every symbol.
+
+        :param positions: Ticker mapped to the dollars invested in the ETF. Missing ETFs are set to 0.
+        """
+        self.positions = np.zeros(len(self.etfs))
+        for t, value in positions.items():
+            self.positions[self._etf_index(t)] = value
+
+        etf_of_entry = np.repeat(np.arange(len(self.etfs)), np.diff(self.offsets))
+        dollars = self.positions[etf_of_entry] * self.fractions
+        self.dollars = np.bincount(
+            self.security_ids, dollars, minlength=len(self.symbols)
+        )
+        self.shares = np.bincount(
+            self.security_ids,
+            np.nan_to_num(dollars * self.shares_per_dollar),
+            minlength=len(self.symbols),
+        )
+
+    def update_positions(self, changes: dict) -> None:
+        """
+        Change some positions, and update only the symbols held by those ETFs.
+
+        :param changes: Ticker mapped to the new dollars invested in the ETF.
+        """
+        indexes = np.array([self._etf_index(t) for t in changes], dtype=np.int64)
+        new_values = np.array(list(changes.values()), dtype=float)
+        deltas = new_values - self.positions[indexes]
+        self.positions[indexes] = new_values
+
+        entries = self._entries(indexes)
+        lengths = np.diff(self.offsets)[indexes]
+        dollars = np.repeat(deltas, lengths) * self.fractions[entries]
+        securities = self.security_ids[entries]
+        np.add.at(self.dollars, securities, dollars)
+        np.add.at(
+            self.shares,
+            securities,
+            np.nan_to_num(dollars * self.shares_per_dollar[entries]),
+        )
+
+    """----------------------------------- Exposure Operations -----------------------------------"""
+
+    def exposure(self, symbols: list = None, top: int = None) -> pd.DataFrame:
+        """
+        :param symbols: Symbols to return. If None, every symbol with exposure is returned.
+        :param top: Number of largest exposures to return.
+        :return: (pd.DataFrame) "dollars", "percent" of the portfolio and implied "shares", indexed by symbol, largest first.
+        """
+        total = self.positions.sum()
+        df = pd.DataFrame(
+            {
+                "dollars": self.dollars,
+                "percent": (self.dollars / total) * 100 if total else np.nan,
+                "shares": self.shares,
+            },
+            index=self.symbols,
+        )
+        if self.names is not None:
+            df.insert(0, "name", self.names)
+        if symbols is not None:
+            df = df.reindex(symbols)
+        else:
+            df = df[df["dollars"] != 0]
+        df = df.sort_values("dollars", ascending=False)
+        return df.head(top) if top is not None else df
+
+    def contributions(self, symbol: str) -> pd.DataFrame:
+        """
+        :param symbol: Symbol to break down.
+        :return: (pd.DataFrame) Dollars and percent of the portfolio held in the symbol through each ETF.
+        """
+        security = self.symbols.get_loc(symbol)
+        entries = np.flatnonzero(self.security_ids == security)
+        etf_of_entry = np.searchsorted(self.offsets, entries, side="right") - 1
+        dollars = self.positions[etf_of_entry] * self.fractions[entries]
+        total = self.positions.sum()
+        df = pd.DataFrame(
+            {
+                "weight": self.fractions[entries] * 100,
+                "dollars": dollars,
+                "percent": (dollars / total) * 100 if total else np.nan,
+            },
+            index=pd.Index([self.etfs[i] for i in etf_of_entry], name="etf"),
+        )
+        return df.groupby(level="etf", sort=False).sum()
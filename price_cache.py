@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import datetime as dt
+
+import pandas as pd
+
+from instrumentation import instruments
+
+
+def _has_business_days(start: pd.Timestamp, end: pd.Timestamp) -> bool:
+    """
+    :return: (bool) True if a business day falls in [start, end).
+    """
+    return len(pd.bdate_range(start, end - pd.Timedelta(1, "ns"))) > 0
+
+
+class PriceCache:
+    """
+    Local cache of the daily bars and dividends returned by `yf.download`.
+
+    Each ticker is stored once with the date range it covers. A request only downloads the dates outside that
+    range (usually the new days at the end), merges them in, and returns a frame shaped like `yf.download`.
+
+    The range only grows to the first and last dates a download returned, since `yf.download` returns an empty
+    frame when it fails. Dates without data at the edges, like a failed download or the days before a fund was
+    listed, are requested again on the next call. Edges without business days, like weekends, are not.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        downloader=None,
+        max_tickers: int = None,
+        max_age_days: float = None,
+    ) -> None:
+        """
+        :param path: Folder of the cache.
+        :param downloader: Callable with the signature of `yf.download`. Defaults to `yf.download`.
+        :param max_tickers: Maximum number of tickers kept. The least recently used ones are evicted first.
+        :param max_age_days: Tickers first downloaded longer ago than this are evicted and downloaded again, e.g. to pick up adjusted history.
+        """
+        self.path = path
+        self.downloader = downloader
+        self.max_tickers = max_tickers
+        self.max_age_days = max_age_days
+        # Number of calls made to the downloader.
+        self.requests = 0
+        os.makedirs(self.path, exist_ok=True)
+        self._index = self._read_index()
+
+    """----------------------------------- Storage Operations -----------------------------------"""
+
+    def _index_path(self) -> str:
+        return os.path.join(self.path, "index.json")
+
+    def _data_path(self, ticker: str) -> str:
+        return os.path.join(self.path, f"{ticker}.pkl")
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self._index_path(), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _write_index(self) -> None:
+        with open(self._index_path() + ".tmp", "w") as file:
+            json.dump(self._index, file, indent=2)
+        os.replace(self._index_path() + ".tmp", self._index_path())
+
+    def _read(self, ticker: str) -> pd.DataFrame:
+        path = self._data_path(ticker)
+        if instruments.enabled:
+            instruments.count("bytes_read", os.path.getsize(path), ticker=ticker)
+        return pd.read_pickle(path)
+
+    def _write(self, ticker: str, df: pd.DataFrame) -> None:
+        df.to_pickle(self._data_path(ticker))
+
+    def evict(self, ticker: str) -> None:
+        """
+        :param ticker: Ticker removed from the cache.
+        """
+        self._index.pop(ticker, None)
+        try:
+            os.remove(self._data_path(ticker))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        for ticker in list(self._index):
+            self.evict(ticker)
+        self._write_index()
+
+    def _evict_expired(self) -> None:
+        if self.max_age_days is None:
+            return
+        oldest = time.time() - self.max_age_days * 86400
+        for ticker, entry in list(self._index.items()):
+            if entry["fetched"] < oldest:
+                self.evict(ticker)
+
+    def _evict_least_used(self) -> None:
+        if self.max_tickers is None or len(self._index) <= self.max_tickers:
+            return
+        by_access = sorted(self._index, key=lambda t: self._index[t]["accessed"])
+        for ticker in by_access[: len(self._index) - self.max_tickers]:
+            self.evict(ticker)
+
+    """----------------------------------- Download Operations -----------------------------------"""
+
+    def _fetch(self, tickers: list, start: pd.Timestamp, end: pd.Timestamp) -> dict:
+        """
+        :return: (dict) Ticker mapped to its downloaded frame, with one column per field.
+        """
+        downloader = self.downloader
+        if downloader is None:
+            import yfinance as yf
+
+            downloader = yf.download
+        self.requests += 1
+        instruments.count("price_downloads")
+        with instruments.timer("price_download"):
+            data = downloader(
+                tickers=tickers,
+                start=start.to_pydatetime(),
+                end=end.to_pydatetime(),
+                actions=True,
+            )
+        if data is None or data.empty:
+            return {t: pd.DataFrame() for t in tickers}
+        if not isinstance(data.columns, pd.MultiIndex):
+            data = pd.concat({tickers[0]: data}, axis=1).swaplevel(axis=1)
+        if data.index.tz is not None:
+            data.index = data.index.tz_localize(None)
+        return {
+            t: (
+                data.xs(t, axis=1, level=1).dropna(how="all")
+                if t in data.columns.get_level_values(1)
+                else pd.DataFrame()
+            )
+            for t in tickers
+        }
+
+    def _missing_ranges(self, ticker: str, start: pd.Timestamp, end: pd.Timestamp):
+        """
+        :return: (list) (start, end) ranges of the request that are not cached for the ticker.
+        """
+        entry = self._index.get(ticker)
+        if entry is None:
+            return [(start, end)]
+        cached_start = pd.Timestamp(entry["start"])
+        cached_end = pd.Timestamp(entry["end"])
+        ranges = []
+        if start < cached_start and _has_business_days(start, cached_start):
+            ranges.append((start, cached_start))
+        if end > cached_end and _has_business_days(cached_end, end):
+            ranges.append((cached_end, end))
+        return ranges
+
+    def download(self, tickers: list, start: dt.datetime, end: dt.datetime):
+        """
+        Return daily bars and dividends of every ticker, downloading only the dates that are not cached.
+
+        Parameters
+        ----------
+        tickers : list
+            Tickers to return.
+        start : dt.datetime
+            First date of the range.
+        end : dt.datetime
+            End of the range, excluded like in `yf.download`.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns are a MultiIndex of (field, ticker), like `yf.download(..., actions=True)`.
+        """
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end)
+        self._evict_expired()
+
+        # Group the tickers missing the same dates, so each group is one download.
+        groups = {}
+        for t in tickers:
+            missing_ranges = self._missing_ranges(t, start, end)
+            for missing in missing_ranges:
+                groups.setdefault(missing, []).append(t)
+            if missing_ranges:
+                instruments.count("price_cache_misses", ticker=t)
+            else:
+                instruments.count("price_cache_hits", ticker=t)
+
+        fetched = {}
+        for (fetch_start, fetch_end), group in groups.items():
+            for t, df in self._fetch(group, fetch_start, fetch_end).items():
+                fetched.setdefault(t, []).append(df)
+
+        now = time.time()
+        # The last day of a range that reaches today may still change, so it is downloaded again next time.
+        today = pd.Timestamp.now().normalize()
+        frames = {}
+        for t in tickers:
+            entry = self._index.get(t)
+            parts = [self._read(t)] if entry is not None else []
+            parts += fetched.get(t, [])
+            parts = [p for p in parts if not p.empty]
+            df = pd.concat(parts) if parts else pd.DataFrame()
+            if not df.empty:
+                df = df[~df.index.duplicated(keep="last")].sort_index()
+
+            returned = [p for p in fetched.get(t, []) if not p.empty]
+            if returned:
+                # The end is excluded, so it is the day after the last date returned.
+                cached_start = min(p.index.min() for p in returned)
+                cached_end = max(p.index.max() for p in returned) + pd.Timedelta(days=1)
+                if entry is not None:
+                    cached_start = min(cached_start, pd.Timestamp(entry["start"]))
+                    cached_end = max(cached_end, pd.Timestamp(entry["end"]))
+                if cached_end >= today:
+                    cached_end = min(cached_end, df.index[-1])
+                self._write(t, df)
+                entry = {
+                    "start": cached_start.isoformat(),
+                    "end": cached_end.isoformat(),
+                    "fetched": entry["fetched"] if entry is not None else now,
+                }
+            if entry is not None:
+                entry["accessed"] = now
+                self._index[t] = entry
+
+            if not df.empty:
+                df = df.loc[(df.index >= start) & (df.index < end)]
+            frames[t] = df
+
+        self._evict_least_used()
+        self._write_index()
+
+        data = pd.concat(frames, axis=1).swaplevel(axis=1)
+        fields = list(dict.fromkeys(data.columns.get_level_values(0)))
+        return data.reindex(columns=pd.MultiIndex.from_product([fields, tickers]))
@@ -0,0 +1,251 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import instruments
+
+
+def fingerprint(*parts) -> str:
+    """
+    :param parts: Values hashed in order by their repr: lists, dates, numbers, strings, None or other fingerprints.
+    :return: (str) Hex digest of the parts. Equal parts give the same digest in every process.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def row_fingerprints(frame: pd.DataFrame, rows: list) -> list:
+    """
+    Fingerprint the first rows of a frame for several row counts, in one pass over its values.
+
+    Each column is hashed on its own, so the columns of a frame are read without copying them to row order,
+    and the hash of a column's first rows is kept on the way to the hash of the whole column.
+
+    :param frame: Frame to fingerprint: its columns, index and values.
+    :param rows: Row counts, each at most the length of the frame.
+    :return: (list) Fingerprint of `frame.iloc[:r]` for each r of `rows`.
+    """
+    counts = sorted(set(rows))
+    outer = {r: hashlib.sha256(repr(list(frame.columns)).encode()) for r in counts}
+    values = frame.to_numpy()
+    columns = [frame.index.to_numpy()] + [values[:, j] for j in range(values.shape[1])]
+    for column in columns:
+        # Dates can not be hashed as a buffer, so every column is read as bytes.
+        column = np.ascontiguousarray(column)
+        if column.dtype == object:
+            column = np.array([repr(v) for v in column], dtype=str)
+        width = column.dtype.itemsize
+        data = column.view(np.uint8)
+        digest = hashlib.sha256(column.dtype.str.encode())
+        done = 0
+        for r in counts:
+            digest.update(data[done * width : r * width].data)
+            done = r
+            outer[r].update(digest.copy().digest())
+    return [outer[r].hexdigest() for r in rows]
+
+
+def _copy(value):
+    """
+    :return: A copy of a result, so callers can not change the cached one.
+    """
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return value.copy()
+    return value
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return len(pickle.dumps(value))
+
+
+class ResultCache:
+    """
+    Results of the `EtfCompare` analytics, keyed by a fingerprint of their inputs.
+
+    Results are kept in memory up to `max_bytes`, dropping the least recently used first, and optionally in a folder
+    so they survive restarts. Each result also belongs to a family (the method, tickers, start and parameters, without
+    the prices), and the latest result of a family is kept so a caller can extend it when days are appended to the prices.
+
+    Files:
+        - "{key}.pkl": One result with its family and metadata.
+        - "latest.json": Family mapped to the key of its latest result.
+    """
+
+    def __init__(
+        self, max_bytes: int = 512 * 2**20, path: str = None, max_disk_bytes: int = None
+    ) -> None:
+        """
+        :param max_bytes: Bytes of results kept in memory. A result larger than this is only kept on disk.
+        :param path: Folder of the results kept on disk. If None, results are only kept in memory.
+        :param max_disk_bytes: Bytes of result files kept in `path`, the least recently used are removed first. If None, there is no limit.
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._latest = {}
+        self._lock = threading.RLock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries or (
+            self.path is not None and os.path.exists(self._file(key))
+        )
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pkl")
+
+    """----------------------------------- Read Operations -----------------------------------"""
+
+    def get(self, key: str):
+        """
+        :param key: Fingerprint of the inputs.
+        :return: A copy of the cached result, or None if it is not cached.
+        """
+        entry = self._entry(key)
+        if entry is None:
+            instruments.count("result_cache_misses")
+            return None
+        instruments.count("result_cache_hits")
+        return _copy(entry["value"])
+
+    def latest(self, family: str):
+        """
+        :param family: Fingerprint of the method, tickers and parameters.
+        :return: (tuple | None) (key, metadata, result) of the latest result of the family, or None.
+            The result is not copied, so it must not be changed.
+        """
+        with self._lock:
+            key = self._latest.get(family)
+        if key is None and self.path is not None:
+            key = self._read_latest().get(family)
+        entry = self._entry(key) if key is not None else None
+        if entry is None:
+            return None
+        return key, entry["meta"], entry["value"]
+
+    def _entry(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.path is None or not os.path.exists(self._file(key)):
+            return None
+        try:
+            with open(self._file(key), "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # Reading a file marks it as recently used for the disk limit.
+        os.utime(self._file(key))
+        self._remember(key, entry)
+        return entry
+
+    def _read_latest(self) -> dict:
+        try:
+            with open(os.path.join(self.path, "latest.json"), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    """----------------------------------- Write Operations -----------------------------------"""
+
+    def put(self, key: str, value, family: str = None, meta: dict = None) -> None:
+        """
+        :param key: Fingerprint of the inputs.
+        :param value: Result to cache: a DataFrame, an array or a dict of them. A copy is kept.
+        :param family: Fingerprint of the method, tickers and parameters, if the result can be extended later.
+        :param meta: Details kept with the result, e.g. the number of rows of the prices.
+        """
+        entry = {"value": _copy(value), "family": family, "meta": meta or {}}
+        self._remember(key, entry)
+        if family is not None:
+            with self._lock:
+                self._latest[family] = key
+        if self.path is not None:
+            self._write(key, entry)
+
+    def _remember(self, key: str, entry: dict) -> None:
+        size = _nbytes(entry["value"])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)["nbytes"]
+            entry["nbytes"] = size
+            self._entries[key] = entry
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted["nbytes"]
+
+    def _write(self, key: str, entry: dict) -> None:
+        entry = {k: entry[k] for k in ["value", "family", "meta"]}
+        with open(f"{self._file(key)}.tmp", "wb") as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{self._file(key)}.tmp", self._file(key))
+        if entry["family"] is not None:
+            with self._lock:
+                latest = self._read_latest()
+                latest[entry["family"]] = key
+                path = os.path.join(self.path, "latest.json")
+                with open(f"{path}.tmp", "w") as file:
+                    json.dump(latest, file)
+                os.replace(f"{path}.tmp", path)
+        if self.max_disk_bytes is not None:
+            self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        """
+        Remove the least recently used result files until they fit in `max_disk_bytes`.
+        """
+        files = []
+        for name in os.listdir(self.path):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.path, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, name in files[:-1]:
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.path, name))
+            total -= size
+
+    def clear(self, disk: bool = False) -> None:
+        """
+        :param disk: Boolean to determine if the result files are also removed.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+            self.nbytes = 0
+        if disk and self.path is not None:
+            for name in os.listdir(self.path):
+                if name.endswith(".pkl") or name == "latest.json":
+                    os.remove(os.path.join(self.path, name))
@@ -0,0 +1,247 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from etf import Etf, _read_config
+from browser_profile import BrowserProfile
+from instrumentation import instruments
+
+
+class ScraperPool:
+    """
+    Scrape the holdings of many ETFs with a bounded pool of reusable browsers.
+
+    Each worker borrows a WebDriver session, runs `Etf._scrape_holdings` with it and returns it to the pool.
+    Sessions are created on first use, so the pool never holds more browsers than `workers`.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        retries: int = 2,
+        headless: bool = True,
+        holdings_url: str = None,
+        driver_factory=None,
+        profile: BrowserProfile = None,
+    ) -> None:
+        """
+        :param workers: Maximum number of browsers, and of tickers scraped at the same time.
+        :param retries: Number of extra attempts per ticker after a failure.
+        :param headless: Boolean to determine if the browsers run without a window.
+        :param holdings_url: Url template of the holdings page. "{}" is replaced by the ticker. Defaults to the Schwab page.
+        :param driver_factory: Callable that returns a new WebDriver. Defaults to Chrome with the driver from "config.json".
+        :param profile: Settings of the browsers. Defaults to the "browser" entry of "config.json", with `headless`.
+            Each browser gets its own "worker{n}" folder inside the profile's `user_data_dir`, since Chrome locks it.
+        """
+        self.workers = workers
+        self.retries = retries
+        self.headless = headless
+        self.holdings_url = holdings_url
+        self.driver_factory = driver_factory or self._create_driver
+        self.profile = profile
+
+        self._idle = queue.Queue()
+        self._drivers = []
+        # Browsers being started, counted against `workers` before they exist.
+        self._starting = 0
+        # Folder slot of each browser created by `_create_driver`, and the slots of browsers being started.
+        self._slots = {}
+        self._reserved_slots = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    """----------------------------------- Browser Operations -----------------------------------"""
+
+    def _create_driver(self):
+        """
+        The folder slot is reserved under the lock, so no other worker takes it while the browser starts.
+        """
+        config = _read_config()
+        with self._lock:
+            if self.profile is None:
+                self.profile = BrowserProfile.from_config(
+                    config, headless=self.headless
+                )
+            used = set(self._slots.values()) | self._reserved_slots
+            slot = min(set(range(self.workers)) - used)
+            self._reserved_slots.add(slot)
+        driver = None
+        try:
+            user_data_dir = None
+            if self.profile.user_data_dir:
+                user_data_dir = os.path.join(
+                    self.profile.user_data_dir, f"worker{slot}"
+                )
+            driver = self.profile.create_driver(
+                config["chrome_driver_path"], user_data_dir
+            )
+        finally:
+            with self._lock:
+                self._reserved_slots.discard(slot)
+                if driver is not None:
+                    self._slots[driver] = slot
+        return driver
+
+    def _acquire(self):
+        """
+        :return: An idle browser, or a new one if fewer than `workers` browsers exist.
+        """
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            # Reserve a place under the lock, and start the browser outside it so other workers are not blocked.
+            with self._lock:
+                start = len(self._drivers) + self._starting < self.workers
+                if start:
+                    self._starting += 1
+            if start:
+                driver = None
+                try:
+                    with instruments.timer("browser_start"):
+                        driver = self.driver_factory()
+                finally:
+                    with self._lock:
+                        self._starting -= 1
+                        if driver is not None:
+                            self._drivers.append(driver)
+                return driver
+            # Wait for a browser to be released, or for a broken one to free its slot.
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _release(self, driver, broken: bool = False) -> None:
+        """
+        :param driver: Browser returned to the pool.
+        :param broken: Boolean to determine if the browser is quit instead of reused, e.g. after a failed scrape.
+        """
+        if not broken:
+            self._idle.put(driver)
+            return
+        with self._lock:
+            self._drivers.remove(driver)
+            self._slots.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """
+        Quit every browser of the pool.
+        """
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._slots = {}
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self._idle = queue.Queue()
+
+    """----------------------------------- Scraping Operations -----------------------------------"""
+
+    def _scrape_ticker(self, ticker: str) -> dict:
+        """
+        :param ticker: ETF to scrape.
+        :return: (dict) Holdings of the ETF, or the last error if every attempt failed.
+        """
+        etf = Etf(ticker)
+        if self.holdings_url is not None:
+            etf.holdings_url = self.holdings_url
+
+        start = time.perf_counter()
+        error = None
+        for attempt in range(1, self.retries + 2):
+            driver = None
+            instruments.count("scrape_attempts", ticker=etf.ticker)
+            try:
+                driver = self._acquire()
+                df = etf._scrape_holdings(browser=driver)
+            except Exception as e:
+                if driver is not None:
+                    self._release(driver, broken=True)
+                error = e
+                instruments.count("scrape_failures", ticker=etf.ticker)
+                print(f"[Scrape Failed] {etf.ticker} attempt {attempt}: {e!r}")
+                continue
+            self._release(driver)
+            return {
+                "holdings": df,
+                "attempts": attempt,
+                "seconds": time.perf_counter() - start,
+                "error": None,
+            }
+        return {
+            "holdings": None,
+            "attempts": self.retries + 1,
+            "seconds": time.perf_counter() - start,
+            "error": error,
+        }
+
+    def scrape(self, tickers: list):
+        """
+        Scrape the holdings of every ticker across the pool.
+
+        Parameters
+        ----------
+        tickers : list
+            ETFs to scrape.
+
+        Returns
+        -------
+        tuple[dict, dict]
+            Ticker mapped to its holdings DataFrame (failed tickers are left out),
+            and a report with the failed tickers, attempts per ticker and throughput.
+        """
+        tickers = [t.upper() for t in tickers]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            jobs = dict(zip(tickers, executor.map(self._scrape_ticker, tickers)))
+        elapsed = time.perf_counter() - start
+
+        holdings = {t: r["holdings"] for t, r in jobs.items() if r["error"] is None}
+        rows = sum(len(df) for df in holdings.values())
+        report = {
+            "tickers": len(tickers),
+            "succeeded": len(holdings),
+            "failed": {t: repr(r["error"]) for t, r in jobs.items() if r["error"]},
+            "attempts": {t: r["attempts"] for t, r in jobs.items()},
+            "ticker_seconds": {t: r["seconds"] for t, r in jobs.items()},
+            "rows": rows,
+            "seconds": elapsed,
+            "tickers_per_minute": (len(tickers) / elapsed) * 60 if elapsed else 0.0,
+            "rows_per_second": rows / elapsed if elapsed else 0.0,
+        }
+        return holdings, report
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from fixture_site import write_fixture_site, load_local_holdings, serve_directory
+
+    # Scrape the bundled holdings back from a local copy of the Schwab pages.
+    local = load_local_holdings()
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixture_site(directory, local)
+        with serve_directory(directory) as base_url:
+            with ScraperPool(
+                workers=2, holdings_url=f"{base_url}/{{}}/index.html"
+            ) as pool:
+                holdings, report = pool.scrape(list(local.keys()))
+
+    for t, df in holdings.items():
+        print(f"{t}: {len(df)} of {len(local[t])} rows")
+    print(report)
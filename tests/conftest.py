@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def _repo_directory(monkeypatch):
+    # The bundled holdings are read from "EtfData", relative to the repository.
+    monkeypatch.chdir(ROOT)
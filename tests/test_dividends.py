@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import (
+    make_price_data,
+    make_compare,
+    _trailing_change_loop,
+    _payout_frequency_loop,
+    _dividend_growth_loop,
+)
+from etf import Etf, detect_payout_frequency, get_dividend_frame, _get_dividends_loop
+from instrumentation import instruments
+
+
+def test_dividend_frame_matches_loop():
+    close, dividends = make_price_data(10, 1260)
+    frame = get_dividend_frame(close, dividends, periods_per_year=4)
+    for t in close.columns:
+        expected = _get_dividends_loop(close[t], dividends[t], 4)
+        pd.testing.assert_frame_equal(
+            frame[t],
+            expected[["dividend", "yield", "annual_yield"]].astype(float),
+            check_names=False,
+        )
+
+
+def test_trailing_change_matches_loop():
+    close, dividends = make_price_data(5, 1260)
+    compare = make_compare(close, dividends)
+    dividend = get_dividend_frame(close, dividends).xs("dividend", axis=1, level=1)
+    change = compare._create_trailing_change(dividend)
+    for t in dividend.columns:
+        expected = _trailing_change_loop(dividend[t])
+        np.testing.assert_allclose(change[t].to_numpy(), expected.to_numpy(dtype=float))
+
+
+def test_payout_frequency_matches_loop():
+    frequencies = [1, 2, 4, 12, 52]
+    close, dividends = make_price_data(50, 2520, frequencies=frequencies)
+    expected = np.resize(frequencies, 50).astype(float)
+    np.testing.assert_array_equal(
+        detect_payout_frequency(dividends).to_numpy(), expected
+    )
+    np.testing.assert_array_equal(
+        _payout_frequency_loop(dividends).to_numpy(), expected
+    )
+
+
+def test_single_payout_defaults_to_quarterly():
+    close, dividends = make_price_data(1, 1260)
+    single = dividends.iloc[:, 0] * 0
+    single.iloc[630] = 0.5
+    etf = Etf("ONE")
+    fields = ["dividend", "yield", "annual_yield"]
+    pd.testing.assert_frame_equal(
+        etf.get_dividends(close.iloc[:, 0], single)[fields],
+        etf.get_dividends(close.iloc[:, 0], single, vectorized=False)[fields].astype(
+            float
+        ),
+        check_names=False,
+    )
+
+
+def test_dividend_growth_matches_loop():
+    close, dividends = make_price_data(50, 2520)
+    summary = make_compare(close, dividends).compare_dividend_growth()
+    expected = _dividend_growth_loop(dividends)
+    for field in ["start_date", "end_date"]:
+        assert (summary.loc[field] == expected.loc[field]).all(), field
+    for field in ["start", "end", "growth"]:
+        np.testing.assert_allclose(
+            summary.loc[field].to_numpy(dtype=float),
+            expected.loc[field].to_numpy(dtype=float),
+        )
+
+
+def test_instrumentation_counts_batches():
+    close, dividends = make_price_data(60, 1260)
+    compare = make_compare(close, dividends)
+    with instruments.capture():
+        compare.compare_dividends(batch_size=25)
+    report = instruments.report()
+    assert report["stages"]["dividend_frame"]["calls"] == 3
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_compare_engine_matches_serial(backend):
+    from compare_engine import CompareEngine
+
+    close, dividends = make_price_data(40, 1260, frequencies=[4, 12])
+    compare = make_compare(close, dividends)
+    expected = compare.compare_dividends()
+    with CompareEngine(backend, workers=2) as engine:
+        compare.engine = engine
+        pd.testing.assert_frame_equal(compare.compare_dividends(), expected)
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_result_cache_extends_appended_day(tmp_path, on_disk):
+    from result_cache import ResultCache
+
+    close, dividends = make_price_data(40, 1260, frequencies=[4, 12])
+    full = make_compare(close, dividends)
+    earlier = make_compare(close.iloc[:-1], dividends.iloc[:-1])
+
+    def run(compare):
+        return compare.compare_dividends(), compare.compare_dividend_growth(
+            windows=True
+        )
+
+    expected, expected_growth = run(full)
+    expected_earlier = earlier.compare_dividends()
+    earlier.result_cache = full.result_cache = ResultCache(
+        path=str(tmp_path) if on_disk else None
+    )
+    run(earlier)
+    # The second call is read from the cache.
+    pd.testing.assert_frame_equal(earlier.compare_dividends(), expected_earlier)
+    dividends_frame, growth = run(full)
+    pd.testing.assert_frame_equal(dividends_frame, expected)
+    pd.testing.assert_frame_equal(growth["summary"], expected_growth["summary"])
+    pd.testing.assert_frame_equal(growth["ttm"], expected_growth["ttm"], rtol=1e-9)
+    if on_disk:
+        # A new cache on the same folder reads the results back.
+        full.result_cache = ResultCache(path=str(tmp_path))
+        pd.testing.assert_frame_equal(full.compare_dividends(), expected)
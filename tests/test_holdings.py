@@ -0,0 +1,181 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmark import (
+    make_holdings_universe,
+    make_holdings_frame,
+    make_holdings_days,
+    _diff_loop,
+)
+from compact_holdings import CompactHoldings
+from holdings_history import HoldingsHistory
+from holdings_index import HoldingsIndex
+from holdings_overlap import HoldingsMatrix
+from holdings_store import CsvHoldingsStore, NumpyHoldingsStore
+from lookthrough import LookThrough
+
+
+def test_overlap_matches_dense():
+    bundled = HoldingsMatrix.from_holdings(CsvHoldingsStore("EtfData").load_many())
+    dense = bundled.to_dense(np.float64)
+    expected = np.minimum(dense[:, None, :], dense[None, :, :]).sum(axis=2)
+    np.testing.assert_allclose(bundled.compare()["overlap"].to_numpy(), expected)
+
+
+def test_lookthrough_update_matches_new_portfolio():
+    universe = make_holdings_universe(50)
+    holdings = pd.concat(universe, names=["etf", "symbol"]).reset_index(level="etf")
+    rng = np.random.default_rng(0)
+    positions = dict(zip(universe, rng.uniform(1e3, 1e5, len(universe))))
+    changes = {t: positions[t] * 1.1 for t in list(universe)[:5]}
+
+    lookthrough = LookThrough(holdings, positions)
+    lookthrough.update_positions(changes)
+    positions.update(changes)
+    expected = LookThrough(holdings, positions)
+    np.testing.assert_allclose(lookthrough.dollars, expected.dollars)
+
+
+def test_index_lookup_and_update(tmp_path):
+    holdings = make_holdings_frame(200, 2000)
+    symbols = list(np.random.default_rng(1).choice(holdings.index.unique(), 20))
+    directory = str(tmp_path)
+    index = HoldingsIndex(directory)
+    index.rebuild(holdings)
+    reader = HoldingsIndex(directory)
+    reader.holders("S00000")
+
+    expected = holdings[holdings.index.isin(symbols)]
+    assert len(index.holders_many(symbols)) == len(expected)
+
+    refreshed = holdings[holdings["etf"] == "E00000"].copy()
+    refreshed["weight"] *= 2
+    index.update("E00000", refreshed)
+    symbol = refreshed.index[0]
+    assert index.holders(symbol).loc["E00000", "weight"] == refreshed["weight"].iloc[0]
+    # An instance opened before the update sees it.
+    assert reader.holders(symbol).loc["E00000", "weight"] == refreshed["weight"].iloc[0]
+    index.compact()
+    assert reader.holders(symbol).loc["E00000", "weight"] == refreshed["weight"].iloc[0]
+
+
+def test_numpy_store_matches_csv(tmp_path):
+    universe = make_holdings_universe(100)
+    csv_store = CsvHoldingsStore(str(tmp_path / "csv"))
+    numpy_store = NumpyHoldingsStore(str(tmp_path / "numpy"))
+    csv_store.save_many(universe)
+    numpy_store.save_many(universe)
+    pd.testing.assert_frame_equal(
+        numpy_store.load_many(), csv_store.load_many(), check_like=True
+    )
+
+    # Saving one ETF writes a segment of its own, past `MAX_SEGMENTS` the store is rewritten once.
+    tickers = list(universe)
+    for t in tickers[: NumpyHoldingsStore.MAX_SEGMENTS + 10]:
+        numpy_store.save(t, universe[t])
+    segments = os.listdir(str(tmp_path / "numpy" / "segments"))
+    assert len(segments) <= NumpyHoldingsStore.MAX_SEGMENTS + 1
+    pd.testing.assert_frame_equal(
+        numpy_store.load_many(tickers), csv_store.load_many(tickers)
+    )
+
+
+def test_compact_frames_match_store(tmp_path):
+    store = NumpyHoldingsStore(str(tmp_path))
+    store.save_many(make_holdings_universe(20))
+    compact = CompactHoldings.from_store(store, ["E00000", "E00001"])
+    for t in ["E00000", "E00001"]:
+        pd.testing.assert_frame_equal(
+            compact.frame(t), store.load(t), check_names=False
+        )
+
+
+def test_history_diff_matches_loop(tmp_path):
+    history = HoldingsHistory(str(tmp_path))
+    for date, df in make_holdings_days(50, 5):
+        history.append(date, df)
+    history = HoldingsHistory(str(tmp_path))
+    dates = history.dates()
+    before = history.as_of_many(dates[-2])
+    after = history.as_of_many(dates[-1])
+    counts = history.diff_many(dates[-2], dates[-1])["change"].value_counts()
+    expected = _diff_loop(before, after)
+    pd.testing.assert_series_equal(
+        counts.reindex(expected.index).fillna(0).astype(int),
+        expected,
+        check_names=False,
+    )
+
+
+def test_history_concurrent_appends(tmp_path, n_etfs=20, n_days=10, writers=4):
+    """
+    Append the same days from several `HoldingsHistory` instances at once, one group of ETFs each,
+    and check every snapshot reads back from a new instance.
+    """
+    days = list(make_holdings_days(n_etfs, n_days))
+    directory = str(tmp_path)
+
+    def write(group):
+        history = HoldingsHistory(directory)
+        for date, df in days:
+            etfs = df["etf"].unique()[group::writers]
+            history.append(date, df[df["etf"].isin(etfs)])
+
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(write, range(writers)))
+
+    history = HoldingsHistory(directory)
+    assert len(history.dates()) == n_days
+    assert all(n.isdigit() for n in os.listdir(os.path.join(directory, "segments")))
+    date, df = days[-1]
+    # A symbol listed twice in an ETF is stored once.
+    expected = df[~pd.MultiIndex.from_arrays([df["etf"], df.index]).duplicated()]
+    expected = expected.sort_values(["etf", "symbol"], kind="stable")
+    # Names come from the shared security table, where the first name of a symbol is kept.
+    stored = history.as_of_many(date).drop(columns=["date", "name"])
+    stored = stored.sort_values(["etf", "symbol"], kind="stable")
+    pd.testing.assert_frame_equal(stored, expected[stored.columns], check_dtype=False)
+
+
+def test_index_rebuild_uppercases_tickers(tmp_path):
+    holdings = make_holdings_universe(2)
+    index = HoldingsIndex(str(tmp_path))
+    index.rebuild({"spy": holdings["E00000"]})
+    index.update("spy", holdings["E00001"])
+    symbol = holdings["E00001"].index[0]
+    assert index.holders(symbol).index.to_list() == ["SPY"]
+    assert index.to_frame()["etf"].unique().tolist() == ["SPY"]
+
+
+def test_index_concurrent_updates_survive_compaction(tmp_path, writers=4):
+    holdings = make_holdings_frame(40, 500)
+    frames = {t: df.drop(columns="etf") for t, df in holdings.groupby("etf")}
+    directory = str(tmp_path)
+    HoldingsIndex(directory).rebuild(holdings)
+    reader = HoldingsIndex(directory)
+    reader.holders("S00000")
+
+    def write(group):
+        # Few update files per base, so the writers compact while the others update.
+        index = HoldingsIndex(directory, compact_after=3)
+        for t in list(frames)[group::writers]:
+            df = frames[t].copy()
+            df["weight"] += 1
+            index.update(t, df)
+
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(write, range(writers)))
+
+    expected = holdings.assign(weight=holdings["weight"] + 1)
+    for index in [reader, HoldingsIndex(directory)]:
+        stored = index.to_frame().sort_values(["etf", "symbol", "weight"])
+        pd.testing.assert_frame_equal(
+            stored,
+            expected[stored.columns].sort_values(["etf", "symbol", "weight"]),
+            check_dtype=False,
+        )
+    # Only the current base and the one before it are kept.
+    assert len(os.listdir(os.path.join(directory, "bases"))) <= 2
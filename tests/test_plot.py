@@ -0,0 +1,22 @@
+import numpy as np
+
+from benchmark import make_price_data
+from line_plot import minmax_decimate, lttb_decimate
+
+
+def test_minmax_keeps_extremes():
+    close, _ = make_price_data(20, 5000)
+    values = close.to_numpy()
+    rows, kept = minmax_decimate(values, 1000)
+    assert np.array_equal(kept.max(axis=0), values.max(axis=0))
+    assert np.array_equal(kept.min(axis=0), values.min(axis=0))
+    np.testing.assert_array_equal(kept, values[rows, np.arange(values.shape[1])])
+
+
+def test_lttb_keeps_first_and_last_point():
+    close, _ = make_price_data(20, 5000)
+    values = close.to_numpy()
+    rows, kept = lttb_decimate(np.arange(5000, dtype=np.float64), values, 500)
+    assert kept.shape == (500, 20)
+    assert (rows[0] == 0).all() and (rows[-1] == 4999).all()
+    assert (np.diff(rows, axis=0) > 0).all()
@@ -0,0 +1,136 @@
+import pandas as pd
+
+from benchmark import (
+    make_price_data,
+    make_holdings_universe,
+    _SlowSources,
+    _StubDownloader,
+)
+from etf_compare import EtfCompare
+from fetch_pipeline import FetchPipeline
+from price_cache import PriceCache
+
+
+def _expected(stub: _StubDownloader, stop) -> pd.DataFrame:
+    return stub.prices.loc[stub.prices.index < stop]
+
+
+def test_price_cache_fetches_only_missing_days(tmp_path):
+    close, dividends = make_price_data(10, 500)
+    stub = _StubDownloader(close, dividends)
+    tickers = list(close.columns)
+    dates = close.index
+    first_end, end = dates[440], dates[-1] + pd.Timedelta(days=1)
+
+    cache = PriceCache(str(tmp_path), downloader=stub)
+    data = cache.download(tickers, dates[0], first_end)
+    assert cache.requests == 1
+    pd.testing.assert_frame_equal(data, _expected(stub, first_end), check_freq=False)
+
+    data = cache.download(tickers, dates[0], first_end)
+    assert cache.requests == 1
+    pd.testing.assert_frame_equal(data, _expected(stub, first_end), check_freq=False)
+
+    # Appended days are one request for the gap after the last cached day only.
+    data = cache.download(tickers, dates[0], end)
+    assert cache.requests == 2
+    assert stub.calls[-1] == (tickers, dates[439] + pd.Timedelta(days=1), end)
+    pd.testing.assert_frame_equal(data, _expected(stub, end), check_freq=False)
+
+
+def test_price_cache_fetches_failed_download_again(tmp_path):
+    close, dividends = make_price_data(10, 250)
+    stub = _StubDownloader(close, dividends)
+    tickers = list(close.columns)
+    start, end = close.index[0], close.index[-1] + pd.Timedelta(days=1)
+
+    cache = PriceCache(str(tmp_path), downloader=stub)
+    stub.failing = True
+    assert cache.download(tickers, start, end).empty
+    stub.failing = False
+    data = cache.download(tickers, start, end)
+    assert cache.requests == 2
+    pd.testing.assert_frame_equal(data, _expected(stub, end), check_freq=False)
+    cache.download(tickers, start, end)
+    assert cache.requests == 2
+
+    # An empty download of new days does not extend the cached range.
+    later = end + pd.Timedelta(days=30)
+    stub.failing = True
+    cache.download(tickers, start, later)
+    cache.download(tickers, start, later)
+    assert cache.requests == 4
+    assert stub.calls[-1] == (tickers, end, later)
+
+
+def test_price_cache_fetches_empty_ticker_again(tmp_path):
+    close, dividends = make_price_data(3, 250)
+    stub = _StubDownloader(close, dividends)
+    tickers = list(close.columns)
+    start, end = close.index[0], close.index[-1] + pd.Timedelta(days=1)
+    # A ticker without data is all NaN in the frame of `yf.download`.
+    stub.prices.loc[:, (slice(None), tickers[0])] = float("nan")
+
+    cache = PriceCache(str(tmp_path), downloader=stub)
+    cache.download(tickers, start, end)
+    assert tickers[0] not in cache._index
+    cache.download(tickers, start, end)
+    assert cache.requests == 2
+    assert stub.calls[-1] == ([tickers[0]], start, end)
+
+
+def test_price_cache_evicts_least_used(tmp_path):
+    close, dividends = make_price_data(20, 250)
+    stub = _StubDownloader(close, dividends)
+    tickers = list(close.columns)
+    start, end = close.index[0], close.index[-1] + pd.Timedelta(days=1)
+
+    cache = PriceCache(str(tmp_path), downloader=stub, max_tickers=10)
+    cache.download(tickers[:10], start, end)
+    cache.download(tickers[10:15], start, end)
+    assert sorted(cache._index) == sorted(tickers[5:15])
+    cache.download(tickers[10:15], start, end)
+    assert cache.requests == 2
+    cache.download(tickers[:1], start, end)
+    assert cache.requests == 3
+
+
+def test_price_cache_downloads_expired_again(tmp_path):
+    close, dividends = make_price_data(10, 250)
+    stub = _StubDownloader(close, dividends)
+    tickers = list(close.columns)
+    start, end = close.index[0], close.index[-1] + pd.Timedelta(days=1)
+
+    cache = PriceCache(str(tmp_path), downloader=stub, max_age_days=1)
+    cache.download(tickers, start, end)
+    cache.download(tickers, start, end)
+    assert cache.requests == 1
+    for entry in cache._index.values():
+        entry["fetched"] -= 2 * 86400
+    data = cache.download(tickers, start, end)
+    assert cache.requests == 2
+    assert stub.calls[-1] == (tickers, start, end)
+    pd.testing.assert_frame_equal(data, _expected(stub, end), check_freq=False)
+
+
+def test_pipeline_matches_serial_fetch():
+    close, dividends = make_price_data(20, 500)
+    universe = make_holdings_universe(20)
+    close.columns = dividends.columns = list(universe)
+    sources = _SlowSources(close, dividends, universe, 0.0, 0.0)
+    tickers = list(universe)
+
+    pipeline = FetchPipeline(
+        price_fetcher=sources.download,
+        holdings_fetcher=sources.load_holdings,
+        price_batch_size=5,
+    )
+    compare = EtfCompare(tickers, close.index[0], close.index[-1], pipeline=pipeline)
+    pd.testing.assert_frame_equal(
+        compare.ticker_data, sources.download(tickers, close.index[0], close.index[-1])
+    )
+    for t in tickers:
+        holdings = compare.ticker_objects[t].holdings
+        # The universe keeps float32 weights, read back to 7 significant digits.
+        pd.testing.assert_frame_equal(holdings, universe[t], rtol=1e-6)
+        assert compare.ticker_objects[t].holdings is holdings
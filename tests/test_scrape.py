@@ -0,0 +1,112 @@
+import sys
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import make_number_texts
+from etf import Etf
+from fixture_site import FixtureDriver, load_local_holdings, ROWS_PER_PAGE
+from value_parser import parse_numbers
+
+
+def test_etf_import_defers_browser_and_downloads():
+    code = "import sys, etf; print([m for m in ('selenium', 'yfinance', 'etfpy') if m in sys.modules])"
+    loaded = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert loaded.endswith("[]"), loaded
+
+
+def test_bulk_table_matches_cells():
+    local = load_local_holdings()
+    page = local["SPY"].iloc[:ROWS_PER_PAGE]
+    driver = FixtureDriver(local)
+    driver.get("http://fixture/SPY/page1.html")
+    etf = Etf("SPY")
+    etf.browser = driver
+
+    rows = etf._scrape_table(bulk=True)
+    df = pd.DataFrame(rows).set_index("symbol")
+    pd.testing.assert_index_equal(df.index, page.index)
+    np.testing.assert_allclose(df["shares_held"], page["shares_held"], rtol=0.01)
+    np.testing.assert_array_equal(df["weight"], parse_numbers(page["weight"])[0])
+    # The cell path waits out its 5 second timeout after the last row.
+    assert etf._scrape_table(bulk=False) == rows
+
+
+def test_parse_numbers_matches_float():
+    texts, values = make_number_texts(100_000)
+    numbers, errors = parse_numbers(texts)
+    np.testing.assert_array_equal(numbers, values)
+    assert errors == np.isnan(values).sum()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("1,234", 1234.0),
+        ("1,234,567.5", 1234567.5),
+        ("$-1.5K", -1500.0),
+        ("-$2", -2.0),
+        (" $39.60B ", 39.6e9),
+        ("7.29%", 7.29),
+        ("5K%", 5000.0),
+        (".5", 0.5),
+        ("5.", 5.0),
+        ("1 2 3", np.nan),
+        ("12,34", np.nan),
+        ("1,2345", np.nan),
+        ("1234,567", np.nan),
+        ("5%K", np.nan),
+        ("$$5", np.nan),
+        ("+-1", np.nan),
+        ("1.2.3", np.nan),
+        ("N\\A", np.nan),
+        ("\u0661\u0662", np.nan),
+    ],
+)
+def test_parse_numbers_edge_cases(text, expected):
+    numbers, errors = parse_numbers([text, "", None])
+    np.testing.assert_array_equal(numbers, [expected, np.nan, np.nan])
+    # Empty and missing values are not errors.
+    assert errors == int(np.isnan(expected))
+
+
+def test_pool_scrapes_every_page():
+    from scraper_pool import ScraperPool
+
+    local = load_local_holdings()
+    with ScraperPool(
+        workers=2,
+        holdings_url="http://fixture/{}/index.html",
+        driver_factory=lambda: FixtureDriver(local),
+    ) as pool:
+        holdings, _ = pool.scrape(list(local))
+    for t, df in holdings.items():
+        pd.testing.assert_index_equal(df.index, local[t].index)
+
+
+@pytest.mark.parametrize("page", [1, 2])
+def test_stuck_page_fails_the_scrape(page):
+    local = load_local_holdings()
+    ticker = max(local, key=lambda t: len(local[t]))
+    etf = Etf(ticker)
+    etf.holdings_url = "http://fixture/{}/index.html"
+    # Page 1 is the switch to 60 rows.
+    with pytest.raises(TimeoutError):
+        etf._scrape_holdings(
+            browser=FixtureDriver(local, stuck_pages=[page]), page_timeout=0.2
+        )
+
+
+def test_inert_next_link_ends_the_scrape():
+    local = load_local_holdings()
+    for ticker, expected in local.items():
+        etf = Etf(ticker)
+        etf.holdings_url = "http://fixture/{}/index.html"
+        df = etf._scrape_holdings(
+            browser=FixtureDriver(local, inert_next=True), page_timeout=0.2
+        )
+        pd.testing.assert_index_equal(df.index, expected.index)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+# Multiplier of each magnitude suffix, e.g. "$39.60B".
+MAGNITUDES = {"K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+
+# A readable value: an optional sign and dollar sign in either order, digits with thousands separators every
+# 3 digits, a decimal point, a magnitude and a percent sign, with blanks only around it.
+_NUMBER = (
+    r" *(?:[+-]\$?|\$[+-]?)?"
+    r"(?:(?:[0-9]{1,3}(?:,[0-9]{3})+|[0-9]+)(?:\.[0-9]*)?|\.[0-9]+)"
+    r"[KMBTkmbt]?%? *"
+)
+
+
+def parse_numbers(values) -> tuple:
+    """
+    Convert scraped number texts to floats with pandas string methods.
+
+    Accepts an optional sign and dollar sign, thousands separators every 3 digits, a decimal point, a K, M, B or T
+    magnitude and a trailing percent sign, e.g. "$39.60B", "1,234.5", "87.60M", "7.29%" or "-3.1". Blanks are only
+    allowed around the value, so "1 2 3" and "12,34" can not be read. Percent values stay in percent ("7.29%" is 7.29).
+
+    :param values: Texts to convert. Numeric arrays are returned as floats.
+    :return: (tuple[np.ndarray, int]) Float of each value (NaN if it can not be read, like "N\\A"), and the number
+        of non-empty values that could not be read.
+    """
+    if isinstance(values, (pd.Series, np.ndarray)) and values.dtype.kind in "biuf":
+        return np.asarray(values, dtype=np.float64), 0
+    text = pd.Series(np.asarray(values, dtype=object), dtype=object)
+    missing = text.isna()
+    text = text.where(~missing, "").astype(str)
+    valid = text.str.fullmatch(_NUMBER)
+
+    digits = text.where(valid).str.replace(r"[ $,%]", "", regex=True)
+    suffix = digits.str[-1:].str.upper()
+    has_magnitude = suffix.isin(list(MAGNITUDES))
+    digits = digits.where(~has_magnitude, digits.str[:-1])
+    numbers = pd.to_numeric(digits, errors="coerce").to_numpy(dtype=np.float64)
+    numbers *= suffix.map(MAGNITUDES).fillna(1.0).to_numpy()
+
+    blank = text.str.strip() == ""
+    errors = int((~valid & ~missing & ~blank).sum())
+    return numbers, errors